@@ -13,7 +13,9 @@ logging.basicConfig(level=logging.DEBUG)
 class Base(DeclarativeBase):
     pass
 
-db = SQLAlchemy(model_class=Base)
+from utils.read_routing import RoutingSession, init_read_routing
+
+db = SQLAlchemy(model_class=Base, session_options={'class_': RoutingSession})
 
 # Create the app
 app = Flask(__name__)
@@ -23,23 +25,29 @@ app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
 # Configure the database
 database_url = os.environ.get("DATABASE_URL", "sqlite:///instance/ceramic_qc.db")
 app.config["SQLALCHEMY_DATABASE_URI"] = database_url
-app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    "pool_recycle": 300,
-    "pool_pre_ping": True,
-}
-
-# Ensure proper encoding for both SQLite and PostgreSQL
-if database_url.startswith('sqlite:'):
-    app.config["SQLALCHEMY_ENGINE_OPTIONS"]["connect_args"] = {
-        "check_same_thread": False
-    }
-elif database_url.startswith('postgresql'):
-    app.config["SQLALCHEMY_ENGINE_OPTIONS"]["connect_args"] = {
-        "client_encoding": "utf8"
-    }
+# Connection pool, PostgreSQL timeouts and SQLite pragmas (see utils/engine_profile.py)
+from utils.engine_profile import engine_options, init_engine_profile
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(database_url)
 
 # Initialize extensions
 db.init_app(app)
+init_engine_profile(app)
+
+# Optional read-only engine for reporting (READ_REPLICA_URL, see utils/read_routing.py)
+init_read_routing(app)
+
+# Per-request SQL statistics (response headers in debug, slow-request log)
+from utils.sql_instrumentation import init_sql_instrumentation
+init_sql_instrumentation(app)
+
+# Prometheus metrics at /metrics
+from utils.metrics import init_metrics
+init_metrics(app)
+
+# Sampled cProfile of requests (PROFILE_SAMPLE_RATE or ?_profile=1 for admins)
+from utils.profiling import init_profiling
+init_profiling(app)
+
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'auth.login'  # type: ignore
@@ -62,8 +70,8 @@ def strftime_filter(date_str, fmt='%Y-%m-%d %H:%M:%S'):
 
 @login_manager.user_loader
 def load_user(user_id):
-    from models import User
-    return User.query.get(int(user_id))
+    from utils.user_cache import user_cache
+    return user_cache.load(int(user_id))
 
 with app.app_context():
     # Import models
@@ -71,7 +79,16 @@ with app.app_context():
     
     # Create all tables
     db.create_all()
-    
+
+    # create_all() skips existing tables; add indexes introduced since
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+
+    # Monthly partitions (PostgreSQL with PARTITION_BY_MONTH only)
+    from utils.partitioning import ensure_partitions
+    ensure_partitions(db.engine)
+
     # Initialize automation service
     from services.automation_service import automation_service
     automation_service.init_app(app)
@@ -116,7 +133,9 @@ from routes.enamel import enamel_bp
 from routes.tests import tests_bp
 from routes.reports import reports_bp
 from routes.specifications import spec_bp
-# from routes.optimized_measurements import optimized_bp
+from routes.admin import admin_bp
+from routes.sync import sync_bp
+from routes.optimized_measurements import optimized_bp
 
 app.register_blueprint(main_bp)
 app.register_blueprint(auth_bp, url_prefix='/auth')
@@ -128,4 +147,6 @@ app.register_blueprint(enamel_bp, url_prefix='/enamel')
 app.register_blueprint(tests_bp, url_prefix='/tests')
 app.register_blueprint(reports_bp, url_prefix='/reports')
 app.register_blueprint(spec_bp, url_prefix='/specifications')
-# app.register_blueprint(optimized_bp, url_prefix='/optimized')
+app.register_blueprint(admin_bp, url_prefix='/admin')
+app.register_blueprint(sync_bp, url_prefix='/sync')
+app.register_blueprint(optimized_bp, url_prefix='/optimized')
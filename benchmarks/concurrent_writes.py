@@ -0,0 +1,173 @@
+"""
+Benchmark: concurrent writes on SQLite, default settings against the tuned profile
+
+Several processes (like gunicorn workers) import the app on the same
+database file. Writers save clay controls one transaction at a time while
+readers keep counting and listing the day's records. Each profile starts
+on a fresh file, because the WAL journal mode persists in the database:
+
+    default  SQLITE_TUNING=0: rollback journal, synchronous=FULL
+    tuned    utils/engine_profile.py: WAL, synchronous=NORMAL, busy timeout...
+
+Reported per profile: committed writes per second, write latency
+percentiles, failed writes ("database is locked") and read throughput.
+
+    python benchmarks/concurrent_writes.py [--writers 4] [--readers 4] [--writes 200]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time as timer
+from datetime import date, datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROFILES = {
+    'default': {'SQLITE_TUNING': '0'},
+    'tuned': {'SQLITE_TUNING': '1'},
+}
+
+def _load_app(database_url, profile_env):
+    os.environ['DATABASE_URL'] = database_url
+    os.environ.update(profile_env)
+    sys.path.insert(0, ROOT)
+
+    import logging
+    logging.disable(logging.CRITICAL)
+
+    from app import app, db
+    return app, db
+
+def _percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+def _writer(database_url, profile_env, writes, start, results):
+    app, db = _load_app(database_url, profile_env)
+    from models import ClayControl
+    from sqlalchemy.exc import OperationalError
+
+    latencies, errors = [], 0
+    with app.app_context():
+        start.wait()
+        for index in range(writes):
+            started = timer.perf_counter()
+            try:
+                db.session.add(ClayControl(
+                    date=date.today(), shift='morning', measurement_time_1=datetime.now().time(),
+                    humidity_before_prep=3.2, humidity_after_sieving=2.8, humidity_after_prep=5.8,
+                    granulometry_refusal=15, calcium_carbonate=20, notes=f'bench {os.getpid()} {index}'
+                ))
+                db.session.commit()
+                latencies.append((timer.perf_counter() - started) * 1000)
+            except OperationalError:
+                db.session.rollback()
+                errors += 1
+    results.put(('writer', latencies, errors))
+
+def _reader(database_url, profile_env, start, done, results):
+    app, db = _load_app(database_url, profile_env)
+    from models import ClayControl
+    from sqlalchemy.exc import OperationalError
+
+    reads, errors = 0, 0
+    with app.app_context():
+        start.wait()
+        while not done.is_set():
+            try:
+                ClayControl.query.filter(ClayControl.date == date.today()).count()
+                ClayControl.query.order_by(ClayControl.id.desc()).limit(50).all()
+                db.session.rollback()
+                reads += 1
+            except OperationalError:
+                db.session.rollback()
+                errors += 1
+    results.put(('reader', reads, errors))
+
+def _prepare(database_url, profile_env):
+    """Create the schema (and set the journal mode) before the workers start"""
+    app, db = _load_app(database_url, profile_env)
+    with app.app_context():
+        mode = db.session.execute(db.text('PRAGMA journal_mode')).scalar()
+        db.session.remove()
+    return mode
+
+def run_profile(name, args, workdir):
+    database_url = f"sqlite:///{os.path.join(workdir, f'{name}.db')}"
+    profile_env = PROFILES[name]
+
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(1) as pool:
+        journal_mode = pool.apply(_prepare, (database_url, profile_env))
+
+    start = context.Barrier(args.writers + args.readers + 1)
+    done = context.Event()
+    results = context.Queue()
+    writers = [context.Process(target=_writer, args=(database_url, profile_env, args.writes, start, results))
+               for _ in range(args.writers)]
+    readers = [context.Process(target=_reader, args=(database_url, profile_env, start, done, results))
+               for _ in range(args.readers)]
+    for process in writers + readers:
+        process.start()
+
+    start.wait()
+    started = timer.perf_counter()
+    collected = [results.get() for _ in writers]
+    elapsed = timer.perf_counter() - started
+    done.set()
+    collected += [results.get() for _ in readers]
+    for process in writers + readers:
+        process.join()
+
+    latencies = [value for kind, values, _ in collected if kind == 'writer' for value in values]
+    result = {
+        'journal_mode': journal_mode,
+        'elapsed_s': round(elapsed, 3),
+        'writes': len(latencies),
+        'write_errors': sum(errors for kind, _, errors in collected if kind == 'writer'),
+        'writes_per_s': round(len(latencies) / elapsed, 1) if elapsed else None,
+        'write_p50_ms': round(statistics.median(latencies), 2) if latencies else None,
+        'write_p95_ms': round(_percentile(latencies, 95), 2) if latencies else None,
+        'write_p99_ms': round(_percentile(latencies, 99), 2) if latencies else None,
+        'write_max_ms': round(max(latencies), 2) if latencies else None,
+        'reads': sum(reads for kind, reads, _ in collected if kind == 'reader'),
+        'read_errors': sum(errors for kind, _, errors in collected if kind == 'reader'),
+    }
+    result['reads_per_s'] = round(result['reads'] / elapsed, 1) if elapsed else None
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writes', type=int, default=200, help='transactions per writer')
+    parser.add_argument('--profiles', nargs='+', choices=list(PROFILES), default=list(PROFILES))
+    parser.add_argument('--output', help='write the results as JSON')
+    args = parser.parse_args()
+
+    report = {}
+    with tempfile.TemporaryDirectory(prefix='tileqc-writes-') as workdir:
+        for name in args.profiles:
+            report[name] = result = run_profile(name, args, workdir)
+            print(f"{name:8s} journal={result['journal_mode']:7s} "
+                  f"{result['writes']:5d} writes in {result['elapsed_s']:6.2f}s "
+                  f"({result['writes_per_s']} /s)  "
+                  f"p50 {result['write_p50_ms']} ms  p95 {result['write_p95_ms']} ms  "
+                  f"p99 {result['write_p99_ms']} ms  max {result['write_max_ms']} ms  "
+                  f"errors {result['write_errors']}  reads {result['reads_per_s']} /s "
+                  f"(errors {result['read_errors']})")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'writers': args.writers, 'readers': args.readers, 'writes': args.writes,
+                       'profiles': report}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
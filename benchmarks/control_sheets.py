@@ -0,0 +1,99 @@
+"""
+Benchmark: a month of daily control sheets in one workbook
+
+Seeds a throwaway SQLite database with PARAMETERS control parameters, each
+scheduled and measured FREQUENCY times a day for a month, then times
+ControlSheetService.generate_monthly_control_sheets.
+
+    python benchmarks/control_sheets.py [--parameters 100] [--frequency 6]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time as timer
+from datetime import date, time, timedelta
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--parameters', type=int, default=100)
+    parser.add_argument('--frequency', type=int, default=6)
+    parser.add_argument('--year', type=int, default=2025)
+    parser.add_argument('--month', type=int, default=6)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='qc-bench-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    import logging
+    logging.disable(logging.CRITICAL)
+
+    from app import app, db
+    from models import ControlStage, ControlParameter, ScheduledControl, OptimizedMeasurement
+    from services.control_sheet_service import ControlSheetService
+    from sqlalchemy import insert
+
+    with app.app_context():
+        stage = ControlStage(code='BENCH', name='Benchmark', order_sequence=1)
+        db.session.add(stage)
+        db.session.flush()
+
+        db.session.execute(insert(ControlParameter.__table__), [{
+            'stage_id': stage.id,
+            'code': f'BENCH_{i:03d}',
+            'name': f'Paramètre {i}',
+            'specification': '10 - 20',
+            'frequency_per_day': args.frequency,
+            'min_value': 10,
+            'max_value': 20,
+            'control_type': 'numeric',
+            'active': True
+        } for i in range(args.parameters)])
+        parameter_ids = [p.id for p in ControlParameter.query.filter_by(stage_id=stage.id)]
+
+        start_date = date(args.year, args.month, 1)
+        days = [start_date + timedelta(days=i) for i in range(31)
+                if (start_date + timedelta(days=i)).month == args.month]
+        hours = [int(i * 24 / args.frequency) for i in range(args.frequency)]
+        shifts = {h: '06H-14H' if 6 <= h < 14 else '14H-22H' if 14 <= h < 22 else '22H-06H' for h in hours}
+
+        scheduled, measured = [], []
+        for day in days:
+            for parameter_id in parameter_ids:
+                for n, hour in enumerate(hours):
+                    scheduled.append({
+                        'parameter_id': parameter_id, 'scheduled_date': day,
+                        'scheduled_time': time(hour, 0), 'shift': shifts[hour],
+                        'status': 'completed' if n else 'overdue'
+                    })
+                    if n:
+                        value = 10 + (parameter_id * 7 + n * 3 + day.day) % 12
+                        measured.append({
+                            'parameter_id': parameter_id, 'operator_name': 'bench',
+                            'measurement_date': day, 'measurement_time': time(hour, 5),
+                            'shift': shifts[hour], 'numeric_value': value,
+                            'is_conforming': value <= 20,
+                            'deviation_percentage': max(value - 20, 0) * 5 or None,
+                            'nc_number': f'NC-{parameter_id}-{day.day}' if value > 20 else None
+                        })
+        db.session.execute(insert(ScheduledControl.__table__), scheduled)
+        db.session.execute(insert(OptimizedMeasurement.__table__), measured)
+        db.session.commit()
+
+        started = timer.perf_counter()
+        data = ControlSheetService._fetch_sheet_data(days[0], days[-1])
+        fetched = timer.perf_counter()
+        result = ControlSheetService.generate_monthly_control_sheets(args.year, args.month)
+        finished = timer.perf_counter()
+
+    print(f"{args.parameters} parameters x {len(days)} days "
+          f"({len(scheduled)} scheduled controls, {len(measured)} measurements)")
+    print(f"  grouped queries : {fetched - started:.3f}s "
+          f"({len(data['scheduled'])} + {len(data['measurements'])} aggregated rows)")
+    print(f"  monthly workbook: {finished - fetched:.3f}s "
+          f"({len(days)} sheets, {len(result['buffer'].getvalue()) / 1024:.0f} KiB)")
+
+if __name__ == '__main__':
+    main()
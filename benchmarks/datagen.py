@@ -0,0 +1,373 @@
+"""
+Synthetic plant data generator
+
+Fills the control tables (clay, press, dryer, kilns, enamel, dimensional,
+digital decoration, external tests) and the scheduling tables
+(ScheduledControl, OptimizedMeasurement) with several years of multi-shift,
+multi-format records. Values are drawn around the active specifications
+with a slow seasonal drift, a configurable share of records is pushed out
+of specification, and compliance is computed with the rules engine. Rows
+are written with bulk INSERTs; the same seed always gives the same data.
+
+    python benchmarks/datagen.py --database-url sqlite:////tmp/qc.db --years 2
+"""
+
+import argparse
+import math
+import os
+import sys
+import time as timer
+from datetime import date, time, timedelta
+
+import numpy as np
+
+SHIFTS = ['morning', 'afternoon', 'night']
+SCHEDULE_SHIFTS = {'morning': '06H-14H', 'afternoon': '14H-22H', 'night': '22H-06H'}
+SHIFT_HOURS = {'morning': (6, 14), 'afternoon': (14, 22), 'night': (22, 30)}
+
+# (control type, model name, records per shift, one record per day instead of per shift)
+CONTROL_VOLUMES = [
+    ('clay', 'ClayControl', 2, False),
+    ('press', 'PressControl', 2, False),
+    ('dryer', 'DryerControl', 2, False),
+    ('biscuit_kiln', 'BiscuitKilnControl', 1, False),
+    ('email_kiln', 'EmailKilnControl', 1, False),
+    ('enamel', 'EnamelControl', 2, False),
+    ('dimensional', 'DimensionalTest', 1, True),
+]
+
+class PlantDataGenerator:
+    """Seeded generator of realistic control records"""
+
+    def __init__(self, seed=42, nc_rate=0.05, drift=0.3, chunk_size=5000):
+        self.rng = np.random.default_rng(seed)
+        self.nc_rate = nc_rate
+        self.drift = drift
+        self.chunk_size = chunk_size
+        self.counts = {}
+
+    def generate(self, start_date, end_date, controller_id=None):
+        """Insert every kind of record between two dates (inclusive)"""
+        from app import db
+        from models import DigitalDecoration, ExternalTest
+        from utils.rules_engine import rules_engine
+        import models
+
+        days = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+        rules = rules_engine.rules()
+
+        for control_type, model_name, per_shift, daily in CONTROL_VOLUMES:
+            model_class = getattr(models, model_name)
+            columns = self._control_columns(control_type, rules, days, per_shift, daily)
+            compliant = rules_engine.evaluate_batch(control_type, columns)['compliant']
+            columns['compliance_status'] = np.where(compliant, 'compliant', 'non_compliant')
+            columns['controller_id'] = [controller_id] * len(compliant)
+            self._insert(db, model_class, columns)
+
+        self._insert(db, DigitalDecoration, self._digital_columns(days, controller_id))
+        self._insert(db, ExternalTest, self._external_columns(days, controller_id))
+        self._generate_schedule(db, days)
+
+        db.session.commit()
+        return self.counts
+
+    # Control records
+
+    def _slots(self, days, per_shift, daily):
+        """Date, shift, measurement number and time of every record"""
+        slots = {'date': [], 'shift': [], 'measurement_number': [], 'measurement_time': [], 'day_index': []}
+        for day_index, day in enumerate(days):
+            shifts = SHIFTS[:1] if daily else SHIFTS
+            for shift_number, shift in enumerate(shifts):
+                start, end = SHIFT_HOURS[shift]
+                for n in range(per_shift):
+                    hour = start + (end - start) * (n + 0.5) / per_shift
+                    slots['date'].append(day)
+                    slots['shift'].append(shift)
+                    slots['measurement_number'].append(shift_number * per_shift + n + 1)
+                    slots['measurement_time'].append(time(int(hour) % 24, int(hour % 1 * 60)))
+                    slots['day_index'].append(day_index)
+        return slots
+
+    def _values(self, rule, size, day_index, phase, absolute=False, min_only=False):
+        """In-spec values around a rule, with seasonal drift"""
+        low, high, target = rule.min_value, rule.max_value, rule.target_value
+        seasonal = np.sin(2 * math.pi * day_index / 365.0 + phase)
+
+        if min_only or high is None:
+            scale = (target - low) if target is not None and target > low else abs(low) * 0.15 or 1.0
+            return low + np.abs(self.rng.normal(scale, scale / 2, size)) * (1 + self.drift * 0.5 * seasonal)
+
+        if low is None:
+            # Defect percentages: mostly well below the limit
+            values = self.rng.exponential(high * 0.2, size) * (1 + self.drift * seasonal)
+            return np.clip(values, 0, high)
+
+        center = target if target is not None else (low + high) / 2
+        half = (high - low) / 2
+        values = self.rng.normal(center + self.drift * half * 0.5 * seasonal, half / 3.5, size)
+        if absolute:
+            values = np.abs(values) * self.rng.choice([-1, 1], size)
+        return np.clip(values, low, high)
+
+    def _violations(self, rule, size, min_only=False):
+        """Values just outside a rule's limits"""
+        low, high = rule.min_value, rule.max_value
+        if min_only or high is None:
+            return low * (1 - self.rng.uniform(0.02, 0.2, size))
+        if low is None:
+            return high * (1 + self.rng.uniform(0.05, 1.0, size))
+        span = high - low
+        below = self.rng.random(size) < 0.5
+        return np.where(below,
+                        low - self.rng.uniform(0.05, 0.5, size) * span,
+                        high + self.rng.uniform(0.05, 0.5, size) * span)
+
+    def _control_columns(self, control_type, rules, days, per_shift, daily):
+        from utils.rules_engine import CHECK_PLANS
+
+        columns = self._slots(days, per_shift, daily)
+        day_index = np.array(columns.pop('day_index'))
+        size = len(day_index)
+
+        formats = sorted({rule.format_type for key, group in rules.items()
+                          if key[0] == control_type for rule in group if rule.format_type})
+        enamels = sorted({rule.enamel_type for key, group in rules.items()
+                          if key[0] == control_type for rule in group if rule.enamel_type})
+        if formats:
+            columns['format_type'] = self.rng.choice(formats, size)
+        if enamels:
+            columns['enamel_type'] = self.rng.choice(enamels, size)
+
+        extras = self._extra_columns(control_type, size, columns)
+        columns.update(extras)
+
+        def col(name):
+            return np.asarray(columns[name], dtype=float)
+
+        injectable = []
+        for spec_check in CHECK_PLANS[control_type]:
+            if spec_check.value is not None:
+                continue
+            field = spec_check.field or spec_check.parameter
+            values = np.asarray(columns.get(field, np.full(size, np.nan)), dtype=float)
+            applies = np.ones(size, dtype=bool) if spec_check.when is None else spec_check.when(col)
+            phase = self.rng.uniform(0, 2 * math.pi)
+
+            for rule in rules.get((control_type, spec_check.parameter), []):
+                rows = applies.copy()
+                if spec_check.by_format:
+                    rows &= columns['format_type'] == rule.format_type
+                if spec_check.by_enamel:
+                    rows &= columns['enamel_type'] == rule.enamel_type
+                if not spec_check.by_format and rule.format_type:
+                    continue
+                if not spec_check.by_enamel and rule.enamel_type:
+                    continue
+                count = int(rows.sum())
+                if count:
+                    values[rows] = self._values(rule, count, day_index[rows], phase,
+                                                spec_check.absolute, spec_check.min_only)
+                    injectable.append((field, rows, rule, spec_check.min_only))
+
+            columns[field] = values
+
+        # Push a random parameter out of spec on nc_rate of the records
+        if injectable:
+            faulty = np.flatnonzero(self.rng.random(size) < self.nc_rate)
+            picks = self.rng.integers(0, len(injectable), len(faulty))
+            for index, pick in zip(faulty, picks):
+                field, rows, rule, min_only = injectable[pick]
+                if rows[index]:
+                    columns[field][index] = self._violations(rule, 1, min_only)[0]
+
+        for name, values in columns.items():
+            if isinstance(values, np.ndarray) and values.dtype.kind == 'f':
+                columns[name] = np.round(values, 3)
+        return columns
+
+    def _extra_columns(self, control_type, size, columns):
+        """Columns not covered by specifications"""
+        rng = self.rng
+        if control_type == 'press':
+            return {'clay_humidity': rng.normal(5.6, 0.2, size)}
+        if control_type == 'biscuit_kiln':
+            return {'thermal_shock': np.full(size, 'pass')}
+        if control_type == 'email_kiln':
+            return {'thickness_for_resistance': rng.uniform(6.5, 9.0, size)}
+        if control_type == 'enamel':
+            return {'measurement_type': np.full(size, 'production_line'),
+                    'sieve_refusal': np.abs(rng.normal(0.8, 0.2, size))}
+        if control_type == 'dimensional':
+            tiles = rng.choice([30, 50], size)
+            defect_free = np.minimum(tiles, np.round(tiles * rng.uniform(0.94, 1.0, size)))
+            columns.pop('shift')
+            columns.pop('measurement_number')
+            columns.pop('measurement_time')
+            return {'tiles_tested': tiles, 'defect_free_tiles': defect_free.astype(int)}
+        return {}
+
+    def _digital_columns(self, days, controller_id):
+        columns = self._slots(days, 2, False)
+        del columns['day_index'], columns['measurement_time']
+        size = len(columns['date'])
+        for name in ['sharpness', 'offset', 'tonality']:
+            columns[name] = np.where(self.rng.random(size) < self.nc_rate / 3, 'fail', 'pass')
+        failed = (columns['sharpness'] == 'fail') | (columns['offset'] == 'fail') | (columns['tonality'] == 'fail')
+        columns['compliance_status'] = np.where(failed, 'non_compliant', 'compliant')
+        columns['controller_id'] = [controller_id] * size
+        return columns
+
+    def _external_columns(self, days, controller_id):
+        tests = [('thermal_shock', 'ISO 10545-9'), ('chemical_resistance', 'ISO 10545-13'),
+                 ('stain_resistance', 'ISO 10545-14')]
+        columns = {'date': [], 'test_type': [], 'iso_standard': [], 'result_value': [],
+                   'result_status': [], 'test_report_number': [], 'controller_id': []}
+        for day in days:
+            if day.day != 15:
+                continue
+            for test_type, standard in tests:
+                passed = self.rng.random() >= self.nc_rate
+                columns['date'].append(day)
+                columns['test_type'].append(test_type)
+                columns['iso_standard'].append(standard)
+                columns['result_value'].append(round(float(self.rng.uniform(90, 100) if passed else self.rng.uniform(60, 90)), 1))
+                columns['result_status'].append('pass' if passed else 'fail')
+                columns['test_report_number'].append(f"RPT-{day.strftime('%Y%m')}-{test_type[:4].upper()}")
+                columns['controller_id'].append(controller_id)
+        return columns
+
+    # Scheduling
+
+    def _generate_schedule(self, db, days):
+        from models import ControlParameter, OptimizedMeasurement, ScheduledControl
+        from services.scheduling_service import SchedulingService
+        from sqlalchemy import func, select, text
+
+        if not ControlParameter.query.count():
+            SchedulingService.initialize_default_parameters()
+        parameters = ControlParameter.query.filter(ControlParameter.active == True,
+                                                   ControlParameter.frequency_per_day > 0).all()
+
+        measurements_table = OptimizedMeasurement.__table__
+        next_id = (db.session.execute(select(func.max(measurements_table.c.id))).scalar() or 0) + 1
+        today = date.today()
+
+        scheduled, measured = [], []
+        for day in days:
+            for parameter in parameters:
+                for scheduled_time in SchedulingService._generate_scheduled_times(parameter.frequency_per_day):
+                    shift = SchedulingService._determine_shift(scheduled_time)
+                    row = {'parameter_id': parameter.id, 'scheduled_date': day,
+                           'scheduled_time': scheduled_time, 'shift': shift, 'status': 'pending',
+                           'measurement_id': None, 'assigned_operator': None, 'completed_at': None}
+                    scheduled.append(row)
+                    if day >= today:
+                        continue
+                    if self.rng.random() < 0.03:
+                        row['status'] = 'overdue'
+                        continue
+
+                    measured_at = (scheduled_time.hour * 60 + scheduled_time.minute + int(self.rng.integers(0, 45))) % 1440
+                    measurement = self._measurement(parameter, day, time(measured_at // 60, measured_at % 60), shift)
+                    measurement['id'] = next_id
+                    measured.append(measurement)
+                    row.update(status='completed', measurement_id=next_id,
+                               assigned_operator=measurement['operator_name'])
+                    next_id += 1
+
+        self._insert(db, OptimizedMeasurement, measured)
+        self._insert(db, ScheduledControl, scheduled)
+
+        if db.engine.dialect.name == 'postgresql' and measured:
+            db.session.execute(text(
+                "SELECT setval(pg_get_serial_sequence('optimized_measurements', 'id'), "
+                "(SELECT max(id) FROM optimized_measurements))"))
+
+    def _measurement(self, parameter, day, measured_at, shift):
+        row = {'parameter_id': parameter.id, 'operator_name': f"Opérateur {int(self.rng.integers(1, 9))}",
+               'measurement_date': day, 'measurement_time': measured_at, 'shift': shift,
+               'numeric_value': None, 'json_values': None, 'is_conforming': True,
+               'deviation_percentage': None, 'nc_number': None}
+
+        if parameter.control_type == 'numeric' and parameter.min_value is not None and parameter.max_value is not None:
+            low, high = float(parameter.min_value), float(parameter.max_value)
+            target = float(parameter.target_value) if parameter.target_value is not None else (low + high) / 2
+            value = self.rng.normal(target, (high - low) / 7)
+            if self.rng.random() < self.nc_rate:
+                value = high + self.rng.uniform(0.05, 0.3) * (high - low)
+            row['numeric_value'] = round(float(value), 3)
+            row['is_conforming'] = low <= value <= high
+            if target:
+                row['deviation_percentage'] = round((value - target) / target * 100, 2)
+        elif parameter.control_type == 'visual':
+            limits = parameter.defect_categories or {}
+            defects = {name: round(float(self.rng.exponential(limit * 0.2)), 2) for name, limit in limits.items()}
+            if defects and self.rng.random() < self.nc_rate:
+                name = list(defects)[int(self.rng.integers(0, len(defects)))]
+                defects[name] = round(limits[name] * 1.5, 2)
+            row['json_values'] = defects
+            row['is_conforming'] = all(value <= limits.get(name, 15) for name, value in defects.items())
+
+        if not row['is_conforming']:
+            row['nc_number'] = f"NC-{day.strftime('%Y%m%d')}-{parameter.id:03d}{measured_at.strftime('%H%M')}"
+        return row
+
+    def _insert(self, db, model_class, columns):
+        """Bulk insert rows given as a list of dicts or a dict of columns"""
+        from sqlalchemy import insert
+
+        if isinstance(columns, dict):
+            names = list(columns)
+            size = len(columns[names[0]]) if names else 0
+            values = [columns[name].tolist() if isinstance(columns[name], np.ndarray) else columns[name]
+                      for name in names]
+            rows = [dict(zip(names, row)) for row in zip(*values)] if size else []
+        else:
+            rows = columns
+
+        table = model_class.__table__
+        for start in range(0, len(rows), self.chunk_size):
+            db.session.execute(insert(table), rows[start:start + self.chunk_size])
+        self.counts[table.name] = self.counts.get(table.name, 0) + len(rows)
+
+def generate_plant_data(years=1, seed=42, nc_rate=0.05, drift=0.3, end_date=None):
+    """Generate ``years`` of data ending at end_date (default today); needs an app context"""
+    from models import User
+
+    end_date = end_date or date.today()
+    start_date = end_date - timedelta(days=int(round(365 * years)) - 1)
+    admin = User.query.filter_by(username='admin').first()
+
+    generator = PlantDataGenerator(seed=seed, nc_rate=nc_rate, drift=drift)
+    return generator.generate(start_date, end_date, controller_id=admin.id if admin else None)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--database-url', help='defaults to $DATABASE_URL')
+    parser.add_argument('--years', type=float, default=1)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--nc-rate', type=float, default=0.05, help='share of non-conforming records')
+    parser.add_argument('--drift', type=float, default=0.3, help='seasonal drift, as a share of the tolerance')
+    parser.add_argument('--end-date', type=date.fromisoformat)
+    args = parser.parse_args()
+
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    import logging
+    logging.disable(logging.CRITICAL)
+    from app import app
+
+    with app.app_context():
+        started = timer.perf_counter()
+        counts = generate_plant_data(args.years, args.seed, args.nc_rate, args.drift, args.end_date)
+        elapsed = timer.perf_counter() - started
+
+    for table, count in counts.items():
+        print(f"{table:24s} {count:>10d}")
+    print(f"{sum(counts.values())} rows in {elapsed:.1f}s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""
+Benchmark: optimized measurement ingestion, one call per measurement against the v1 batch API
+
+Both paths run through the app's test client on the same database, as the
+default control parameters with a generated day of scheduled controls:
+
+    single   POST /optimized/api/record-measurement, one measurement per request
+    ndjson   POST /optimized/api/v1/measurements, BATCH measurements per
+             NDJSON body (parsed as it is read, inserted by chunks)
+    json     POST /optimized/api/v1/measurements, the same batches as a JSON list
+
+Reported per path: measurements per second, request latency and rows
+inserted. Without --database-url a temporary SQLite file is used.
+
+    python benchmarks/ingestion_throughput.py [--database-url postgresql://...] \\
+        [--single 500] [--batches 10] [--batch 5000]
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time as timer
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _load_app(database_url):
+    os.environ['DATABASE_URL'] = database_url
+    sys.path.insert(0, ROOT)
+
+    import logging
+    logging.disable(logging.CRITICAL)
+
+    from app import app, db
+    app.config['WTF_CSRF_ENABLED'] = False
+    return app, db
+
+def _measurements(parameters, count, day):
+    """Random readings around each parameter's target, 5% out of specification"""
+    start = datetime.combine(day, datetime.min.time())
+    for index in range(count):
+        code, control_type, low, high, categories = random.choice(parameters)
+        record = {'parameter': code, 'operator': 'bench', 'line_number': 1,
+                  'timestamp': (start + timedelta(seconds=index * 86400 // count)).isoformat()}
+        if control_type == 'visual':
+            record['defects'] = {name: round(random.uniform(0, limit * 1.1), 2) for name, limit in (categories or {}).items()}
+        else:
+            spread = (high - low) or 1
+            record['value'] = round(random.uniform(low - spread * 0.05, high + spread * 0.05), 3)
+        yield record
+
+def _summary(name, latencies, rows, elapsed):
+    return {
+        'path': name,
+        'requests': len(latencies),
+        'measurements': rows,
+        'elapsed_s': round(elapsed, 3),
+        'measurements_per_s': round(rows / elapsed, 1) if elapsed else None,
+        'request_p50_ms': round(statistics.median(latencies), 2) if latencies else None,
+        'request_max_ms': round(max(latencies), 2) if latencies else None,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--database-url', help='scratch database (default: temporary SQLite file)')
+    parser.add_argument('--single', type=int, default=500, help='measurements sent one per request')
+    parser.add_argument('--batches', type=int, default=10, help='batch requests per batch path')
+    parser.add_argument('--batch', type=int, default=5000, help='measurements per batch request')
+    parser.add_argument('--output', help='write the results as JSON')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='tileqc-ingest-')
+    app, db = _load_app(args.database_url or f"sqlite:///{os.path.join(workdir, 'ingest.db')}")
+
+    from models import ControlParameter, OptimizedMeasurement
+    from services.scheduling_service import SchedulingService
+
+    client = app.test_client()
+    assert client.post('/auth/login', data={'username': 'admin', 'password': 'admin123'}).status_code == 302
+
+    day = date.today()
+    with app.app_context():
+        if not ControlParameter.query.count():
+            SchedulingService.initialize_default_parameters()
+        SchedulingService.generate_daily_schedule(day)
+        parameters = [(p.id, p.code, p.control_type, float(p.min_value or 0), float(p.max_value or 0), p.defect_categories)
+                      for p in ControlParameter.query.filter(ControlParameter.active == True)]
+        rows_before = OptimizedMeasurement.query.count()
+        dialect = db.engine.dialect.name
+
+    report = []
+
+    # One request per measurement
+    by_id = {code: parameter_id for parameter_id, code, *_ in parameters}
+    latencies = []
+    started = timer.perf_counter()
+    for record in _measurements([p[1:] for p in parameters], args.single, day):
+        data = {'date': record['timestamp'][:10], 'time': record['timestamp'][11:]}
+        data.update((key, record[key]) for key in ('value', 'defects') if key in record)
+        request_started = timer.perf_counter()
+        response = client.post('/optimized/api/record-measurement',
+                               json={'parameter_id': by_id[record['parameter']], 'measurement_data': data})
+        latencies.append((timer.perf_counter() - request_started) * 1000)
+        assert response.status_code == 200, response.data[:200]
+    report.append(_summary('single', latencies, args.single, timer.perf_counter() - started))
+
+    # Batches, as NDJSON and as a JSON list
+    for path in ('ndjson', 'json'):
+        latencies, inserted = [], 0
+        bodies = [list(_measurements([p[1:] for p in parameters], args.batch, day)) for _ in range(args.batches)]
+        started = timer.perf_counter()
+        for records in bodies:
+            request_started = timer.perf_counter()
+            if path == 'ndjson':
+                response = client.post('/optimized/api/v1/measurements', content_type='application/x-ndjson',
+                                       data='\n'.join(json.dumps(record) for record in records))
+            else:
+                response = client.post('/optimized/api/v1/measurements', json=records)
+            latencies.append((timer.perf_counter() - request_started) * 1000)
+            assert response.status_code == 200, response.data[:200]
+            inserted += response.json['inserted']
+        report.append(_summary(path, latencies, inserted, timer.perf_counter() - started))
+
+    with app.app_context():
+        rows_after = OptimizedMeasurement.query.count()
+
+    for result in report:
+        print(f"{result['path']:7s} {result['measurements']:7d} measurements in {result['requests']:5d} requests "
+              f"{result['elapsed_s']:7.2f}s ({result['measurements_per_s']} /s)  "
+              f"request p50 {result['request_p50_ms']} ms  max {result['request_max_ms']} ms")
+    print(f"rows inserted: {rows_after - rows_before}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'single': args.single, 'batches': args.batches, 'batch': args.batch,
+                       'dialect': dialect,
+                       'results': report}, f, indent=2, default=str)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,332 @@
+"""
+HTTP load test
+
+Virtual operators log in through auth.login and replay a weighted mix of
+dashboard polls, report views, list pages, combined humidity / press form
+submissions and Excel exports at a target request rate. Requests are
+scheduled open-loop (request i starts at i / rate seconds), so latencies
+are measured from the intended start and a saturated server shows up as
+growing latency instead of a lower request rate.
+
+Targets:
+    --url http://host:port   an already running server
+    --serve                  a local gunicorn (main:app) on a seeded throwaway SQLite database
+    --test-client            the Flask test client in this process (no network, no gunicorn)
+
+Form scenarios create real records, so only point --url at a test database.
+
+    python benchmarks/loadtest.py --serve --workers 2 --users 20 --rate 30 --duration 60
+    python benchmarks/loadtest.py --url http://127.0.0.1:5000 --password ... --rate 0
+"""
+
+import argparse
+import http.cookiejar
+import itertools
+import json
+import os
+import random
+import re
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import namedtuple
+from datetime import date
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CSRF_PATTERN = re.compile(r'name="csrf_token" type="hidden" value="([^"]+)"')
+
+Sample = namedtuple('Sample', 'scenario status ok latency service')
+
+def _humidity_form(rng):
+    return {
+        'date': date.today().isoformat(),
+        'shift': rng.choice(['morning', 'afternoon', 'night']),
+        'measurement_time_1': '08:00',
+        'humidity_before_prep': round(rng.gauss(3.3, 0.3), 2),
+        'measurement_time_2': '08:10',
+        'humidity_after_sieving': round(rng.gauss(2.75, 0.25), 2),
+        'measurement_time_3': '08:20',
+        'humidity_after_prep': round(rng.gauss(5.8, 0.2), 2),
+        'notes': 'loadtest',
+    }
+
+def _press_form(rng):
+    format_type, thickness, weight = rng.choice([('20x20', 6.8, 530), ('25x40', 7.1, 1340), ('25x50', 7.4, 1870)])
+    return {
+        'date': date.today().isoformat(),
+        'shift': rng.choice(['morning', 'afternoon', 'night']),
+        'format_type': format_type,
+        'thickness_time': '09:00',
+        'thickness': round(rng.gauss(thickness, 0.1), 2),
+        'weight_time': '09:05',
+        'wet_weight': round(rng.gauss(weight, weight * 0.02), 1),
+        'notes': 'loadtest',
+    }
+
+# name: (weight, method, path, form builder, expected status)
+SCENARIOS = {
+    'main.dashboard': (30, 'GET', '/', None, 200),
+    'reports.daily_report': (8, 'GET', '/reports/daily', None, 200),
+    'reports.weekly_report': (5, 'GET', '/reports/weekly', None, 200),
+    'reports.monthly_report': (3, 'GET', '/reports/monthly', None, 200),
+    'reports.non_conformities': (4, 'GET', '/reports/non_conformities', None, 200),
+    'reports.spc_charts': (5, 'GET', '/reports/spc_charts', None, 200),
+    'clay.clay_controls': (5, 'GET', '/clay/', None, 200),
+    'press.press_controls': (5, 'GET', '/press/', None, 200),
+    'clay.combined_humidity': (15, 'POST', '/clay/combined-humidity', _humidity_form, 302),
+    'press.combined_press': (15, 'POST', '/press/combined-press', _press_form, 302),
+    'clay.combined_humidity+excel': (2, 'POST', '/clay/combined-humidity',
+                                     lambda rng: dict(_humidity_form(rng), export_excel='1'), 200),
+}
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+class HttpSession:
+    """One logged-in operator talking to a server over HTTP"""
+
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect())
+
+    def request(self, method, path, data=None):
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        req = urllib.request.Request(self.base_url + path, data=body, method=method)
+        try:
+            with self.opener.open(req, timeout=self.timeout) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+class TestClientSession:
+    """One logged-in operator using the Flask test client"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, data=None):
+        response = self.client.open(path, method=method, data=data)
+        return response.status_code, response.get_data()
+
+def login(session, username, password):
+    """Log in and return a CSRF token valid for the session"""
+    status, body = session.request('GET', '/auth/login')
+    match = CSRF_PATTERN.search(body.decode('utf-8', 'replace'))
+    token = match.group(1) if match else ''
+    status, _ = session.request('POST', '/auth/login',
+                                {'csrf_token': token, 'username': username, 'password': password})
+    if status != 302:
+        raise RuntimeError(f"login failed for {username} (HTTP {status})")
+
+    status, body = session.request('GET', '/clay/combined-humidity')
+    match = CSRF_PATTERN.search(body.decode('utf-8', 'replace'))
+    return match.group(1) if match else ''
+
+def run_load(sessions, rate, duration, seed, scenarios):
+    """Replay the scenario mix; returns the samples and the elapsed wall time"""
+    names = list(scenarios)
+    weights = [scenarios[name][0] for name in names]
+    counter = itertools.count()
+    samples, lock = [], threading.Lock()
+    started = time.perf_counter()
+    deadline = started + duration
+
+    def operator(session, token):
+        while True:
+            index = next(counter)
+            scheduled = started + index / rate if rate else time.perf_counter()
+            if scheduled >= deadline:
+                return
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+            rng = random.Random(seed * 1_000_003 + index)
+            name = rng.choices(names, weights)[0]
+            _, method, path, form, expected = scenarios[name]
+            data = dict(form(rng), csrf_token=token) if form else None
+
+            sent = time.perf_counter()
+            try:
+                status, _ = session.request(method, path, data)
+            except (OSError, urllib.error.URLError):
+                status = 0
+            finished = time.perf_counter()
+
+            with lock:
+                samples.append(Sample(name, status, status == expected,
+                                      finished - scheduled, finished - sent))
+
+    threads = [threading.Thread(target=operator, args=session, daemon=True) for session in sessions]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - started
+
+def _percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+def summarize(samples, elapsed):
+    def stats(group):
+        latencies = [s.latency * 1000 for s in group]
+        errors = sum(not s.ok for s in group)
+        return {
+            'requests': len(group),
+            'errors': errors,
+            'error_rate': round(errors / len(group), 4) if group else 0,
+            'throughput_rps': round(len(group) / elapsed, 2),
+            'p50_ms': round(_percentile(latencies, 50), 1),
+            'p95_ms': round(_percentile(latencies, 95), 1),
+            'p99_ms': round(_percentile(latencies, 99), 1),
+            'service_p50_ms': round(_percentile([s.service * 1000 for s in group], 50), 1),
+            'statuses': {str(status): sum(s.status == status for s in group)
+                         for status in sorted({s.status for s in group})},
+        }
+
+    by_scenario = {}
+    for sample in samples:
+        by_scenario.setdefault(sample.scenario, []).append(sample)
+    return {
+        'elapsed_s': round(elapsed, 2),
+        'total': stats(samples) if samples else {},
+        'scenarios': {name: stats(group) for name, group in sorted(by_scenario.items())},
+    }
+
+def print_report(summary):
+    header = f"{'scenario':32s} {'req':>6s} {'err%':>6s} {'rps':>7s} {'p50':>8s} {'p95':>8s} {'p99':>8s}"
+    print(header)
+    print('-' * len(header))
+    rows = list(summary['scenarios'].items()) + [('TOTAL', summary['total'])]
+    for name, s in rows:
+        print(f"{name:32s} {s['requests']:6d} {s['error_rate'] * 100:6.1f} {s['throughput_rps']:7.1f} "
+              f"{s['p50_ms']:8.1f} {s['p95_ms']:8.1f} {s['p99_ms']:8.1f}")
+    print(f"(latencies in ms from the scheduled start, over {summary['elapsed_s']}s)")
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def serve(args):
+    """Seed a throwaway database and start gunicorn on it; returns (process, url)"""
+    workdir = tempfile.mkdtemp(prefix='qc-load-')
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'load.db')}")
+    env.pop('PROMETHEUS_MULTIPROC_DIR', None)
+    if args.years:
+        subprocess.run([sys.executable, os.path.join(ROOT, 'benchmarks', 'datagen.py'),
+                        '--years', str(args.years), '--seed', str(args.seed)],
+                       cwd=ROOT, env=env, check=True, stdout=subprocess.DEVNULL)
+
+    # gunicorn.conf.py creates and empties the metrics directory
+    env['PROMETHEUS_MULTIPROC_DIR'] = os.path.join(workdir, 'metrics')
+
+    port = _free_port()
+    log_path = os.path.join(workdir, 'gunicorn.log')
+    print(f"server log: {log_path}")
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}',
+         '--workers', str(args.workers), '--threads', str(args.threads),
+         '--log-level', 'warning', 'main:app'],
+        cwd=ROOT, env=env, start_new_session=True,
+        stdout=subprocess.DEVNULL, stderr=open(log_path, 'w'))
+
+    url = f'http://127.0.0.1:{port}'
+    for _ in range(300):
+        try:
+            urllib.request.urlopen(url + '/auth/login', timeout=1).read()
+            return process, url
+        except OSError:
+            if process.poll() is not None:
+                raise RuntimeError('gunicorn exited during startup')
+            time.sleep(0.1)
+    os.killpg(process.pid, signal.SIGTERM)
+    raise RuntimeError('gunicorn did not start')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--url', help='base URL of a running server')
+    target.add_argument('--serve', action='store_true', help='start a local gunicorn on seeded data')
+    target.add_argument('--test-client', action='store_true', help='use the Flask test client')
+    parser.add_argument('--username', default='admin')
+    parser.add_argument('--password', default='admin123')
+    parser.add_argument('--users', type=int, default=10, help='concurrent logged-in operators')
+    parser.add_argument('--rate', type=float, default=20, help='target requests per second (0 = as fast as possible)')
+    parser.add_argument('--duration', type=float, default=30, help='seconds')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--years', type=float, default=1, help='data seeded for --serve/--test-client (0 = none)')
+    parser.add_argument('--workers', type=int, default=1, help='gunicorn workers for --serve')
+    parser.add_argument('--threads', type=int, default=1, help='gunicorn threads per worker for --serve')
+    parser.add_argument('--only', action='append', help='restrict the mix to scenarios containing this text')
+    parser.add_argument('--output', help='write the summary as JSON')
+    args = parser.parse_args()
+
+    scenarios = {name: scenario for name, scenario in SCENARIOS.items()
+                 if not args.only or any(pattern in name for pattern in args.only)}
+    if not scenarios:
+        parser.error('no scenario matches --only')
+
+    exports_dir = os.path.join(ROOT, 'exports')
+    existing_exports = set(os.listdir(exports_dir)) if os.path.isdir(exports_dir) else set()
+    process = None
+    try:
+        if args.test_client:
+            os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='qc-load-'), 'load.db')}"
+            os.chdir(ROOT)
+            sys.path[:0] = [ROOT, os.path.join(ROOT, 'benchmarks')]
+            import logging
+            logging.disable(logging.CRITICAL)
+            from app import app
+            if args.years:
+                from datagen import generate_plant_data
+                with app.app_context():
+                    generate_plant_data(args.years, args.seed)
+            make_session = lambda: TestClientSession(app)
+            target_name = 'flask test client'
+        else:
+            if args.serve:
+                process, args.url = serve(args)
+            make_session = lambda: HttpSession(args.url)
+            target_name = args.url
+
+        sessions = []
+        for _ in range(args.users):
+            session = make_session()
+            sessions.append((session, login(session, args.username, args.password)))
+
+        print(f"{args.users} operators, {args.rate or 'max'} req/s for {args.duration:g}s against {target_name}")
+        samples, elapsed = run_load(sessions, args.rate, args.duration, args.seed, scenarios)
+    finally:
+        if process is not None:
+            os.killpg(process.pid, signal.SIGTERM)
+            process.wait()
+        if not args.url or args.serve:
+            # Excel exports written by the local server
+            for name in set(os.listdir(exports_dir)) - existing_exports if os.path.isdir(exports_dir) else []:
+                os.remove(os.path.join(exports_dir, name))
+
+    summary = summarize(samples, elapsed)
+    summary['config'] = {key: value for key, value in vars(args).items() if key != 'password'}
+    print_report(summary)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+if __name__ == '__main__':
+    main()
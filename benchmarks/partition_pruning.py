@@ -0,0 +1,158 @@
+"""
+Benchmark: partition pruning for scheduled controls and measurements
+
+Needs an empty scratch PostgreSQL database. The app creates
+scheduled_controls and optimized_measurements partitioned by month
+(PARTITION_BY_MONTH=1), and MONTHS of history are generated for PARAMETERS
+parameters at FREQUENCY controls a day. The same rows are copied into two
+plain tables: one as the model defines it, and one with an extra btree
+index on the date. The hot queries then run with EXPLAIN ANALYZE on each
+layout, reporting the relations scanned, the buffers touched and the
+median execution time.
+
+    python benchmarks/partition_pruning.py --database-url postgresql://qc@localhost/qc_scratch \\
+        [--parameters 100] [--frequency 12] [--months 24]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time as timer
+from datetime import date, timedelta
+
+LAYOUTS = {
+    'partitioned': {'scheduled': 'scheduled_controls', 'measurements': 'optimized_measurements'},
+    'plain': {'scheduled': 'bench_plain_scheduled', 'measurements': 'bench_plain_measurements'},
+    'plain+date index': {'scheduled': 'bench_indexed_scheduled', 'measurements': 'bench_indexed_measurements'},
+}
+
+QUERIES = {
+    "today's schedule by status":
+        "SELECT status, count(*) FROM {scheduled} WHERE scheduled_date = :today GROUP BY status",
+    "today's measurements by parameter":
+        "SELECT parameter_id, count(*) FROM {measurements} WHERE measurement_date = :today GROUP BY parameter_id",
+    'month-to-date schedule summary':
+        "SELECT scheduled_date, shift, status, count(*) FROM {scheduled} "
+        "WHERE scheduled_date BETWEEN :month_start AND :today GROUP BY scheduled_date, shift, status",
+    'overdue candidates':
+        "SELECT count(*) FROM {scheduled} WHERE status = 'pending' AND scheduled_date <= :today",
+}
+
+def _relations(plan):
+    names = {plan['Relation Name']} if 'Relation Name' in plan else set()
+    for child in plan.get('Plans', []):
+        names |= _relations(child)
+    return names
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--database-url', required=True, help='empty PostgreSQL scratch database')
+    parser.add_argument('--parameters', type=int, default=100)
+    parser.add_argument('--frequency', type=int, default=12)
+    parser.add_argument('--months', type=int, default=24)
+    parser.add_argument('--repeat', type=int, default=7)
+    parser.add_argument('--output', help='write the results as JSON')
+    args = parser.parse_args()
+
+    if not args.database_url.startswith('postgresql'):
+        parser.error('partitioning needs a PostgreSQL database')
+    os.environ['DATABASE_URL'] = args.database_url
+    os.environ['PARTITION_BY_MONTH'] = '1'
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    import logging
+    logging.disable(logging.CRITICAL)
+
+    from app import app, db
+    from models import ControlStage
+    from sqlalchemy import text
+    from utils.partitioning import ensure_partitions, is_partitioned
+
+    today = date.today()
+    start = (today.replace(day=1) - timedelta(days=31 * (args.months - 1))).replace(day=1)
+    params = {'start': start, 'today': today, 'month_start': today.replace(day=1),
+              'frequency': args.frequency}
+
+    with app.app_context():
+        with db.engine.connect() as connection:
+            if not all(is_partitioned(connection, name) for name in LAYOUTS['partitioned'].values()):
+                raise SystemExit('the tables already exist unpartitioned; use an empty database')
+
+        print(f"partitions created: {len(ensure_partitions(db.engine, start=start))}")
+
+        stage = ControlStage(code='BENCH', name='Benchmark', order_sequence=99)
+        db.session.add(stage)
+        db.session.flush()
+        started = timer.perf_counter()
+        statements = [
+            ("INSERT INTO control_parameters (stage_id, code, name, specification, frequency_per_day, "
+             "control_type, min_value, max_value, active) "
+             "SELECT :stage, 'BENCH_' || n, 'Paramètre ' || n, '10 - 20', :frequency, 'numeric', 10, 20, true "
+             "FROM generate_series(1, :parameters) n"),
+            ("INSERT INTO scheduled_controls (parameter_id, scheduled_date, scheduled_time, shift, status, created_at) "
+             "SELECT p.id, d::date, make_time(h * 24 / :frequency, 0, 0), "
+             "(CASE WHEN h * 24 / :frequency BETWEEN 6 AND 13 THEN '06H-14H' "
+             "WHEN h * 24 / :frequency BETWEEN 14 AND 21 THEN '14H-22H' ELSE '22H-06H' END)::shift_types_scheduled, "
+             "(CASE WHEN d::date < :today THEN 'completed' ELSE 'pending' END)::control_status, now() "
+             "FROM control_parameters p, generate_series(:start, :today + 1, interval '1 day') d, "
+             "generate_series(0, :frequency - 1) h WHERE p.stage_id = :stage"),
+            ("INSERT INTO optimized_measurements (parameter_id, operator_name, measurement_date, measurement_time, "
+             "shift, numeric_value, is_conforming, created_at) "
+             "SELECT parameter_id, 'bench', scheduled_date, scheduled_time, shift::text::shift_types, 15, true, now() "
+             "FROM scheduled_controls WHERE scheduled_date <= :today"),
+        ]
+        for statement in statements:
+            db.session.execute(text(statement), dict(params, stage=stage.id, parameters=args.parameters))
+        db.session.commit()
+
+        with db.engine.begin() as connection:
+            for layout, indexed in [('plain', False), ('plain+date index', True)]:
+                for kind, source in LAYOUTS['partitioned'].items():
+                    target = LAYOUTS[layout][kind]
+                    column = 'scheduled_date' if kind == 'scheduled' else 'measurement_date'
+                    connection.execute(text(f"DROP TABLE IF EXISTS {target}"))
+                    connection.execute(text(f"CREATE TABLE {target} (LIKE {source} INCLUDING DEFAULTS)"))
+                    connection.execute(text(f"INSERT INTO {target} SELECT * FROM {source}"))
+                    connection.execute(text(f"ALTER TABLE {target} ADD PRIMARY KEY (id)"))
+                    if kind == 'scheduled':
+                        connection.execute(text(f"CREATE INDEX ON {target} (scheduled_date, scheduled_time) "
+                                                "WHERE status = 'pending'"))
+                    if indexed:
+                        connection.execute(text(f"CREATE INDEX ON {target} ({column})"))
+            connection.execute(text("ANALYZE"))
+
+            rows = connection.execute(text("SELECT count(*) FROM scheduled_controls")).scalar()
+            measured = connection.execute(text("SELECT count(*) FROM optimized_measurements")).scalar()
+        print(f"{rows} scheduled controls, {measured} measurements over {args.months} months "
+              f"(seeded in {timer.perf_counter() - started:.1f}s)\n")
+
+        results = {}
+        with db.engine.connect() as connection:
+            for query_name, template in QUERIES.items():
+                print(query_name)
+                for layout, tables in LAYOUTS.items():
+                    sql = text("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + template.format(**tables))
+                    timings, plan = [], None
+                    for _ in range(args.repeat + 1):
+                        explained = connection.execute(sql, params).scalar()[0]
+                        plan = explained['Plan']
+                        timings.append(explained['Execution Time'])
+                    scanned = _relations(plan)
+                    buffers = plan.get('Shared Hit Blocks', 0) + plan.get('Shared Read Blocks', 0)
+                    results.setdefault(query_name, {})[layout] = {
+                        'median_ms': round(statistics.median(timings[1:]), 3),
+                        'relations_scanned': len(scanned),
+                        'buffers': buffers,
+                    }
+                    print(f"  {layout:18s} {statistics.median(timings[1:]):9.3f} ms  "
+                          f"{len(scanned):3d} relation(s)  {buffers:7d} buffers")
+                print()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'rows': rows, 'measurements': measured, 'months': args.months, 'queries': results}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
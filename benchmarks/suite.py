@@ -0,0 +1,241 @@
+"""
+Repeatable benchmark suite
+
+Seeds a database with benchmarks/datagen.py (a throwaway SQLite file unless
+--database-url is given), then times the dashboard, report and list pages,
+SPC data, schedule generation, bulk measurement recording and the Excel
+exports. Each benchmark runs once to warm up and then --repeat times; the
+results are written as JSON to benchmarks/results/ and can be compared with
+an earlier run.
+
+    python benchmarks/suite.py --years 2
+    python benchmarks/suite.py --database-url postgresql://qc@localhost/qc_bench --years 5
+    python benchmarks/suite.py --compare benchmarks/results/<baseline>.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time as timer
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+PAGES = [
+    '/',
+    '/reports/daily',
+    '/reports/weekly',
+    '/reports/monthly',
+    '/reports/non_conformities',
+    '/reports/spc_charts',
+    '/reports/schedule_completion',
+    '/clay/',
+    '/press/',
+    '/dryer/',
+    '/kilns/biscuit',
+    '/kilns/email',
+    '/enamel/',
+]
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _measure(func, repeat):
+    func()
+    timings = []
+    for _ in range(repeat):
+        started = timer.perf_counter()
+        func()
+        timings.append((timer.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        'runs': repeat,
+        'min_ms': round(timings[0], 2),
+        'median_ms': round(statistics.median(timings), 2),
+        'p95_ms': round(timings[min(len(timings) - 1, int(round(0.95 * (len(timings) - 1))))], 2),
+        'max_ms': round(timings[-1], 2),
+    }
+
+def _benchmarks(app, db, client):
+    """(name, callable) pairs; each callable leaves the database as it found it"""
+    from models import ClayControl, DryerControl, PressControl, ControlParameter, ScheduledControl
+    from services.control_sheet_service import ControlSheetService
+    from services.measurement_service import MeasurementService
+    from services.scheduling_service import SchedulingService
+    from utils.helpers import get_control_chart_data
+
+    benchmarks = []
+
+    def page(url):
+        def run():
+            response = client.get(url)
+            # Streamed pages render while the body is read
+            response.get_data()
+            if response.status_code != 200:
+                raise RuntimeError(f"GET {url} returned {response.status_code}")
+        return run
+
+    for url in PAGES:
+        benchmarks.append((f"page {url}", page(url)))
+
+    def spc_data():
+        get_control_chart_data(ClayControl, 'humidity_after_prep', days=365)
+        get_control_chart_data(PressControl, 'thickness', days=365)
+        get_control_chart_data(DryerControl, 'residual_humidity', days=365)
+    benchmarks.append(('spc data 365 days', spc_data))
+
+    future = date.today() + timedelta(days=3650)
+
+    def schedule():
+        SchedulingService.generate_daily_schedule(future)
+        ScheduledControl.query.filter_by(scheduled_date=future).delete()
+        db.session.commit()
+    benchmarks.append(('generate daily schedule', schedule))
+
+    parameter = ControlParameter.query.filter_by(control_type='numeric', active=True).first()
+
+    def bulk_measurements():
+        batch = [{'date': future, 'time': f'{hour:02d}:00', 'value': float(parameter.target_value or parameter.min_value or 1)}
+                 for hour in range(24)] * 10
+        results = MeasurementService.record_bulk_measurements(
+            [{'parameter_id': parameter.id, 'operator_name': 'bench', 'measurement_data': data} for data in batch])
+        from models import OptimizedMeasurement
+        OptimizedMeasurement.query.filter_by(measurement_date=future).delete()
+        db.session.commit()
+        return results
+    if parameter:
+        benchmarks.append(('record 240 measurements', bulk_measurements))
+
+    last_day = date.today() - timedelta(days=1)
+    benchmarks.append(('daily control sheet', lambda: ControlSheetService.generate_daily_control_sheet(last_day)))
+    benchmarks.append(('monthly control sheets',
+                       lambda: ControlSheetService.generate_monthly_control_sheets(last_day.year, last_day.month)))
+    benchmarks.append(('weekly control sheet',
+                       lambda: ControlSheetService.generate_weekly_control_sheet(last_day - timedelta(days=6))))
+
+    if os.path.exists(os.path.join(ROOT, 'templates', 'humidity_template.xls')):
+        from excel_export import ExcelExporter
+
+        def humidity_export():
+            clay = ClayControl.query.order_by(ClayControl.date.desc(), ClayControl.id.desc()).first()
+            path, _ = ExcelExporter().export_humidity_data({
+                'date': clay.date, 'shift': clay.shift, 'controller': 'admin',
+                'humidity_before_prep': clay.humidity_before_prep,
+                'humidity_after_sieving': clay.humidity_after_sieving,
+                'humidity_after_prep': clay.humidity_after_prep,
+                'measurement_time_1': clay.measurement_time_1, 'measurement_time_2': clay.measurement_time_2,
+                'measurement_time_3': None, 'notes': None,
+            })
+            os.remove(path)
+        benchmarks.append(('excel humidity export', humidity_export))
+
+    return benchmarks
+
+def run_suite(args):
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='qc-suite-'), 'suite.db')}"
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+    sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+    import logging
+    logging.disable(logging.CRITICAL)
+    from app import app, db
+    from datagen import generate_plant_data
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    results = {
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'dialect': None,
+        'seed': args.seed,
+        'years': args.years,
+        'nc_rate': args.nc_rate,
+        'drift': args.drift,
+        'benchmarks': {},
+    }
+
+    with app.app_context():
+        results['dialect'] = db.engine.dialect.name
+        if not args.skip_seed:
+            started = timer.perf_counter()
+            results['rows'] = generate_plant_data(args.years, args.seed, args.nc_rate, args.drift)
+            results['seed_seconds'] = round(timer.perf_counter() - started, 2)
+            print(f"seeded {sum(results['rows'].values())} rows in {results['seed_seconds']}s")
+
+        client = app.test_client()
+        response = client.post('/auth/login', data={'username': 'admin', 'password': 'admin123'})
+        if response.status_code != 302:
+            raise SystemExit('could not log in as admin')
+
+        for name, func in _benchmarks(app, db, client):
+            if args.only and not any(pattern in name for pattern in args.only):
+                continue
+            results['benchmarks'][name] = stats = _measure(func, args.repeat)
+            print(f"{name:36s} median {stats['median_ms']:9.1f} ms   p95 {stats['p95_ms']:9.1f} ms")
+
+    return results
+
+def compare(current, baseline, threshold):
+    """Print median ratios against a baseline run; returns the regressed benchmarks"""
+    regressions = []
+    print(f"\nagainst {baseline.get('commit')} ({baseline.get('dialect')}, {baseline.get('started_at')})")
+    for name, stats in current['benchmarks'].items():
+        before = baseline.get('benchmarks', {}).get(name)
+        if not before or not before['median_ms']:
+            print(f"{name:36s} (new)")
+            continue
+        ratio = stats['median_ms'] / before['median_ms']
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        print(f"{name:36s} {before['median_ms']:9.1f} -> {stats['median_ms']:9.1f} ms  x{ratio:5.2f}{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--database-url', help='defaults to a temporary SQLite database')
+    parser.add_argument('--years', type=float, default=1)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--nc-rate', type=float, default=0.05)
+    parser.add_argument('--drift', type=float, default=0.3)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--skip-seed', action='store_true', help='benchmark the existing data')
+    parser.add_argument('--only', action='append', help='run benchmarks whose name contains this text')
+    parser.add_argument('--output', help='result file (default benchmarks/results/<timestamp>_<dialect>.json)')
+    parser.add_argument('--compare', help='baseline result file')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed slowdown before flagging (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    results = run_suite(args)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now().strftime('%Y%m%dT%H%M%S')}_{results['dialect']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2, default=str)
+    print(f"results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
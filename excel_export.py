@@ -10,6 +10,7 @@ from openpyxl.styles import Font, Alignment, Border, Side
 import shutil
 import os
 from datetime import datetime
+from utils.metrics import timed_export
 
 class ExcelExporter:
     def __init__(self):
@@ -20,6 +21,7 @@ class ExcelExporter:
         if not os.path.exists(self.exports_dir):
             os.makedirs(self.exports_dir)
     
+    @timed_export('excel_humidity')
     def export_humidity_data(self, clay_control_data, export_type="combined"):
         """Export humidity control data to Excel template"""
         template_file = os.path.join(self.template_dir, "humidity_template.xls")
@@ -53,6 +55,7 @@ class ExcelExporter:
             if os.path.exists(temp_xlsx):
                 os.remove(temp_xlsx)
     
+    @timed_export('excel_analysis')
     def export_analysis_data(self, clay_control_data, export_type="combined"):
         """Export analysis control data to Excel template"""
         template_file = os.path.join(self.template_dir, "analysis_template.xls")
@@ -1,6 +1,6 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, FloatField, SelectField, TextAreaField, IntegerField, DateField, TimeField
-from wtforms.validators import DataRequired, NumberRange, Optional
+from wtforms import Form, StringField, FloatField, SelectField, TextAreaField, IntegerField, DateField, TimeField, FieldList, FormField
+from wtforms.validators import DataRequired, NumberRange, Optional, ValidationError
 from datetime import date
 
 class ClayControlForm(FlaskForm):
@@ -344,3 +344,102 @@ class ExternalTestForm(FlaskForm):
     laboratory = StringField('Laboratoire', default='CETEMCO')
     
     notes = TextAreaField('Notes')
+
+# Batch (grid) entry: every measurement of a shift in one form, row rows-N
+# holding measurement number N+1. Blank rows are skipped; REQUIRED fields
+# are only checked on the rows that were filled in.
+class BatchForm(FlaskForm):
+    def validate_rows(self, field):
+        if any(row_number(entry) > field.max_entries for entry in field.entries if not entry.form.is_blank()):
+            raise ValidationError(f'Au plus {field.max_entries} mesures par équipe.')
+
+def row_number(entry):
+    """Measurement number of a grid row, from its posted index (rows-0 is #1)"""
+    return int(entry.name.rsplit('-', 1)[1]) + 1
+
+class BatchRowForm(Form):
+    REQUIRED = ()
+
+    def values(self):
+        return {name: field.data for name, field in self._fields.items()}
+
+    def is_blank(self):
+        return all(value in (None, '') for value in self.values().values())
+
+    def validate(self, extra_validators=None):
+        valid = super().validate(extra_validators)
+        if self.is_blank():
+            return True
+        for name in self.REQUIRED:
+            field = self._fields[name]
+            if field.data in (None, ''):
+                field.errors = list(field.errors) + ['Ce champ est requis.']
+                valid = False
+        return valid
+
+class PressBatchRowForm(BatchRowForm):
+    REQUIRED = ('thickness', 'wet_weight')
+
+    measurement_time = TimeField('Heure', validators=[Optional()])
+    thickness = FloatField('Épaisseur (mm)', validators=[Optional(), NumberRange(min=0)])
+    wet_weight = FloatField('Poids Humide (g)', validators=[Optional(), NumberRange(min=0)])
+    weight_output_1 = FloatField('Sortie 1 (g)', validators=[Optional(), NumberRange(min=0)])
+    weight_output_2 = FloatField('Sortie 2 (g)', validators=[Optional(), NumberRange(min=0)])
+    defect_grains = FloatField('Grains (%)', validators=[Optional(), NumberRange(min=0, max=100)])
+    defect_cracks = FloatField('Fissures (%)', validators=[Optional(), NumberRange(min=0, max=100)])
+    defect_cleaning = FloatField('Nettoyage (%)', validators=[Optional(), NumberRange(min=0, max=100)])
+    defect_foliage = FloatField('Feuillage (%)', validators=[Optional(), NumberRange(min=0, max=100)])
+    defect_chipping = FloatField('Ébrochage (%)', validators=[Optional(), NumberRange(min=0, max=100)])
+    notes = StringField('Notes')
+
+class PressBatchForm(BatchForm):
+    date = DateField('Date', default=date.today, validators=[DataRequired()])
+    shift = SelectField('Équipe', choices=[('morning', 'Matin'), ('afternoon', 'Après-midi'), ('night', 'Nuit')])
+    format_type = SelectField('Format', choices=[('20x20', '20x20'), ('25x40', '25x40'), ('25x50', '25x50')], validators=[DataRequired()])
+    rows = FieldList(FormField(PressBatchRowForm), min_entries=6, max_entries=6)
+
+class DryerBatchRowForm(BatchRowForm):
+    REQUIRED = ('residual_humidity',)
+
+    residual_humidity = FloatField('Humidité Résiduelle (%)', validators=[Optional(), NumberRange(min=0, max=100)])
+    defect_grains = FloatField('Grains (%)', validators=[Optional(), NumberRange(min=0, max=100)])
+    defect_cracks = FloatField('Fissures (%)', validators=[Optional(), NumberRange(min=0, max=100)])
+    defect_cleaning = FloatField('Nettoyage (%)', validators=[Optional(), NumberRange(min=0, max=100)])
+    defect_foliage = FloatField('Feuillage (%)', validators=[Optional(), NumberRange(min=0, max=100)])
+    defect_chipping = FloatField('Ébrochage (%)', validators=[Optional(), NumberRange(min=0, max=100)])
+    notes = StringField('Notes')
+
+class DryerBatchForm(BatchForm):
+    date = DateField('Date', default=date.today, validators=[DataRequired()])
+    shift = SelectField('Équipe', choices=[('morning', 'Matin'), ('afternoon', 'Après-midi'), ('night', 'Nuit')])
+    rows = FieldList(FormField(DryerBatchRowForm), min_entries=6, max_entries=6)
+
+class EnamelBatchRowForm(BatchRowForm):
+    measurement_time = TimeField('Heure', validators=[Optional()])
+    density = FloatField('Densité (g/l)', validators=[Optional(), NumberRange(min=0)])
+    viscosity = FloatField('Viscosité (s)', validators=[Optional(), NumberRange(min=0)])
+    water_grammage = FloatField('Grammage Eau (g)', validators=[Optional(), NumberRange(min=0)])
+    enamel_grammage = FloatField('Grammage Émail (g)', validators=[Optional(), NumberRange(min=0)])
+    sieve_refusal = FloatField('Refus Tamis (%)', validators=[Optional(), NumberRange(min=0, max=100)])
+    notes = StringField('Notes')
+
+class EnamelBatchForm(BatchForm):
+    date = DateField('Date', default=date.today, validators=[DataRequired()])
+    shift = SelectField('Équipe', choices=[('morning', 'Matin'), ('afternoon', 'Après-midi'), ('night', 'Nuit')])
+    measurement_type = SelectField('Type de Mesure', choices=[('pde', 'PDE'), ('production_line', 'Ligne de Production')], validators=[DataRequired()])
+    enamel_type = SelectField('Type d\'Émail', choices=[('engobe', 'Engobe'), ('email', 'Émail'), ('mate', 'Mat')], validators=[DataRequired()])
+    format_type = SelectField('Format', choices=[('20x20', '20x20'), ('25x40', '25x40'), ('25x50', '25x50')])
+    rows = FieldList(FormField(EnamelBatchRowForm), min_entries=12, max_entries=12)
+
+class DigitalDecorationBatchRowForm(BatchRowForm):
+    REQUIRED = ('sharpness', 'offset', 'tonality')
+
+    sharpness = SelectField('Netteté', choices=[('', '—'), ('pass', 'Réussi'), ('fail', 'Échec')], validators=[Optional()])
+    offset = SelectField('Décalage', choices=[('', '—'), ('pass', 'Réussi'), ('fail', 'Échec')], validators=[Optional()])
+    tonality = SelectField('Tonalité', choices=[('', '—'), ('pass', 'Réussi'), ('fail', 'Échec')], validators=[Optional()])
+    notes = StringField('Notes')
+
+class DigitalDecorationBatchForm(BatchForm):
+    date = DateField('Date', default=date.today, validators=[DataRequired()])
+    shift = SelectField('Équipe', choices=[('morning', 'Matin'), ('afternoon', 'Après-midi'), ('night', 'Nuit')])
+    rows = FieldList(FormField(DigitalDecorationBatchRowForm), min_entries=12, max_entries=12)
@@ -65,5 +65,7 @@ class BulkSpecificationForm(FlaskForm):
     action = SelectField('Action',
                         choices=[('reset_defaults', 'Réinitialiser aux Valeurs par Défaut'),
                                ('export', 'Exporter les Spécifications Actuelles'),
-                               ('deactivate_all', 'Désactiver Tout')],
+                               ('deactivate_all', 'Désactiver Tout'),
+                               ('revalidate_preview', 'Aperçu de la Revalidation des Enregistrements'),
+                               ('revalidate', 'Revalider les Enregistrements Existants')],
                         validators=[DataRequired()])
\ No newline at end of file
@@ -0,0 +1,22 @@
+"""
+Gunicorn settings picked up automatically from the working directory
+
+Workers share Prometheus metrics through files in PROMETHEUS_MULTIPROC_DIR
+(see utils/metrics.py). The directory is emptied when the master starts and
+the files of dead workers are merged into the totals.
+"""
+
+import os
+import shutil
+import tempfile
+
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'tileqc-metrics'))
+
+def on_starting(server):
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
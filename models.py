@@ -2,6 +2,8 @@ from app import db
 from flask_login import UserMixin
 from datetime import datetime, date, time
 from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from utils.partitioning import MONTHLY_PARTITIONS, partition_args
 import json
 
 class User(UserMixin, db.Model):
@@ -14,6 +16,8 @@ class User(UserMixin, db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class ClayControl(db.Model):
+    __table_args__ = (db.Index('ix_clay_control_date_id', 'date', 'id'),)  # keyset pagination
+    
     id = db.Column(db.Integer, primary_key=True)
     date = db.Column(db.Date, nullable=False, default=date.today)
     shift = db.Column(db.String(20))  # morning, afternoon, night
@@ -40,6 +44,8 @@ class ClayControl(db.Model):
     controller = db.relationship('User', backref='clay_controls')
 
 class PressControl(db.Model):
+    __table_args__ = (db.Index('ix_press_control_date_id', 'date', 'id'),)  # keyset pagination
+    
     id = db.Column(db.Integer, primary_key=True)
     date = db.Column(db.Date, nullable=False, default=date.today)
     shift = db.Column(db.String(20))
@@ -74,6 +80,8 @@ class PressControl(db.Model):
     controller = db.relationship('User', backref='press_controls')
 
 class DryerControl(db.Model):
+    __table_args__ = (db.Index('ix_dryer_control_date_id', 'date', 'id'),)  # keyset pagination
+    
     id = db.Column(db.Integer, primary_key=True)
     date = db.Column(db.Date, nullable=False, default=date.today)
     shift = db.Column(db.String(20))
@@ -98,6 +106,8 @@ class DryerControl(db.Model):
     controller = db.relationship('User', backref='dryer_controls')
 
 class BiscuitKilnControl(db.Model):
+    __table_args__ = (db.Index('ix_biscuit_kiln_control_date_id', 'date', 'id'),)  # keyset pagination
+    
     id = db.Column(db.Integer, primary_key=True)
     date = db.Column(db.Date, nullable=False, default=date.today)
     shift = db.Column(db.String(20))
@@ -124,6 +134,8 @@ class BiscuitKilnControl(db.Model):
     controller = db.relationship('User', backref='biscuit_kiln_controls')
 
 class EmailKilnControl(db.Model):
+    __table_args__ = (db.Index('ix_email_kiln_control_date_id', 'date', 'id'),)  # keyset pagination
+    
     id = db.Column(db.Integer, primary_key=True)
     date = db.Column(db.Date, nullable=False, default=date.today)
     shift = db.Column(db.String(20))
@@ -170,6 +182,8 @@ class EmailKilnControl(db.Model):
     controller = db.relationship('User', backref='email_kiln_controls')
 
 class DimensionalTest(db.Model):
+    __table_args__ = (db.Index('ix_dimensional_test_date_id', 'date', 'id'),)  # keyset pagination
+    
     id = db.Column(db.Integer, primary_key=True)
     date = db.Column(db.Date, nullable=False, default=date.today)
     format_type = db.Column(db.String(10))
@@ -196,6 +210,8 @@ class DimensionalTest(db.Model):
     controller = db.relationship('User', backref='dimensional_tests')
 
 class EnamelControl(db.Model):
+    __table_args__ = (db.Index('ix_enamel_control_date_id', 'date', 'id'),)  # keyset pagination
+    
     id = db.Column(db.Integer, primary_key=True)
     date = db.Column(db.Date, nullable=False, default=date.today)
     shift = db.Column(db.String(20))
@@ -225,6 +241,8 @@ class EnamelControl(db.Model):
     controller = db.relationship('User', backref='enamel_controls')
 
 class DigitalDecoration(db.Model):
+    __table_args__ = (db.Index('ix_digital_decoration_date_id', 'date', 'id'),)  # keyset pagination
+    
     id = db.Column(db.Integer, primary_key=True)
     date = db.Column(db.Date, nullable=False, default=date.today)
     shift = db.Column(db.String(20))
@@ -244,6 +262,8 @@ class DigitalDecoration(db.Model):
     controller = db.relationship('User', backref='digital_decorations')
 
 class ExternalTest(db.Model):
+    __table_args__ = (db.Index('ix_external_test_date_id', 'date', 'id'),)  # keyset pagination
+    
     id = db.Column(db.Integer, primary_key=True)
     date = db.Column(db.Date, nullable=False, default=date.today)
     test_type = db.Column(db.String(50))  # thermal_shock, chemical_resistance, stain_resistance
@@ -324,49 +344,75 @@ class Specification(db.Model):
 @event.listens_for(ClayControl, 'before_update')
 def calculate_clay_compliance(mapper, connection, target):
     from utils.validators import validate_clay_control
-    target.compliance_status = validate_clay_control(target)
+    target.compliance_status = validate_clay_control(target, connection)
 
 @event.listens_for(PressControl, 'before_insert')
 @event.listens_for(PressControl, 'before_update')
 def calculate_press_compliance(mapper, connection, target):
     from utils.validators import validate_press_control
-    target.compliance_status = validate_press_control(target)
+    target.compliance_status = validate_press_control(target, connection)
 
 @event.listens_for(DryerControl, 'before_insert')
 @event.listens_for(DryerControl, 'before_update')
 def calculate_dryer_compliance(mapper, connection, target):
     from utils.validators import validate_dryer_control
-    target.compliance_status = validate_dryer_control(target)
+    target.compliance_status = validate_dryer_control(target, connection)
 
 @event.listens_for(BiscuitKilnControl, 'before_insert')
 @event.listens_for(BiscuitKilnControl, 'before_update')
 def calculate_biscuit_compliance(mapper, connection, target):
     from utils.validators import validate_biscuit_kiln_control
-    target.compliance_status = validate_biscuit_kiln_control(target)
+    target.compliance_status = validate_biscuit_kiln_control(target, connection)
 
 @event.listens_for(EmailKilnControl, 'before_insert')
 @event.listens_for(EmailKilnControl, 'before_update')
 def calculate_email_compliance(mapper, connection, target):
     from utils.validators import validate_email_kiln_control
-    target.compliance_status = validate_email_kiln_control(target)
+    target.compliance_status = validate_email_kiln_control(target, connection)
 
 @event.listens_for(DimensionalTest, 'before_insert')
 @event.listens_for(DimensionalTest, 'before_update')
 def calculate_dimensional_compliance(mapper, connection, target):
     from utils.validators import validate_dimensional_test
-    target.compliance_status = validate_dimensional_test(target)
+    target.compliance_status = validate_dimensional_test(target, connection)
 
 @event.listens_for(EnamelControl, 'before_insert')
 @event.listens_for(EnamelControl, 'before_update')
 def calculate_enamel_compliance(mapper, connection, target):
     from utils.validators import validate_enamel_control
-    target.compliance_status = validate_enamel_control(target)
+    target.compliance_status = validate_enamel_control(target, connection)
 
 @event.listens_for(DigitalDecoration, 'before_insert')
 @event.listens_for(DigitalDecoration, 'before_update')
 def calculate_digital_compliance(mapper, connection, target):
     from utils.validators import validate_digital_decoration
-    target.compliance_status = validate_digital_decoration(target)
+    target.compliance_status = validate_digital_decoration(target, connection)
+
+@event.listens_for(Specification, 'after_insert')
+@event.listens_for(Specification, 'after_update')
+@event.listens_for(Specification, 'after_delete')
+def note_specification_change(mapper, connection, target):
+    # Flushed, not committed yet: the rules are recompiled once it is
+    object_session(target).info['specifications_changed'] = True
+
+@event.listens_for(Session, 'after_commit')
+def invalidate_compliance_rules(session):
+    if session.info.pop('specifications_changed', False):
+        from utils.rules_engine import rules_engine
+        rules_engine.invalidate()
+
+@event.listens_for(Session, 'after_rollback')
+def discard_specification_change(session):
+    # Rules compiled during the flush may hold the rolled back rows
+    if session.info.pop('specifications_changed', False):
+        from utils.rules_engine import rules_engine
+        rules_engine.invalidate()
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def invalidate_cached_user(mapper, connection, target):
+    from utils.user_cache import user_cache
+    user_cache.invalidate(target.id)
 
 # New Optimized Models for Automated Scheduling System
 
@@ -421,10 +467,12 @@ class ControlParameter(db.Model):
 
 class OptimizedMeasurement(db.Model):
     __tablename__ = 'optimized_measurements'
-    id = db.Column(db.Integer, primary_key=True)
+    __table_args__ = partition_args('measurement_date')
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     parameter_id = db.Column(db.Integer, db.ForeignKey('control_parameters.id'), nullable=False)
     operator_name = db.Column(db.String(100), nullable=False)
-    measurement_date = db.Column(db.Date, nullable=False)
+    measurement_date = db.Column(db.Date, nullable=False, primary_key=MONTHLY_PARTITIONS)
     measurement_time = db.Column(db.Time, nullable=False)
     shift = db.Column(db.Enum('06H-14H', '14H-22H', '22H-06H', name='shift_types'))
     format = db.Column(db.String(20))
@@ -450,24 +498,38 @@ class OptimizedMeasurement(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Rows are identified by id even when the table key includes the month
+    __mapper_args__ = {'primary_key': [id]}
+    
     def __repr__(self):
         return f'<OptimizedMeasurement {self.id} - {self.measurement_date}>'
 
 class ScheduledControl(db.Model):
     __tablename__ = 'scheduled_controls'
-    id = db.Column(db.Integer, primary_key=True)
+    __table_args__ = (
+        # Overdue detection only ever scans pending controls
+        db.Index('ix_scheduled_controls_overdue', 'scheduled_date', 'scheduled_time',
+                 postgresql_where=db.text("status = 'pending'"),
+                 sqlite_where=db.text("status = 'pending'")),
+    ) + partition_args('scheduled_date')
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     parameter_id = db.Column(db.Integer, db.ForeignKey('control_parameters.id'), nullable=False)
-    scheduled_date = db.Column(db.Date, nullable=False)
+    scheduled_date = db.Column(db.Date, nullable=False, primary_key=MONTHLY_PARTITIONS)
     scheduled_time = db.Column(db.Time, nullable=False)
     shift = db.Column(db.Enum('06H-14H', '14H-22H', '22H-06H', name='shift_types_scheduled'))
     status = db.Column(db.Enum('pending', 'completed', 'skipped', 'overdue', name='control_status'), default='pending')
     assigned_operator = db.Column(db.String(100))
     completed_at = db.Column(db.DateTime)
-    measurement_id = db.Column(db.Integer, db.ForeignKey('optimized_measurements.id'))
+    # No foreign key constraint can reference a partitioned optimized_measurements
+    measurement_id = db.Column(db.Integer, *([] if MONTHLY_PARTITIONS else [db.ForeignKey('optimized_measurements.id')]))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     parameter = db.relationship('ControlParameter', backref='scheduled_controls')
-    measurement = db.relationship('OptimizedMeasurement', backref='scheduled_control')
+    measurement = db.relationship('OptimizedMeasurement', backref='scheduled_control',
+                                  primaryjoin='foreign(ScheduledControl.measurement_id) == OptimizedMeasurement.id')
+    
+    __mapper_args__ = {'primary_key': [id]}
     
     def __repr__(self):
         return f'<ScheduledControl {self.id} - {self.scheduled_date} - {self.status}>'
@@ -488,3 +550,33 @@ class ControlSheet(db.Model):
     
     def __repr__(self):
         return f'<ControlSheet {self.id}: {self.sheet_type} - {self.reference_date}>'
+
+class ArchivedDay(db.Model):
+    """Summary of the rows of one table and day moved to the archive"""
+    __tablename__ = 'archived_days'
+    __table_args__ = (db.UniqueConstraint('table_name', 'day', name='uq_archived_days_table_day'),)
+    
+    id = db.Column(db.Integer, primary_key=True)
+    table_name = db.Column(db.String(50), nullable=False)
+    day = db.Column(db.Date, nullable=False, index=True)
+    row_count = db.Column(db.Integer, nullable=False, default=0)
+    counts = db.Column(db.JSON)  # {status: {shift: count}}
+    archive_file = db.Column(db.String(500))
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<ArchivedDay {self.table_name} {self.day}: {self.row_count}>'
+
+class SyncedSubmission(db.Model):
+    """Client-generated id of a record received through offline sync, so a resent submission is not saved twice"""
+    __tablename__ = 'synced_submissions'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    client_id = db.Column(db.String(36), unique=True, nullable=False)
+    control_type = db.Column(db.String(50), nullable=False)
+    record_id = db.Column(db.Integer, nullable=False)
+    controller_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    synced_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<SyncedSubmission {self.client_id} -> {self.control_type} {self.record_id}>'
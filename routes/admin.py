@@ -0,0 +1,72 @@
+from flask import Blueprint, render_template, request, redirect, url_for, flash, send_file, abort
+from flask_login import login_required, current_user
+from utils.profiling import list_profiles, get_profile, top_functions
+
+admin_bp = Blueprint('admin', __name__)
+
+def _admin_only():
+    if current_user.role != 'admin':
+        flash('Seuls les administrateurs peuvent consulter les profils', 'error')
+        return redirect(url_for('main.dashboard'))
+    return None
+
+@admin_bp.route('/profiles')
+@login_required
+def profiles():
+    """Stored request profiles grouped by endpoint"""
+    denied = _admin_only()
+    if denied:
+        return denied
+    
+    endpoints = []
+    for endpoint, infos in list_profiles().items():
+        endpoints.append({
+            'endpoint': endpoint,
+            'count': len(infos),
+            'latest': infos[0].recorded_at,
+            'mean_ms': sum(info.duration_ms for info in infos) / len(infos),
+            'max_ms': max(info.duration_ms for info in infos)
+        })
+    endpoints.sort(key=lambda e: e['mean_ms'], reverse=True)
+    
+    return render_template('admin/profiles.html', endpoints=endpoints)
+
+@admin_bp.route('/profiles/<endpoint_name>')
+@login_required
+def profile_endpoint(endpoint_name):
+    """Top functions of an endpoint, merged over its stored profiles or for one profile"""
+    denied = _admin_only()
+    if denied:
+        return denied
+    
+    infos = list_profiles().get(endpoint_name)
+    if not infos:
+        abort(404)
+    
+    name = request.args.get('profile')
+    sort = request.args.get('sort', 'cumulative')
+    selected = [info for info in infos if info.name == name] if name else infos
+    if not selected:
+        abort(404)
+    
+    functions = top_functions([info.path for info in selected], sort=sort)
+    
+    return render_template('admin/profile_endpoint.html',
+                         endpoint=endpoint_name,
+                         profiles=infos,
+                         selected=name,
+                         sort=sort,
+                         functions=functions)
+
+@admin_bp.route('/profiles/<endpoint_name>/<name>/download')
+@login_required
+def profile_download(endpoint_name, name):
+    """Raw .prof file, for snakeviz or pstats"""
+    denied = _admin_only()
+    if denied:
+        return denied
+    
+    info = get_profile(endpoint_name, name)
+    if info is None:
+        abort(404)
+    return send_file(info.path, as_attachment=True, download_name=f"{endpoint_name}_{name}")
@@ -1,7 +1,8 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
-from flask_login import login_user, logout_user, login_required
+from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import check_password_hash
 from models import User
+from utils.user_cache import user_cache
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -15,6 +16,7 @@ def login():
         
         if user and check_password_hash(user.password_hash, password):
             login_user(user)
+            user_cache.put(user)
             next_page = request.args.get('next')
             return redirect(next_page) if next_page else redirect(url_for('main.dashboard'))
         else:
@@ -25,5 +27,6 @@ def login():
 @auth_bp.route('/logout')
 @login_required
 def logout():
+    user_cache.invalidate(current_user.id)
     logout_user()
     return redirect(url_for('auth.login'))
@@ -3,6 +3,7 @@ from flask_login import login_required, current_user
 from forms import ClayControlForm, HumidityBeforePrepForm, HumidityAfterSievingForm, HumidityAfterPrepForm, GranulometryForm, CalciumCarbonateForm, CombinedHumidityForm, CombinedAnalysisForm
 from models import ClayControl, DryerControl, PressControl
 from app import db
+from utils.pagination import paginate_by_date
 from datetime import date, datetime
 from excel_export import ExcelExporter
 import os
@@ -13,9 +14,7 @@ clay_bp = Blueprint('clay', __name__)
 @clay_bp.route('/')
 @login_required
 def clay_controls():
-    page = request.args.get('page', 1, type=int)
-    controls = ClayControl.query.order_by(ClayControl.date.desc()).paginate(
-        page=page, per_page=20, error_out=False)
+    controls = paginate_by_date(ClayControl.query, ClayControl)
     return render_template('clay/clay_control.html', controls=controls)
 
 @clay_bp.route('/add', methods=['GET', 'POST'])
@@ -134,7 +133,13 @@ def delete_clay_control(id):
 @login_required
 def clay_trend_api(parameter):
     from utils.helpers import get_control_chart_data
-    data = get_control_chart_data(ClayControl, parameter, days=30)
+    from utils.control_registry import get_trend_model
+    
+    if get_trend_model('clay', parameter) is None:
+        return jsonify({'error': f'Unknown parameter: {parameter}'}), 404
+    
+    max_points = request.args.get('max_points', type=int)
+    data = get_control_chart_data(ClayControl, parameter, days=30, max_points=max_points)
     return jsonify(data)
 
 # Separate routes for each clay sub-control
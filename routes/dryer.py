@@ -1,17 +1,17 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_required, current_user
-from forms import DryerControlForm, DryerHumidityForm, DryerAspectForm
+from forms import DryerControlForm, DryerBatchForm, DryerHumidityForm, DryerAspectForm
 from models import DryerControl
 from app import db
+from utils.pagination import paginate_by_date
+from services.batch_entry_service import BatchEntryService
 
 dryer_bp = Blueprint('dryer', __name__)
 
 @dryer_bp.route('/')
 @login_required
 def dryer_controls():
-    page = request.args.get('page', 1, type=int)
-    controls = DryerControl.query.order_by(DryerControl.date.desc()).paginate(
-        page=page, per_page=20, error_out=False)
+    controls = paginate_by_date(DryerControl.query, DryerControl)
     return render_template('dryer/dryer_control.html', controls=controls)
 
 @dryer_bp.route('/add', methods=['GET', 'POST'])
@@ -42,6 +42,29 @@ def add_dryer_control():
     
     return render_template('dryer/dryer_control.html', form=form)
 
+@dryer_bp.route('/batch', methods=['GET', 'POST'])
+@login_required
+def batch_dryer_control():
+    """Grid entry of all the dryer measurements of a shift"""
+    form = DryerBatchForm()
+    wants_json = request.accept_mimetypes.best == 'application/json'
+    
+    if form.validate_on_submit():
+        results = BatchEntryService.submit(form, DryerControl, 'dryer', ['date', 'shift'], current_user.id)
+        if wants_json:
+            return jsonify(results)
+        if results:
+            rejected = sum(1 for result in results if result['compliance_status'] != 'compliant')
+            flash(f'{len(results)} mesures séchoir enregistrées ({rejected} non conformes)', 'warning' if rejected else 'success')
+            return redirect(url_for('dryer.batch_dryer_control', saved=','.join(str(result['id']) for result in results)))
+        flash('Aucune mesure saisie', 'warning')
+    elif wants_json and request.method == 'POST':
+        return jsonify({'errors': form.errors}), 400
+    
+    results = BatchEntryService.results(DryerControl, 'dryer', BatchEntryService.parse_ids(request.args.get('saved')))
+    return render_template('batch/batch_entry.html', form=form, results=results,
+                           title='Saisie par Équipe - Contrôle Séchoir', list_url=url_for('dryer.dryer_controls'))
+
 @dryer_bp.route('/edit/<int:id>', methods=['GET', 'POST'])
 @login_required
 def edit_dryer_control(id):
@@ -71,9 +94,7 @@ def edit_dryer_control(id):
 @dryer_bp.route('/humidity')
 @login_required
 def dryer_humidity():
-    page = request.args.get('page', 1, type=int)
-    controls = DryerControl.query.filter(DryerControl.residual_humidity.isnot(None)).order_by(DryerControl.date.desc()).paginate(
-        page=page, per_page=20, error_out=False)
+    controls = paginate_by_date(DryerControl.query.filter(DryerControl.residual_humidity.isnot(None)), DryerControl)
     return render_template('dryer/dryer_humidity.html', controls=controls)
 
 @dryer_bp.route('/humidity/add', methods=['GET', 'POST'])
@@ -135,15 +156,14 @@ def edit_dryer_humidity(id):
 @dryer_bp.route('/aspect')
 @login_required
 def dryer_aspect():
-    page = request.args.get('page', 1, type=int)
-    controls = DryerControl.query.filter(
+    query = DryerControl.query.filter(
         (DryerControl.defect_grains.isnot(None)) | 
         (DryerControl.defect_cracks.isnot(None)) |
         (DryerControl.defect_cleaning.isnot(None)) |
         (DryerControl.defect_foliage.isnot(None)) |
         (DryerControl.defect_chipping.isnot(None))
-    ).order_by(DryerControl.date.desc()).paginate(
-        page=page, per_page=20, error_out=False)
+    )
+    controls = paginate_by_date(query, DryerControl)
     return render_template('dryer/dryer_aspect.html', controls=controls)
 
 @dryer_bp.route('/aspect/add', methods=['GET', 'POST'])
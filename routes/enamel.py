@@ -1,23 +1,23 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_required, current_user
-from forms import EnamelControlForm
+from forms import EnamelControlForm, EnamelBatchForm
 from models import EnamelControl
 from app import db
+from utils.pagination import paginate_by_date
+from services.batch_entry_service import BatchEntryService
 
 enamel_bp = Blueprint('enamel', __name__)
 
 @enamel_bp.route('/')
 @login_required
 def enamel_controls():
-    page = request.args.get('page', 1, type=int)
     enamel_filter = request.args.get('enamel_type')
     
     query = EnamelControl.query
     if enamel_filter:
         query = query.filter(EnamelControl.enamel_type == enamel_filter)
     
-    controls = query.order_by(EnamelControl.date.desc()).paginate(
-        page=page, per_page=20, error_out=False)
+    controls = paginate_by_date(query, EnamelControl)
     
     return render_template('enamel/enamel_control.html', controls=controls, enamel_filter=enamel_filter)
 
@@ -52,6 +52,29 @@ def add_enamel_control():
     
     return render_template('enamel/enamel_control.html', form=form)
 
+@enamel_bp.route('/batch', methods=['GET', 'POST'])
+@login_required
+def batch_enamel_control():
+    """Grid entry of all the enamel measurements of a shift"""
+    form = EnamelBatchForm()
+    wants_json = request.accept_mimetypes.best == 'application/json'
+    
+    if form.validate_on_submit():
+        results = BatchEntryService.submit(form, EnamelControl, 'enamel', ['date', 'shift', 'measurement_type', 'enamel_type', 'format_type'], current_user.id)
+        if wants_json:
+            return jsonify(results)
+        if results:
+            rejected = sum(1 for result in results if result['compliance_status'] != 'compliant')
+            flash(f'{len(results)} mesures émail enregistrées ({rejected} non conformes)', 'warning' if rejected else 'success')
+            return redirect(url_for('enamel.batch_enamel_control', saved=','.join(str(result['id']) for result in results)))
+        flash('Aucune mesure saisie', 'warning')
+    elif wants_json and request.method == 'POST':
+        return jsonify({'errors': form.errors}), 400
+    
+    results = BatchEntryService.results(EnamelControl, 'enamel', BatchEntryService.parse_ids(request.args.get('saved')))
+    return render_template('batch/batch_entry.html', form=form, results=results,
+                           title='Saisie par Équipe - Contrôle Émaillage', list_url=url_for('enamel.enamel_controls'))
+
 @enamel_bp.route('/edit/<int:id>', methods=['GET', 'POST'])
 @login_required
 def edit_enamel_control(id):
@@ -3,15 +3,14 @@ from flask_login import login_required, current_user
 from forms import BiscuitKilnForm, EmailKilnForm
 from models import BiscuitKilnControl, EmailKilnControl
 from app import db
+from utils.pagination import paginate_by_date
 
 kilns_bp = Blueprint('kilns', __name__)
 
 @kilns_bp.route('/biscuit')
 @login_required
 def biscuit_kiln_controls():
-    page = request.args.get('page', 1, type=int)
-    controls = BiscuitKilnControl.query.order_by(BiscuitKilnControl.date.desc()).paginate(
-        page=page, per_page=20, error_out=False)
+    controls = paginate_by_date(BiscuitKilnControl.query, BiscuitKilnControl)
     return render_template('kilns/biscuit_kiln.html', controls=controls)
 
 @kilns_bp.route('/biscuit/add', methods=['GET', 'POST'])
@@ -47,9 +46,7 @@ def add_biscuit_control():
 @kilns_bp.route('/email')
 @login_required
 def email_kiln_controls():
-    page = request.args.get('page', 1, type=int)
-    controls = EmailKilnControl.query.order_by(EmailKilnControl.date.desc()).paginate(
-        page=page, per_page=20, error_out=False)
+    controls = paginate_by_date(EmailKilnControl.query, EmailKilnControl)
     return render_template('kilns/email_kiln.html', controls=controls)
 
 @kilns_bp.route('/email/add', methods=['GET', 'POST'])
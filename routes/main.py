@@ -1,5 +1,8 @@
 from flask import Blueprint, render_template, request
 from flask_login import login_required, current_user
+from app import db
+from models import User
+from utils.read_routing import read_only
 from utils.helpers import get_dashboard_stats, get_recent_non_conformities, get_weekly_trend_data, get_format_distribution
 from datetime import date, timedelta
 import json
@@ -7,6 +10,7 @@ import json
 main_bp = Blueprint('main', __name__)
 
 @main_bp.route('/')
+@read_only
 @login_required
 def dashboard():
     # Get date filter from request
@@ -41,4 +45,6 @@ def dashboard():
 @main_bp.route('/profile')
 @login_required
 def profile():
-    return render_template('profile.html', user=current_user)
+    # The logged-in user is a cached snapshot; the profile lists its controls
+    user = db.session.get(User, current_user.id)
+    return render_template('profile.html', user=user)
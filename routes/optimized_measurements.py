@@ -3,34 +3,36 @@ from flask_login import login_required, current_user
 from models import db, ControlParameter, OptimizedMeasurement, ScheduledControl, ControlStage
 from services.measurement_service import MeasurementService
 from services.scheduling_service import SchedulingService
+from services.ingestion_service import IngestionService
 from datetime import date, datetime, time
+import io
 import json
 
 optimized_bp = Blueprint('optimized', __name__)
 
-# @optimized_bp.route('/dashboard')
-# @login_required
-# def dashboard():
-#     """Optimized dashboard showing scheduled controls and quick measurement entry"""
-#     return redirect(url_for('main.dashboard'))
+@optimized_bp.route('/dashboard')
+@login_required
+def dashboard():
+    """Optimized dashboard showing scheduled controls and quick measurement entry"""
+    return redirect(url_for('main.dashboard'))
 
-# @optimized_bp.route('/quick-measurement', methods=['GET', 'POST'])
-# @login_required
-# def quick_measurement():
-#     """Quick single measurement entry"""
-#     return redirect(url_for('main.dashboard'))
+@optimized_bp.route('/quick-measurement', methods=['GET', 'POST'])
+@login_required
+def quick_measurement():
+    """Quick single measurement entry"""
+    return redirect(url_for('main.dashboard'))
 
-# @optimized_bp.route('/bulk-measurement', methods=['GET', 'POST'])
-# @login_required
-# def bulk_measurement():
-#     """Bulk measurement entry for multiple parameters"""
-#     return redirect(url_for('main.dashboard'))
+@optimized_bp.route('/bulk-measurement', methods=['GET', 'POST'])
+@login_required
+def bulk_measurement():
+    """Bulk measurement entry for multiple parameters"""
+    return redirect(url_for('main.dashboard'))
 
-# @optimized_bp.route('/scheduled-controls')
-# @login_required
-# def scheduled_controls():
-#     """View scheduled controls with filtering options"""
-#     return redirect(url_for('main.dashboard'))
+@optimized_bp.route('/scheduled-controls')
+@login_required
+def scheduled_controls():
+    """View scheduled controls with filtering options"""
+    return redirect(url_for('main.dashboard'))
 
 @optimized_bp.route('/api/record-measurement', methods=['POST'])
 @login_required
@@ -53,6 +55,39 @@ def api_record_measurement():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+# Content types read as newline-delimited JSON, one measurement per line
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/jsonl', 'application/json-seq')
+
+@optimized_bp.route('/api/v1/measurements', methods=['POST'])
+@login_required
+def api_ingest_measurements():
+    """Batch ingestion API (v1) for line instruments and tablets
+    
+    The body is either NDJSON (one measurement per line, parsed as it is
+    read) or JSON: a list of measurements or {"measurements": [...]}. See
+    services/ingestion_service.py for the record format.
+    """
+    
+    if request.mimetype in NDJSON_MIMETYPES:
+        # Buffered: lines read straight from the request stream come a byte at a time
+        records = IngestionService.iter_ndjson(io.BufferedReader(request.stream, 65536))
+    elif request.is_json:
+        payload = request.get_json(silent=True)
+        if isinstance(payload, dict):
+            payload = payload.get('measurements')
+        if not isinstance(payload, list):
+            return jsonify({'success': False, 'error': 'Expected a list of measurements'}), 400
+        records = enumerate(payload)
+    else:
+        return jsonify({'success': False, 'error': 'Expected application/json or application/x-ndjson'}), 415
+    
+    try:
+        result = IngestionService.ingest(records, current_user.username)
+        return jsonify({'success': True, 'api_version': 1, **result})
+        
+    except Exception as e:
+        return jsonify({'success': False, 'api_version': 1, 'error': str(e)}), 500
+
 @optimized_bp.route('/api/get-parameter-details/<int:parameter_id>')
 @login_required
 def api_get_parameter_details(parameter_id):
@@ -1,23 +1,24 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_required, current_user
-from forms import PressControlForm, PressThicknessForm, PressWetWeightForm, PressAspectForm, PressClayHumidityForm, CombinedPressForm
+from forms import PressControlForm, PressBatchForm, PressThicknessForm, PressWetWeightForm, PressAspectForm, PressClayHumidityForm, CombinedPressForm
 from models import PressControl
 from app import db
+from utils.pagination import paginate_by_date
+from services.batch_entry_service import BatchEntryService
+from utils.rules_engine import rules_engine
 
 press_bp = Blueprint('press', __name__)
 
 @press_bp.route('/')
 @login_required
 def press_controls():
-    page = request.args.get('page', 1, type=int)
     format_filter = request.args.get('format')
     
     query = PressControl.query
     if format_filter:
         query = query.filter(PressControl.format_type == format_filter)
     
-    controls = query.order_by(PressControl.date.desc()).paginate(
-        page=page, per_page=20, error_out=False)
+    controls = paginate_by_date(query, PressControl)
     
     return render_template('press/press_control.html', controls=controls, format_filter=format_filter)
 
@@ -84,16 +85,43 @@ def edit_press_control(id):
     
     return render_template('press/press_control.html', form=form, edit=True, control=press_control)
 
+@press_bp.route('/batch', methods=['GET', 'POST'])
+@login_required
+def batch_press_control():
+    """Grid entry of all the press measurements of a shift"""
+    form = PressBatchForm()
+    wants_json = request.accept_mimetypes.best == 'application/json'
+    
+    if form.validate_on_submit():
+        results = BatchEntryService.submit(form, PressControl, 'press', ['date', 'shift', 'format_type'], current_user.id)
+        if wants_json:
+            return jsonify(results)
+        if results:
+            rejected = sum(1 for result in results if result['compliance_status'] != 'compliant')
+            flash(f'{len(results)} mesures presse enregistrées ({rejected} non conformes)', 'warning' if rejected else 'success')
+            return redirect(url_for('press.batch_press_control', saved=','.join(str(result['id']) for result in results)))
+        flash('Aucune mesure saisie', 'warning')
+    elif wants_json and request.method == 'POST':
+        return jsonify({'errors': form.errors}), 400
+    
+    results = BatchEntryService.results(PressControl, 'press', BatchEntryService.parse_ids(request.args.get('saved')))
+    return render_template('batch/batch_entry.html', form=form, results=results,
+                           title='Saisie par Équipe - Contrôle Presse', list_url=url_for('press.press_controls'))
+
 @press_bp.route('/api/specifications/<format_type>')
 @login_required
 def get_specifications(format_type):
-    specs = {
-        '20x20': {'thickness': [6.2, 7.2], 'weight': [480, 580]},
-        '25x40': {'thickness': [6.8, 7.4], 'weight': [1150, 1550]},
-        '25x50': {'thickness': [7.1, 7.7], 'weight': [1800, 2000]}
-    }
+    specs = {}
+    
+    thickness_rule = rules_engine.lookup('press', 'thickness', format_type=format_type)
+    if thickness_rule:
+        specs['thickness'] = [thickness_rule.min_value, thickness_rule.max_value]
     
-    return jsonify(specs.get(format_type, {}))
+    weight_rule = rules_engine.lookup('press', 'wet_weight', format_type=format_type)
+    if weight_rule:
+        specs['weight'] = [weight_rule.min_value, weight_rule.max_value]
+    
+    return jsonify(specs)
 
 # Individual Press Control Routes as requested by user
 @press_bp.route('/thickness', methods=['GET', 'POST'])
@@ -112,16 +140,11 @@ def press_thickness():
         press_control.controller_id = current_user.id
         
         # Check compliance based on format
-        compliance_status = 'compliant'
         thickness_value = form.thickness.data
         format_type = form.format_type.data
         
-        if format_type == '20x20' and not (6.2 <= thickness_value <= 7.2):
-            compliance_status = 'non_compliant'
-        elif format_type == '25x40' and not (6.8 <= thickness_value <= 7.4):
-            compliance_status = 'non_compliant'
-        elif format_type == '25x50' and not (7.1 <= thickness_value <= 7.7):
-            compliance_status = 'non_compliant'
+        violations = rules_engine.check('press', press_control)
+        compliance_status = 'non_compliant' if 'thickness' in violations else 'compliant'
         
         press_control.compliance_status = compliance_status
         
@@ -152,16 +175,11 @@ def press_wet_weight():
         press_control.controller_id = current_user.id
         
         # Check compliance based on format
-        compliance_status = 'compliant'
         weight_value = form.wet_weight.data
         format_type = form.format_type.data
         
-        if format_type == '20x20' and not (480 <= weight_value <= 580):
-            compliance_status = 'non_compliant'
-        elif format_type == '25x40' and not (1150 <= weight_value <= 1550):
-            compliance_status = 'non_compliant'
-        elif format_type == '25x50' and not (1800 <= weight_value <= 2000):
-            compliance_status = 'non_compliant'
+        violations = rules_engine.check('press', press_control)
+        compliance_status = 'non_compliant' if 'wet_weight' in violations else 'compliant'
         
         press_control.compliance_status = compliance_status
         
@@ -268,26 +286,12 @@ def combined_press():
         # Check compliance for both thickness and weight
         compliance_issues = []
         format_type = form.format_type.data
+        violations = rules_engine.check('press', press_control)
         
-        # Check thickness compliance
-        if form.thickness.data:
-            thickness_value = form.thickness.data
-            if format_type == '20x20' and not (6.2 <= thickness_value <= 7.2):
-                compliance_issues.append(f'Épaisseur ({thickness_value}mm)')
-            elif format_type == '25x40' and not (6.8 <= thickness_value <= 7.4):
-                compliance_issues.append(f'Épaisseur ({thickness_value}mm)')
-            elif format_type == '25x50' and not (7.1 <= thickness_value <= 7.7):
-                compliance_issues.append(f'Épaisseur ({thickness_value}mm)')
-        
-        # Check weight compliance
-        if form.wet_weight.data:
-            weight_value = form.wet_weight.data
-            if format_type == '20x20' and not (480 <= weight_value <= 580):
-                compliance_issues.append(f'Poids ({weight_value}g)')
-            elif format_type == '25x40' and not (1150 <= weight_value <= 1550):
-                compliance_issues.append(f'Poids ({weight_value}g)')
-            elif format_type == '25x50' and not (1800 <= weight_value <= 2000):
-                compliance_issues.append(f'Poids ({weight_value}g)')
+        if 'thickness' in violations:
+            compliance_issues.append(f'Épaisseur ({form.thickness.data}mm)')
+        if 'wet_weight' in violations:
+            compliance_issues.append(f'Poids ({form.wet_weight.data}g)')
         
         press_control.compliance_status = 'non_compliant' if compliance_issues else 'compliant'
         
@@ -1,10 +1,16 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, send_file, Response
 from flask_login import login_required, current_user
-from utils.helpers import get_dashboard_stats, export_daily_report, get_defect_analysis
+from utils.helpers import get_dashboard_stats, export_daily_report, daily_report_data, get_defect_analysis
+from services.report_snapshot_service import ReportSnapshotService
+from services.scheduling_service import SHIFTS
+from utils.read_routing import read_only
+from utils.streaming import stream_page, stream_csv
 from datetime import date, timedelta
 import json
+import os
 
 reports_bp = Blueprint('reports', __name__)
+read_only(reports_bp)
 
 @reports_bp.route('/')
 @login_required
@@ -23,12 +29,18 @@ def daily_report():
     else:
         selected_date = date.today()
     
-    # Get comprehensive report data
-    report_data = export_daily_report(selected_date)
+    # Stored nightly snapshot, or comprehensive report data queried as the page streams
+    snapshot = None if request.args.get('live') else ReportSnapshotService.daily_report(selected_date)
+    if snapshot:
+        report_data, snapshot_at = snapshot
+    else:
+        report_data, snapshot_at = daily_report_data(selected_date), None
     
-    return render_template('reports/daily_report.html', 
+    return stream_page('reports/daily_report.html', 
                          report_data=report_data, 
-                         selected_date=selected_date)
+                         selected_date=selected_date,
+                         snapshot_at=snapshot_at,
+                         shifts=SHIFTS)
 
 @reports_bp.route('/weekly')
 @login_required
@@ -67,36 +79,231 @@ def monthly_report():
 @reports_bp.route('/non_conformities')
 @login_required
 def non_conformities():
-    from utils.helpers import get_recent_non_conformities
+    from utils.helpers import iter_recent_non_conformities
     
+    # Queried as the page streams, not before
     limit = request.args.get('limit', 50, type=int)
-    non_conformities = get_recent_non_conformities(limit)
     
-    return render_template('reports/non_conformities.html', 
-                         non_conformities=non_conformities)
+    return stream_page('reports/non_conformities.html', 
+                       non_conformities=iter_recent_non_conformities(limit),
+                       limit=limit)
+
+@reports_bp.route('/non_conformities.csv')
+@login_required
+def non_conformities_csv():
+    from utils.helpers import iter_recent_non_conformities
+    
+    limit = request.args.get('limit', 50, type=int)
+    rows = ([nc['created_at'].strftime('%Y-%m-%d %H:%M'), nc['date'], nc['type'], nc['controller'], nc['status']]
+            for nc in iter_recent_non_conformities(limit))
+    return stream_csv(f"non_conformites_{date.today().strftime('%Y%m%d')}.csv",
+                      ['Créé le', 'Date', 'Type', 'Contrôleur', 'Statut'], rows)
+
+# List filters of the CSV exports: query argument -> column
+EXPORT_FILTERS = {'shift': 'shift', 'format': 'format_type', 'enamel_type': 'enamel_type', 'test_type': 'test_type'}
+
+@reports_bp.route('/export/<control_type>.csv')
+@login_required
+def export_controls_csv(control_type):
+    """Every record of a control list as CSV, streamed from the database
+    
+    Query arguments: start, end (ISO dates), and the list filters shift,
+    format, enamel_type and test_type. Archived records of the range come
+    first.
+    """
+    from sqlalchemy import select
+    from models import db
+    from services.archive_service import ArchiveService
+    from utils.control_registry import LIST_MODELS
+    
+    model_class = LIST_MODELS.get(control_type)
+    if model_class is None:
+        return jsonify({'error': f'Unknown control type: {control_type}'}), 404
+    
+    try:
+        start_date = date.fromisoformat(request.args['start']) if request.args.get('start') else None
+        end_date = date.fromisoformat(request.args['end']) if request.args.get('end') else None
+    except ValueError:
+        return jsonify({'error': 'Invalid date format'}), 400
+    
+    table = model_class.__table__
+    filters = {column: request.args[argument] for argument, column in EXPORT_FILTERS.items()
+               if request.args.get(argument) and column in table.columns}
+    
+    statement = select(*table.columns).order_by(table.c.date, table.c.id)
+    if start_date:
+        statement = statement.where(table.c.date >= start_date)
+    if end_date:
+        statement = statement.where(table.c.date <= end_date)
+    for column, value in filters.items():
+        statement = statement.where(table.c[column] == value)
+    
+    def rows():
+        if ArchiveService.covers(start_date or date.min):
+            for record in ArchiveService.load(model_class, start_date or date.min, end_date or date.max):
+                if all(getattr(record, column) == value for column, value in filters.items()):
+                    yield [getattr(record, column.key) for column in table.columns]
+        yield from db.session.execute(statement.execution_options(yield_per=1000))
+    
+    return stream_csv(f"{control_type}_{date.today().strftime('%Y%m%d')}.csv",
+                      [column.key for column in table.columns], rows())
+
+def _schedule_range_args(default_days=7, max_days=366):
+    """Parse start/end query arguments for schedule summaries"""
+    end_date = date.fromisoformat(request.args['end']) if request.args.get('end') else date.today()
+    start_date = date.fromisoformat(request.args['start']) if request.args.get('start') else end_date - timedelta(days=default_days - 1)
+    if start_date > end_date:
+        raise ValueError('start must not be after end')
+    if (end_date - start_date).days >= max_days:
+        raise ValueError(f'range is limited to {max_days} days')
+    return start_date, end_date
+
+@reports_bp.route('/schedule_completion')
+@login_required
+def schedule_completion():
+    """Completion of scheduled controls per day and shift"""
+    from services.scheduling_service import SchedulingService, SHIFTS, STATUSES
+    
+    try:
+        start_date, end_date = _schedule_range_args(default_days=30)
+    except ValueError as e:
+        flash(f'Période invalide: {e}', 'error')
+        start_date, end_date = date.today() - timedelta(days=29), date.today()
+    
+    summary = SchedulingService.get_schedule_summary_range(start_date, end_date)
+    
+    return render_template('reports/schedule_completion.html',
+                         summary=summary,
+                         shifts=SHIFTS,
+                         statuses=STATUSES,
+                         start_date=start_date,
+                         end_date=end_date)
+
+@reports_bp.route('/api/schedule_summary')
+@login_required
+def schedule_summary_api():
+    """Per-day x shift x status counts of scheduled controls
+    
+    Query arguments: start, end (ISO dates, default the last 7 days).
+    """
+    from services.scheduling_service import SchedulingService
+    
+    try:
+        start_date, end_date = _schedule_range_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    summary = SchedulingService.get_schedule_summary_range(start_date, end_date)
+    for day in summary['days']:
+        day['date'] = day['date'].isoformat()
+    summary['start_date'] = start_date.isoformat()
+    summary['end_date'] = end_date.isoformat()
+    del summary['totals']['date']
+    
+    return jsonify(summary)
 
 @reports_bp.route('/api/export/daily/<date_str>')
 @login_required
 def export_daily_json(date_str):
     try:
         report_date = date.fromisoformat(date_str)
-        report_data = export_daily_report(report_date)
-        return jsonify(report_data)
     except ValueError:
         return jsonify({'error': 'Invalid date format'}), 400
+    
+    path = None if request.args.get('live') else ReportSnapshotService.daily_report_path(report_date)
+    if path:
+        return send_file(path, mimetype='application/json')
+    
+    report_data = export_daily_report(report_date)
+    return Response(ReportSnapshotService.encode_daily_report(report_data), mimetype='application/json')
+
+@reports_bp.route('/control_sheet/<date_str>')
+@login_required
+def control_sheet(date_str):
+    """Control sheet of a day, or of one shift with ?shift=; the nightly snapshot when stored"""
+    from services.control_sheet_service import ControlSheetService
+    
+    try:
+        sheet_date = date.fromisoformat(date_str)
+    except ValueError:
+        flash('Date invalide.', 'error')
+        return redirect(url_for('reports.daily_report'))
+    
+    shift = request.args.get('shift') or None
+    if shift and shift not in SHIFTS:
+        flash('Équipe invalide.', 'error')
+        return redirect(url_for('reports.daily_report', date=sheet_date.isoformat()))
+    
+    path = None if request.args.get('live') else ReportSnapshotService.control_sheet(sheet_date, shift)
+    if path:
+        return send_file(path, as_attachment=True, download_name=os.path.basename(path))
+    
+    result = ControlSheetService.generate_daily_control_sheet(sheet_date, shift)
+    return send_file(result['buffer'], as_attachment=True, download_name=result['filename'],
+                     mimetype=result['mimetype'])
 
 @reports_bp.route('/spc_charts')
 @login_required
 def spc_charts():
-    from utils.helpers import get_control_chart_data
-    from models import ClayControl, PressControl, DryerControl
+    max_points = request.args.get('max_points', type=int)
     
-    # Get SPC data for key parameters
-    clay_humidity = get_control_chart_data(ClayControl, 'humidity_after_prep', days=30)
-    press_thickness = get_control_chart_data(PressControl, 'thickness', days=30)
-    dryer_humidity = get_control_chart_data(DryerControl, 'residual_humidity', days=30)
+    # Get SPC data for key parameters, the past days from last night's snapshot
+    series, snapshot_at = ReportSnapshotService.spc_series(max_points=max_points,
+                                                           live=bool(request.args.get('live')))
     
     return render_template('reports/spc_charts.html',
-                         clay_humidity=json.dumps(clay_humidity),
-                         press_thickness=json.dumps(press_thickness),
-                         dryer_humidity=json.dumps(dryer_humidity))
+                         clay_humidity=json.dumps(series['clay_humidity']),
+                         press_thickness=json.dumps(series['press_thickness']),
+                         dryer_humidity=json.dumps(series['dryer_humidity']),
+                         snapshot_at=snapshot_at)
+
+@reports_bp.route('/api/trend/parameters')
+@login_required
+def trend_parameters_api():
+    """List the control types and parameters available to the trend API"""
+    from utils.control_registry import TREND_PARAMETERS
+    
+    return jsonify({
+        control_type: [{'name': name, 'unit': unit} for name, unit in parameters.items()]
+        for control_type, parameters in TREND_PARAMETERS.items()
+    })
+
+@reports_bp.route('/api/trend/<control_type>/<parameter>')
+@login_required
+def trend_api(control_type, parameter):
+    """Trend data for any whitelisted control parameter
+    
+    Query arguments: start, end (ISO dates, default the last 30 days),
+    shift, format and max_points.
+    """
+    from utils.helpers import get_control_chart_data
+    from utils.control_registry import get_trend_model, supports_filter
+    
+    model_class = get_trend_model(control_type, parameter)
+    if model_class is None:
+        return jsonify({'error': f'Unknown parameter: {control_type}.{parameter}'}), 404
+    
+    try:
+        end_date = date.fromisoformat(request.args['end']) if request.args.get('end') else date.today()
+        start_date = date.fromisoformat(request.args['start']) if request.args.get('start') else end_date - timedelta(days=29)
+    except ValueError:
+        return jsonify({'error': 'Invalid date format'}), 400
+    
+    if start_date > end_date:
+        return jsonify({'error': 'start must not be after end'}), 400
+    
+    shift = request.args.get('shift')
+    format_type = request.args.get('format')
+    if shift and not supports_filter(model_class, 'shift'):
+        return jsonify({'error': f'{control_type} controls have no shift'}), 400
+    if format_type and not supports_filter(model_class, 'format_type'):
+        return jsonify({'error': f'{control_type} controls have no format'}), 400
+    
+    data = get_control_chart_data(model_class, parameter,
+                                  start_date=start_date,
+                                  end_date=end_date,
+                                  shift=shift,
+                                  format_type=format_type,
+                                  max_points=request.args.get('max_points', type=int))
+    
+    return jsonify(data)
@@ -1,9 +1,13 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app
 from flask_login import login_required, current_user
 from forms_admin import SpecificationForm, BulkSpecificationForm
 from models import Specification
 from app import db
 from utils.spec_defaults import initialize_default_specifications
+from utils.pagination import keyset_paginate
+from services.automation_service import automation_service
+from services.revalidation_service import RevalidationService
+from utils.rules_engine import rules_engine
 
 spec_bp = Blueprint('specifications', __name__)
 
@@ -14,15 +18,19 @@ def specifications():
         flash('Permissions insuffisantes pour accéder aux spécifications', 'error')
         return redirect(url_for('main.dashboard'))
     
-    page = request.args.get('page', 1, type=int)
     control_filter = request.args.get('control_type')
     
     query = Specification.query
     if control_filter:
         query = query.filter(Specification.control_type == control_filter)
     
-    specs = query.order_by(Specification.control_type, Specification.parameter_name).paginate(
-        page=page, per_page=50, error_out=False)
+    specs = keyset_paginate(query,
+                            [(Specification.control_type, False),
+                             (Specification.parameter_name, False),
+                             (Specification.id, False)],
+                            per_page=50,
+                            after=request.args.get('after'),
+                            before=request.args.get('before'))
     
     control_types = db.session.query(Specification.control_type.distinct()).all()
     control_types = [ct[0] for ct in control_types]
@@ -71,6 +79,9 @@ def add_specification():
         db.session.add(specification)
         db.session.commit()
         
+        if specification.control_type in RevalidationService.revalidatable_types():
+            automation_service.schedule_revalidation(specification.control_type, specification.format_type)
+        
         flash('Spécification ajoutée avec succès', 'success')
         return redirect(url_for('specifications.specifications'))
     
@@ -87,6 +98,9 @@ def edit_specification(id):
     form = SpecificationForm(obj=specification)
     
     if form.validate_on_submit():
+        # Records of the former scope are re-validated too when it changes
+        previous_scope = (specification.control_type, specification.format_type)
+        
         specification.control_type = form.control_type.data
         specification.parameter_name = form.parameter_name.data
         specification.format_type = form.format_type.data if form.format_type.data else None
@@ -100,6 +114,11 @@ def edit_specification(id):
         
         db.session.commit()
         
+        scopes = {previous_scope, (specification.control_type, specification.format_type)}
+        for control_type, format_type in scopes:
+            if control_type in RevalidationService.revalidatable_types():
+                automation_service.schedule_revalidation(control_type, format_type)
+        
         flash('Spécification mise à jour avec succès', 'success')
         return redirect(url_for('specifications.specifications'))
     
@@ -113,9 +132,13 @@ def delete_specification(id):
         return redirect(url_for('specifications.specifications'))
     
     specification = Specification.query.get_or_404(id)
+    control_type, format_type = specification.control_type, specification.format_type
     db.session.delete(specification)
     db.session.commit()
     
+    if control_type in RevalidationService.revalidatable_types():
+        automation_service.schedule_revalidation(control_type, format_type)
+    
     flash('Spécification supprimée avec succès', 'success')
     return redirect(url_for('specifications.specifications'))
 
@@ -129,10 +152,15 @@ def bulk_operations():
     form = BulkSpecificationForm()
     
     if form.validate_on_submit():
+        control_type = form.control_type.data
+        revalidatable = control_type in RevalidationService.revalidatable_types()
+        
         if form.action.data == 'reset_defaults':
             # Reset to default specifications
             result = initialize_default_specifications(form.control_type.data)
             flash(f'Réinitialisé {result} spécifications par défaut pour {form.control_type.data}', 'success')
+            if revalidatable:
+                automation_service.schedule_revalidation(control_type)
         
         elif form.action.data == 'deactivate_all':
             # Deactivate all specifications for the control type
@@ -141,6 +169,19 @@ def bulk_operations():
                 spec.is_active = False
             db.session.commit()
             flash(f'Désactivé toutes les spécifications pour {form.control_type.data}', 'warning')
+            if revalidatable:
+                automation_service.schedule_revalidation(control_type)
+        
+        elif form.action.data in ('revalidate_preview', 'revalidate'):
+            if not revalidatable:
+                flash(f'Aucune revalidation possible pour {control_type}', 'error')
+            elif form.action.data == 'revalidate_preview':
+                report = RevalidationService.revalidate(control_type, dry_run=True)
+                transitions = ', '.join(f'{k}: {v}' for k, v in report['transitions'].items()) or 'aucun changement'
+                flash(f"Aperçu: {report['scanned']} enregistrements analysés, {report['changed']} changeraient de statut ({transitions})", 'info')
+            else:
+                automation_service.schedule_revalidation(control_type)
+                flash(f'Revalidation des enregistrements {control_type} lancée en arrière-plan', 'success')
         
         return redirect(url_for('specifications.specifications'))
     
@@ -186,4 +227,45 @@ def get_specs_api(control_type):
             'description': spec.description
         })
     
-    return jsonify(specs_data)
\ No newline at end of file
+    return jsonify(specs_data)
+
+@spec_bp.route('/api/bundle')
+@login_required
+def spec_bundle():
+    """All active specifications in one payload, versioned by content hash
+
+    Requested as ?v=<version> (see spec_bundle_url) the response is cacheable
+    for a year; any other request is revalidated against the ETag.
+    """
+    version, payload = rules_engine.spec_bundle()
+    response = current_app.response_class(payload, mimetype='application/json')
+    response.set_etag(version)
+    response.cache_control.private = True
+    if request.args.get('v') == version:
+        response.cache_control.max_age = 31536000
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+@spec_bp.app_context_processor
+def spec_bundle_context():
+    def spec_bundle_url():
+        return url_for('specifications.spec_bundle', v=rules_engine.spec_bundle()[0])
+    return {'spec_bundle_url': spec_bundle_url}
+
+@spec_bp.route('/api/revalidate/<control_type>')
+@login_required
+def revalidate_preview_api(control_type):
+    """Dry-run diff of the compliance changes the current specs would cause"""
+    if current_user.role not in ['admin', 'quality_manager']:
+        return jsonify({'error': 'Permission denied'}), 403
+    
+    if control_type not in RevalidationService.revalidatable_types():
+        return jsonify({'error': f'Unknown control type: {control_type}'}), 404
+    
+    report = RevalidationService.revalidate(control_type,
+                                            format_type=request.args.get('format'),
+                                            dry_run=True)
+    return jsonify(report)
+
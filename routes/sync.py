@@ -0,0 +1,26 @@
+from flask import Blueprint, request, jsonify
+from flask_login import login_required, current_user
+from services.sync_service import SyncService
+
+sync_bp = Blueprint('sync', __name__)
+
+@sync_bp.route('/batch', methods=['POST'])
+@login_required
+def sync_batch():
+    """Save the submissions queued by offline entry pages
+
+    Only JSON bodies are accepted: a cross-site form cannot send one, which
+    stands in for the CSRF token a queued submission may have outlived.
+    """
+    if not request.is_json:
+        return jsonify({'error': 'Corps JSON attendu'}), 415
+
+    payload = request.get_json(silent=True)
+    submissions = payload.get('submissions') if isinstance(payload, dict) else None
+    if not isinstance(submissions, list):
+        return jsonify({'error': 'Liste "submissions" attendue'}), 400
+    if len(submissions) > SyncService.MAX_SUBMISSIONS:
+        return jsonify({'error': f'Au plus {SyncService.MAX_SUBMISSIONS} soumissions par envoi'}), 413
+
+    results = SyncService.sync(submissions, current_user.id)
+    return jsonify({'results': results})
@@ -1,23 +1,23 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_required, current_user
-from forms import DimensionalTestForm, DigitalDecorationForm, ExternalTestForm
+from forms import DimensionalTestForm, DigitalDecorationForm, DigitalDecorationBatchForm, ExternalTestForm
 from models import DimensionalTest, DigitalDecoration, ExternalTest
 from app import db
+from utils.pagination import paginate_by_date
+from services.batch_entry_service import BatchEntryService
 
 tests_bp = Blueprint('tests', __name__)
 
 @tests_bp.route('/dimensional')
 @login_required
 def dimensional_tests():
-    page = request.args.get('page', 1, type=int)
     format_filter = request.args.get('format')
     
     query = DimensionalTest.query
     if format_filter:
         query = query.filter(DimensionalTest.format_type == format_filter)
     
-    tests = query.order_by(DimensionalTest.date.desc()).paginate(
-        page=page, per_page=20, error_out=False)
+    tests = paginate_by_date(query, DimensionalTest)
     
     return render_template('tests/dimensional_tests.html', tests=tests, format_filter=format_filter)
 
@@ -81,9 +81,7 @@ def edit_dimensional_test(id):
 @tests_bp.route('/digital')
 @login_required
 def digital_decorations():
-    page = request.args.get('page', 1, type=int)
-    decorations = DigitalDecoration.query.order_by(DigitalDecoration.date.desc()).paginate(
-        page=page, per_page=20, error_out=False)
+    decorations = paginate_by_date(DigitalDecoration.query, DigitalDecoration)
     return render_template('tests/digital_decoration.html', decorations=decorations)
 
 @tests_bp.route('/digital/add', methods=['GET', 'POST'])
@@ -111,18 +109,39 @@ def add_digital_decoration():
     
     return render_template('tests/digital_decoration.html', form=form)
 
+@tests_bp.route('/digital/batch', methods=['GET', 'POST'])
+@login_required
+def batch_digital_decoration():
+    """Grid entry of all the digital decoration inspections of a shift"""
+    form = DigitalDecorationBatchForm()
+    wants_json = request.accept_mimetypes.best == 'application/json'
+    
+    if form.validate_on_submit():
+        results = BatchEntryService.submit(form, DigitalDecoration, 'digital', ['date', 'shift'], current_user.id)
+        if wants_json:
+            return jsonify(results)
+        if results:
+            rejected = sum(1 for result in results if result['compliance_status'] != 'compliant')
+            flash(f'{len(results)} inspections décoration enregistrées ({rejected} non conformes)', 'warning' if rejected else 'success')
+            return redirect(url_for('tests.batch_digital_decoration', saved=','.join(str(result['id']) for result in results)))
+        flash('Aucune mesure saisie', 'warning')
+    elif wants_json and request.method == 'POST':
+        return jsonify({'errors': form.errors}), 400
+    
+    results = BatchEntryService.results(DigitalDecoration, 'digital', BatchEntryService.parse_ids(request.args.get('saved')))
+    return render_template('batch/batch_entry.html', form=form, results=results,
+                           title='Saisie par Équipe - Décoration Numérique', list_url=url_for('tests.digital_decorations'))
+
 @tests_bp.route('/external')
 @login_required
 def external_tests():
-    page = request.args.get('page', 1, type=int)
     test_filter = request.args.get('test_type')
     
     query = ExternalTest.query
     if test_filter:
         query = query.filter(ExternalTest.test_type == test_filter)
     
-    tests = query.order_by(ExternalTest.date.desc()).paginate(
-        page=page, per_page=20, error_out=False)
+    tests = paginate_by_date(query, ExternalTest)
     
     return render_template('tests/external_tests.html', tests=tests, test_filter=test_filter)
 
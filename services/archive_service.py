@@ -0,0 +1,295 @@
+"""
+Data retention and archival
+
+Control records, optimized measurements and scheduled controls dated
+before the retention horizon are moved, in chunks, to gzip-compressed JSON
+lines files partitioned by table and month:
+
+    ARCHIVE_DIR/<table>/<YYYY>/<YYYY-MM>.jsonl.gz
+
+Each chunk is appended as its own gzip member and synced to disk before the
+rows are deleted, and every archived (table, day) keeps a compact
+ArchivedDay summary with its row count and status/shift breakdown. Reports
+use the summaries for counts and read the month files on demand for
+record-level data (see ArchiveService.load). A chunk written again after an
+interrupted run is de-duplicated by id when read.
+
+Every worker runs the scheduler, so a run holds an exclusive lock on
+ARCHIVE_DIR/.archive.lock (flock) and a run starting meanwhile does
+nothing; workers on several hosts need ARCHIVE_DIR on a filesystem
+supporting flock.
+
+Configuration (app.config, defaulting to environment variables):
+    ARCHIVE_AFTER_DAYS    retention horizon in days (365)
+    ARCHIVE_DIR           archive location (instance/archive)
+    ARCHIVE_CHUNK_SIZE    rows moved per transaction (5000)
+"""
+
+import errno
+import gzip
+import json
+import os
+import threading
+import time as timer
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+try:
+    import fcntl
+except ImportError:  # Windows development servers run a single process
+    fcntl = None
+
+from flask import current_app
+from sqlalchemy import Date, DateTime, Numeric, Time, delete, func, select
+
+from models import (db, ArchivedDay, ClayControl, PressControl, DryerControl, BiscuitKilnControl,
+                    EmailKilnControl, EnamelControl, DimensionalTest, DigitalDecoration,
+                    ExternalTest, OptimizedMeasurement, ScheduledControl)
+from utils.metrics import record_cache
+
+# (model, date column, status column); scheduled controls go before the
+# measurements they reference
+ARCHIVED_MODELS = [
+    (ScheduledControl, 'scheduled_date', 'status'),
+    (OptimizedMeasurement, 'measurement_date', 'is_conforming'),
+    (ClayControl, 'date', 'compliance_status'),
+    (PressControl, 'date', 'compliance_status'),
+    (DryerControl, 'date', 'compliance_status'),
+    (BiscuitKilnControl, 'date', 'compliance_status'),
+    (EmailKilnControl, 'date', 'compliance_status'),
+    (EnamelControl, 'date', 'compliance_status'),
+    (DimensionalTest, 'date', 'compliance_status'),
+    (DigitalDecoration, 'date', 'compliance_status'),
+    (ExternalTest, 'date', 'result_status'),
+]
+_DATE_COLUMNS = {model.__tablename__: date_column for model, date_column, _ in ARCHIVED_MODELS}
+
+HORIZON_TTL = 60
+_horizon = {'value': None, 'checked': 0}
+_horizon_lock = threading.Lock()
+
+def _config(name, default, cast):
+    value = current_app.config.get(name, os.environ.get(name))
+    if value is None or value == '':
+        return default
+    return cast(value)
+
+def _encode(value):
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+def _decoders(table):
+    """Per-column functions turning archived JSON values back into Python values"""
+    def decoder(column_type):
+        if isinstance(column_type, DateTime):
+            return datetime.fromisoformat
+        if isinstance(column_type, Date):
+            return date.fromisoformat
+        if isinstance(column_type, Time):
+            return time.fromisoformat
+        if isinstance(column_type, Numeric) and column_type.asdecimal:
+            return lambda value: Decimal(str(value))
+        return None
+
+    decoders = {}
+    for column in table.columns:
+        convert = decoder(column.type)
+        decoders[column.key] = (lambda value, convert=convert:
+                                value if value is None or convert is None else convert(value))
+    return decoders
+
+def _status_key(value):
+    if value is True:
+        return 'conforming'
+    if value is False:
+        return 'non_conforming'
+    return value or 'unknown'
+
+class ArchiveService:
+
+    @staticmethod
+    def archive_directory():
+        return _config('ARCHIVE_DIR', os.path.join(current_app.instance_path, 'archive'), str)
+
+    @staticmethod
+    def archive_old_records(before=None, chunk_size=None):
+        """Move rows dated before ``before`` (default: ARCHIVE_AFTER_DAYS ago) to the archive
+
+        Returns the number of rows moved per table, or an empty dict when
+        another process is archiving.
+        """
+        if before is None:
+            before = date.today() - timedelta(days=_config('ARCHIVE_AFTER_DAYS', 365, int))
+        chunk_size = chunk_size or _config('ARCHIVE_CHUNK_SIZE', 5000, int)
+
+        directory = ArchiveService.archive_directory()
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, '.archive.lock'), 'a') as lock:
+            if fcntl:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError as e:
+                    if e.errno not in (errno.EAGAIN, errno.EACCES):
+                        raise
+                    current_app.logger.info("Archive run skipped: another process is archiving")
+                    return {}
+
+            moved = {}
+            for model_class, date_column, status_column in ARCHIVED_MODELS:
+                moved[model_class.__tablename__] = ArchiveService._archive_table(
+                    model_class, date_column, status_column, before, chunk_size)
+
+        with _horizon_lock:
+            _horizon['checked'] = 0
+        return moved
+
+    @staticmethod
+    def _archive_table(model_class, date_column, status_column, before, chunk_size):
+        table = model_class.__table__
+        day_column = table.c[date_column]
+        condition = day_column < before
+        if model_class is OptimizedMeasurement:
+            # Measurements still referenced by a live scheduled control stay
+            scheduled = ScheduledControl.__table__
+            condition = condition & table.c.id.not_in(
+                select(scheduled.c.measurement_id).where(scheduled.c.measurement_id.isnot(None)))
+
+        moved = 0
+        while True:
+            rows = db.session.execute(
+                select(table).where(condition).order_by(day_column, table.c.id).limit(chunk_size)
+            ).mappings().all()
+            if not rows:
+                break
+
+            files = ArchiveService._write_rows(table.name, date_column, rows)
+            ArchiveService._record_days(table.name, date_column, status_column, rows, files)
+            db.session.execute(delete(table).where(table.c.id.in_([row['id'] for row in rows])))
+            db.session.commit()
+
+            moved += len(rows)
+            if len(rows) < chunk_size:
+                break
+        return moved
+
+    @staticmethod
+    def _archive_path(table_name, month):
+        return os.path.join(ArchiveService.archive_directory(), table_name, month[:4], f'{month}.jsonl.gz')
+
+    @staticmethod
+    def _write_rows(table_name, date_column, rows):
+        """Append rows to their month files; returns {month: relative file name}"""
+        by_month = defaultdict(list)
+        for row in rows:
+            by_month[row[date_column].strftime('%Y-%m')].append(row)
+
+        files = {}
+        for month, month_rows in by_month.items():
+            path = ArchiveService._archive_path(table_name, month)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'ab') as raw:
+                with gzip.GzipFile(fileobj=raw, mode='wb') as archive:
+                    for row in month_rows:
+                        line = json.dumps({key: _encode(value) for key, value in row.items()},
+                                          separators=(',', ':'), ensure_ascii=False)
+                        archive.write(line.encode('utf-8') + b'\n')
+                raw.flush()
+                os.fsync(raw.fileno())
+            files[month] = os.path.relpath(path, ArchiveService.archive_directory())
+        return files
+
+    @staticmethod
+    def _record_days(table_name, date_column, status_column, rows, files):
+        """Add the archived rows to their per-day summaries"""
+        per_day = defaultdict(lambda: defaultdict(lambda: defaultdict(int)))
+        for row in rows:
+            per_day[row[date_column]][_status_key(row[status_column])][row.get('shift') or ''] += 1
+
+        existing = {summary.day: summary for summary in ArchivedDay.query.filter(
+            ArchivedDay.table_name == table_name,
+            ArchivedDay.day.in_(list(per_day))
+        )}
+
+        for day, counts in per_day.items():
+            summary = existing.get(day) or ArchivedDay(table_name=table_name, day=day, row_count=0)
+            merged = {status: dict(shifts) for status, shifts in (summary.counts or {}).items()}
+            for status, shifts in counts.items():
+                for shift, count in shifts.items():
+                    merged.setdefault(status, {})[shift] = merged.get(status, {}).get(shift, 0) + count
+                    summary.row_count += count
+            summary.counts = merged
+            summary.archive_file = files[day.strftime('%Y-%m')]
+            summary.archived_at = datetime.utcnow()
+            db.session.add(summary)
+
+    @staticmethod
+    def horizon():
+        """Latest archived day, or None; cached per worker for HORIZON_TTL seconds"""
+        now = timer.monotonic()
+        fresh = now - _horizon['checked'] < HORIZON_TTL
+        record_cache('archive_horizon', fresh)
+        if not fresh:
+            value = db.session.execute(select(func.max(ArchivedDay.day))).scalar()
+            with _horizon_lock:
+                _horizon['value'], _horizon['checked'] = value, now
+        return _horizon['value']
+
+    @staticmethod
+    def covers(start_date):
+        """Whether a range starting at start_date may include archived days"""
+        latest = ArchiveService.horizon()
+        return latest is not None and start_date <= latest
+
+    @staticmethod
+    def day_summaries(table_name, start_date, end_date):
+        return ArchivedDay.query.filter(
+            ArchivedDay.table_name == table_name,
+            ArchivedDay.day.between(start_date, end_date)
+        ).order_by(ArchivedDay.day).all()
+
+    @staticmethod
+    def status_counts(start_date, end_date):
+        """Archived row counts by table and status over a date range"""
+        counts = defaultdict(lambda: defaultdict(int))
+        for summary in ArchivedDay.query.filter(ArchivedDay.day.between(start_date, end_date)):
+            for status, shifts in (summary.counts or {}).items():
+                counts[summary.table_name][status] += sum(shifts.values())
+        return counts
+
+    @staticmethod
+    def load(model_class, start_date, end_date):
+        """Archived records of a model dated within a range, oldest first
+
+        The records are transient model instances: they are not attached to
+        the session, so relationships (e.g. controller) read as None.
+        """
+        table = model_class.__table__
+        date_column = _DATE_COLUMNS[table.name]
+        files = sorted({summary.archive_file
+                        for summary in ArchiveService.day_summaries(table.name, start_date, end_date)})
+        if not files:
+            return []
+
+        decoders = _decoders(table)
+        first, last = start_date.isoformat(), end_date.isoformat()
+        rows = {}
+        for name in files:
+            path = os.path.join(ArchiveService.archive_directory(), name)
+            if not os.path.exists(path):
+                current_app.logger.warning(f"Archive file missing: {path}")
+                continue
+            with gzip.open(path, 'rt', encoding='utf-8') as archive:
+                for line in archive:
+                    row = json.loads(line)
+                    if first <= row[date_column] <= last:
+                        rows[row['id']] = row
+
+        records = []
+        for row in sorted(rows.values(), key=lambda row: (row[date_column], row['id'])):
+            records.append(model_class(**{key: decoders[key](value)
+                                          for key, value in row.items() if key in decoders}))
+        return records
@@ -2,6 +2,7 @@ from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 from services.scheduling_service import SchedulingService
 from services.measurement_service import MeasurementService
+from utils.metrics import track_job
 from datetime import datetime, date
 import logging
 
@@ -61,6 +62,26 @@ class AutomationService:
             replace_existing=True
         )
         
+        # Create upcoming monthly partitions (PostgreSQL with PARTITION_BY_MONTH)
+        from utils.partitioning import MONTHLY_PARTITIONS
+        if MONTHLY_PARTITIONS:
+            self.scheduler.add_job(
+                func=self._ensure_partitions_job,
+                trigger=CronTrigger(hour=0, minute=5),  # 00:05 every day
+                id='ensure_partitions',
+                name='Create Monthly Partitions',
+                replace_existing=True
+            )
+        
+        # Snapshot yesterday's reports once the night shift is over
+        self.scheduler.add_job(
+            func=self._snapshot_reports_job,
+            trigger=CronTrigger(hour=6, minute=15),  # 06:15 every day
+            id='snapshot_reports',
+            name='Snapshot Daily Reports',
+            replace_existing=True
+        )
+        
         # Cleanup old records monthly
         self.scheduler.add_job(
             func=self._cleanup_old_records_job,
@@ -74,8 +95,9 @@ class AutomationService:
         """Job to generate tomorrow's schedule"""
         with self.app.app_context():
             try:
-                result = SchedulingService.generate_daily_schedule()
-                self.app.logger.info(f"Daily schedule generated: {result['scheduled_count']} controls for {result['date']}")
+                with track_job('generate_daily_schedule'):
+                    result = SchedulingService.generate_daily_schedule()
+                    self.app.logger.info(f"Daily schedule generated: {result['scheduled_count']} controls for {result['date']}")
             except Exception as e:
                 self.app.logger.error(f"Failed to generate daily schedule: {e}")
     
@@ -83,9 +105,10 @@ class AutomationService:
         """Job to mark overdue controls"""
         with self.app.app_context():
             try:
-                count = MeasurementService.mark_overdue_controls()
-                if count > 0:
-                    self.app.logger.info(f"Marked {count} controls as overdue")
+                with track_job('mark_overdue_controls'):
+                    result = MeasurementService.mark_overdue_controls()
+                    if result['total'] > 0:
+                        self.app.logger.info(f"Marked {result['total']} controls as overdue (by shift: {result['by_shift']})")
             except Exception as e:
                 self.app.logger.error(f"Failed to mark overdue controls: {e}")
     
@@ -93,21 +116,84 @@ class AutomationService:
         """Job to generate weekly schedule"""
         with self.app.app_context():
             try:
-                result = SchedulingService.generate_weekly_schedule()
-                self.app.logger.info(f"Weekly schedule generated: {result['scheduled_count']} controls for week starting {result['date']}")
+                with track_job('generate_weekly_schedule'):
+                    result = SchedulingService.generate_weekly_schedule()
+                    self.app.logger.info(f"Weekly schedule generated: {result['scheduled_count']} controls for week starting {result['date']}")
             except Exception as e:
                 self.app.logger.error(f"Failed to generate weekly schedule: {e}")
     
+    def _ensure_partitions_job(self):
+        """Job to create the partitions of the coming months"""
+        from app import db
+        from utils.partitioning import ensure_partitions
+        
+        with self.app.app_context():
+            try:
+                with track_job('ensure_partitions'):
+                    created = ensure_partitions(db.engine)
+                    if created:
+                        self.app.logger.info(f"Created partitions: {', '.join(created)}")
+            except Exception as e:
+                self.app.logger.error(f"Failed to create partitions: {e}")
+    
+    def _snapshot_reports_job(self):
+        """Job to store yesterday's daily report, SPC series and control sheets"""
+        from services.report_snapshot_service import ReportSnapshotService
+        
+        with self.app.app_context():
+            try:
+                with track_job('snapshot_reports'):
+                    manifest = ReportSnapshotService.create_snapshot()
+                    if manifest['created']:
+                        self.app.logger.info(f"Report snapshot stored for {manifest['day']}")
+            except Exception as e:
+                self.app.logger.error(f"Failed to snapshot reports: {e}")
+    
     def _cleanup_old_records_job(self):
-        """Job to cleanup old records (implement as needed)"""
+        """Job to move records older than the retention horizon to the archive"""
+        from services.archive_service import ArchiveService
+
         with self.app.app_context():
             try:
-                # Implement cleanup logic here
-                # For example, archive measurements older than 1 year
-                self.app.logger.info("Old records cleanup completed")
+                with track_job('cleanup_old_records'):
+                    moved = ArchiveService.archive_old_records()
+                    archived = {table: count for table, count in moved.items() if count}
+                    self.app.logger.info(f"Old records cleanup completed: {sum(archived.values())} rows archived {archived}")
             except Exception as e:
                 self.app.logger.error(f"Failed to cleanup old records: {e}")
     
+    def schedule_revalidation(self, control_type, format_type=None):
+        """Queue a background re-validation of stored records for a control type"""
+        if not self.scheduler or not self.scheduler.running:
+            return self._revalidate_job(control_type, format_type)
+        
+        job_id = f"revalidate_{control_type}_{format_type or 'all'}"
+        self.scheduler.add_job(
+            func=self._revalidate_job,
+            args=[control_type, format_type],
+            id=job_id,
+            name=f'Revalidate {control_type}',
+            replace_existing=True
+        )
+        return {'success': True, 'job_id': job_id}
+    
+    def _revalidate_job(self, control_type, format_type=None):
+        """Job to re-validate stored records after a specification change"""
+        from services.revalidation_service import RevalidationService
+        
+        with self.app.app_context():
+            try:
+                with track_job('revalidate'):
+                    report = RevalidationService.revalidate(control_type, format_type)
+                    self.app.logger.info(
+                        f"Revalidated {report['scanned']} {control_type} records: "
+                        f"{report['changed']} status changes {report['transitions']}"
+                    )
+                    return {'success': True, 'report': report}
+            except Exception as e:
+                self.app.logger.error(f"Failed to revalidate {control_type} records: {e}")
+                return {'success': False, 'error': str(e)}
+    
     def shutdown(self):
         """Shutdown the scheduler"""
         if self.scheduler and self.scheduler.running:
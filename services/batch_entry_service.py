@@ -0,0 +1,113 @@
+from models import db
+from forms import row_number
+from utils.pagination import invalidate_counts
+from utils.rules_engine import rules_engine
+from sqlalchemy import insert, select
+
+# Pass/fail controls: compliant when no listed parameter is 'fail'
+PASS_FAIL_PARAMETERS = {
+    'digital': ['sharpness', 'offset', 'tonality'],
+}
+
+class BatchEntryService:
+    """Grid entry of all the measurements of a shift in one request"""
+
+    @staticmethod
+    def form_rows(form):
+        """Filled rows of a batch form, with their measurement number"""
+        return [dict(entry.form.values(), measurement_number=row_number(entry))
+                for entry in form.rows if not entry.form.is_blank()]
+
+    @staticmethod
+    def evaluate(control_type, records):
+        """Compliance status and violated parameters of each record, in one pass"""
+        if control_type in PASS_FAIL_PARAMETERS:
+            violations = [[name for name in PASS_FAIL_PARAMETERS[control_type] if record.get(name) == 'fail']
+                          for record in records]
+        else:
+            columns = {name: [record.get(name) for record in records]
+                       for name in set().union(*records)} if records else {}
+            result = rules_engine.evaluate_batch(control_type, columns)
+            violations = [[name for name, failed in result['violations'].items() if failed[index]]
+                          for index in range(len(records))]
+
+        statuses = ['non_compliant' if failed else 'compliant' for failed in violations]
+        return statuses, violations
+
+    @staticmethod
+    def insert(model_class, control_type, records):
+        """Evaluate and bulk insert records (dicts of column values), without committing
+
+        Compliance is evaluated here: the Core bulk insert does not run the
+        mapper's before_insert events. Scalar column defaults replace empty
+        values. Returns the new ids, the statuses and the violated parameters.
+        """
+        table = model_class.__table__
+        defaults = {column.name: column.default.arg for column in table.columns
+                    if column.default is not None and column.default.is_scalar}
+
+        for record in records:
+            for name, value in defaults.items():
+                if record.get(name, value) is None:
+                    record[name] = value
+
+        statuses, violations = BatchEntryService.evaluate(control_type, records)
+        for record, status in zip(records, statuses):
+            record['compliance_status'] = status
+
+        ids = db.session.execute(
+            insert(table).returning(table.c.id, sort_by_parameter_order=True), records
+        ).scalars().all()
+        return ids, statuses, violations
+
+    @staticmethod
+    def save(model_class, control_type, header, rows, controller_id):
+        """Insert the rows of a shift in one transaction
+
+        ``header`` holds the values shared by every row (date, shift,
+        format...). Returns, per row, the new id, the measurement number, the
+        status and the violated parameters.
+        """
+        table = model_class.__table__
+        records = [dict({name: value for name, value in dict(header, **row).items() if name in table.c},
+                        controller_id=controller_id) for row in rows]
+
+        try:
+            ids, statuses, violations = BatchEntryService.insert(model_class, control_type, records)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        invalidate_counts()
+
+        return [{'id': id, 'measurement_number': record.get('measurement_number'),
+                 'compliance_status': status, 'violations': failed}
+                for id, record, status, failed in zip(ids, records, statuses, violations)]
+
+    @staticmethod
+    def submit(form, model_class, control_type, header_fields, controller_id):
+        """Save the filled rows of a validated batch form"""
+        rows = BatchEntryService.form_rows(form)
+        if not rows:
+            return []
+        header = {name: getattr(form, name).data for name in header_fields}
+        return BatchEntryService.save(model_class, control_type, header, rows, controller_id)
+
+    @staticmethod
+    def results(model_class, control_type, ids):
+        """Per-row results of saved records, for the page shown after a batch"""
+        if not ids:
+            return []
+        table = model_class.__table__
+        records = [dict(row._mapping) for row in db.session.execute(
+            select(table).where(table.c.id.in_(ids)).order_by(table.c.measurement_number, table.c.id)
+        )]
+        _, violations = BatchEntryService.evaluate(control_type, records)
+        return [{'id': record['id'], 'measurement_number': record['measurement_number'],
+                 'compliance_status': record['compliance_status'], 'violations': failed}
+                for record, failed in zip(records, violations)]
+
+    @staticmethod
+    def parse_ids(value):
+        """Ids passed to the page shown after a batch (?saved=1,2,3)"""
+        return [int(part) for part in (value or '').split(',') if part.isdigit()]
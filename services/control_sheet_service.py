@@ -1,78 +1,197 @@
 from models import db, ControlSheet, ScheduledControl, OptimizedMeasurement, ControlParameter, ControlStage
-from services.scheduling_service import SchedulingService
-from datetime import date, datetime
+from services.scheduling_service import SchedulingService, STATUSES as SCHEDULE_STATUSES
+from datetime import date, datetime, timedelta
+from sqlalchemy import select, func, case, cast
+import calendar
 import openpyxl
-from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
+from openpyxl.styles import Font, PatternFill, NamedStyle
+from openpyxl.utils import get_column_letter
 import io
+from utils.metrics import timed_export
+
+# Named styles shared by every cell of a workbook, registered once per workbook
+NAMED_STYLES = {
+    'cs_title': lambda: {'font': Font(bold=True, size=14)},
+    'cs_header': lambda: {'font': Font(bold=True, size=11),
+                          'fill': PatternFill(start_color="D3D3D3", end_color="D3D3D3", fill_type="solid")},
+    'cs_header_plain': lambda: {'font': Font(bold=True, size=11)},
+    'cs_flagged': lambda: {'fill': PatternFill(start_color="FFB6C1", end_color="FFB6C1", fill_type="solid")},
+}
+
+def _hhmm(column):
+    """HH:MM text of a time column (SQLite and PostgreSQL both render HH:MM:SS...)"""
+    return func.substr(cast(column, db.String), 1, 5)
 
 class ControlSheetService:
     """Service for generating automated control sheets"""
     
     @staticmethod
+    @timed_export('control_sheet_daily')
     def generate_daily_control_sheet(target_date=None, shift=None, format_type='excel'):
         """Generate daily control sheet with scheduled controls and actual measurements"""
         
         if not target_date:
             target_date = date.today()
         
-        # Get scheduled controls for the date
+        if format_type != 'excel':
+            control_data = ControlSheetService._get_control_data(target_date, shift)
+            return ControlSheetService._generate_pdf_control_sheet(target_date, control_data, shift)
+        
+        wb = ControlSheetService._new_workbook()
+        sheet_data = ControlSheetService._fetch_sheet_data(target_date, target_date, shift)
+        ControlSheetService._write_daily_sheet(wb.create_sheet(), target_date, sheet_data, shift)
+        
+        filename = f"Fiche_Controle_{target_date.strftime('%Y%m%d')}"
+        if shift:
+            filename += f"_{shift.replace('-', '')}"
+        filename += ".xlsx"
+        
+        return ControlSheetService._workbook_result(wb, filename)
+    
+    @staticmethod
+    @timed_export('control_sheet_monthly')
+    def generate_monthly_control_sheets(year, month, shift=None):
+        """Generate one workbook holding a daily control sheet for every day of a month"""
+        
+        start_date = date(year, month, 1)
+        end_date = date(year, month, calendar.monthrange(year, month)[1])
+        
+        wb = ControlSheetService._new_workbook()
+        sheet_data = ControlSheetService._fetch_sheet_data(start_date, end_date, shift)
+        
+        current_date = start_date
+        while current_date <= end_date:
+            ControlSheetService._write_daily_sheet(wb.create_sheet(), current_date, sheet_data, shift)
+            current_date += timedelta(days=1)
+        
+        filename = f"Fiches_Controle_{start_date.strftime('%Y%m')}"
+        if shift:
+            filename += f"_{shift.replace('-', '')}"
+        filename += ".xlsx"
+        
+        return ControlSheetService._workbook_result(wb, filename)
+    
+    @staticmethod
+    def _get_control_data(target_date, shift=None):
+        """Scheduled controls and measurements of a day as ORM objects, by parameter"""
+        
         scheduled_controls = SchedulingService.get_daily_schedule(target_date, shift)
         
-        # Get actual measurements for the date
         measurements_query = OptimizedMeasurement.query.filter_by(measurement_date=target_date)
         if shift:
             measurements_query = measurements_query.filter_by(shift=shift)
         measurements = measurements_query.all()
         
-        # Organize data by parameter
         control_data = {}
         for control in scheduled_controls:
-            param_id = control.parameter_id
-            if param_id not in control_data:
-                control_data[param_id] = {
-                    'parameter': control.parameter,
-                    'scheduled': [],
-                    'measurements': []
-                }
-            control_data[param_id]['scheduled'].append(control)
+            control_data.setdefault(control.parameter_id, {
+                'parameter': control.parameter, 'scheduled': [], 'measurements': []
+            })['scheduled'].append(control)
         
         for measurement in measurements:
-            param_id = measurement.parameter_id
-            if param_id not in control_data:
-                control_data[param_id] = {
-                    'parameter': measurement.parameter,
-                    'scheduled': [],
-                    'measurements': []
-                }
-            control_data[param_id]['measurements'].append(measurement)
-        
-        if format_type == 'excel':
-            return ControlSheetService._generate_excel_control_sheet(target_date, control_data, shift)
-        else:
-            return ControlSheetService._generate_pdf_control_sheet(target_date, control_data, shift)
+            control_data.setdefault(measurement.parameter_id, {
+                'parameter': measurement.parameter, 'scheduled': [], 'measurements': []
+            })['measurements'].append(measurement)
+        
+        return control_data
     
     @staticmethod
-    def _generate_excel_control_sheet(target_date, control_data, shift=None):
-        """Generate Excel control sheet"""
+    def _fetch_sheet_data(start_date, end_date, shift=None):
+        """Load everything needed for the daily sheets of a date range
+        
+        Scheduled controls and measurements are each aggregated per
+        (parameter, day) by one grouped query; a third small query loads
+        the parameters involved. Returns a dict with 'parameters' (ordered
+        by stage) and 'scheduled'/'measurements' keyed by (parameter_id, day).
+        """
+        
+        scheduled = ScheduledControl.__table__
+        schedule_rows = select(
+            scheduled.c.parameter_id,
+            scheduled.c.scheduled_date.label('day'),
+            _hhmm(scheduled.c.scheduled_time).label('time'),
+            scheduled.c.status
+        ).where(scheduled.c.scheduled_date.between(start_date, end_date))
+        if shift:
+            schedule_rows = schedule_rows.where(scheduled.c.shift == shift)
+        schedule_rows = schedule_rows.order_by(scheduled.c.scheduled_time).subquery()
+        
+        schedule_query = select(
+            schedule_rows.c.parameter_id,
+            schedule_rows.c.day,
+            func.aggregate_strings(schedule_rows.c.time, ', ').label('times'),
+            func.count().label('total'),
+            *[func.sum(case((schedule_rows.c.status == status, 1), else_=0)).label(status)
+              for status in SCHEDULE_STATUSES]
+        ).group_by(schedule_rows.c.parameter_id, schedule_rows.c.day)
+        
+        measurements = OptimizedMeasurement.__table__
+        measurement_rows = select(
+            measurements.c.parameter_id,
+            measurements.c.measurement_date.label('day'),
+            _hhmm(measurements.c.measurement_time).label('time'),
+            measurements.c.is_conforming,
+            (cast(measurements.c.deviation_percentage, db.String) + '%').label('deviation'),
+            measurements.c.nc_number,
+            measurements.c.observations
+        ).where(measurements.c.measurement_date.between(start_date, end_date))
+        if shift:
+            measurement_rows = measurement_rows.where(measurements.c.shift == shift)
+        measurement_rows = measurement_rows.order_by(measurements.c.measurement_time).subquery()
+        
+        measurement_query = select(
+            measurement_rows.c.parameter_id,
+            measurement_rows.c.day,
+            func.aggregate_strings(measurement_rows.c.time, ', ').label('times'),
+            func.count().label('total'),
+            func.sum(case((measurement_rows.c.is_conforming == True, 1), else_=0)).label('conforming'),
+            func.aggregate_strings(measurement_rows.c.deviation, ', ').label('deviations'),
+            func.aggregate_strings(measurement_rows.c.nc_number, ', ').label('nc_numbers'),
+            func.aggregate_strings(measurement_rows.c.observations, '; ').label('observations')
+        ).group_by(measurement_rows.c.parameter_id, measurement_rows.c.day)
+        
+        data = {
+            'scheduled': {(row.parameter_id, row.day): row for row in db.session.execute(schedule_query)},
+            'measurements': {(row.parameter_id, row.day): row for row in db.session.execute(measurement_query)}
+        }
+        
+        parameter_ids = {key[0] for key in data['scheduled']} | {key[0] for key in data['measurements']}
+        parameters = ControlParameter.__table__
+        stages = ControlStage.__table__
+        data['parameters'] = db.session.execute(
+            select(
+                parameters.c.id, parameters.c.name, parameters.c.specification,
+                parameters.c.frequency_per_day, stages.c.name.label('stage_name')
+            ).join(stages, stages.c.id == parameters.c.stage_id)
+            .where(parameters.c.id.in_(parameter_ids))
+            .order_by(stages.c.order_sequence, parameters.c.id)
+        ).all() if parameter_ids else []
+        
+        return data
+    
+    @staticmethod
+    def _new_workbook():
+        """Empty workbook with the control sheet named styles registered"""
         
         wb = openpyxl.Workbook()
-        ws = wb.active
+        wb.remove(wb.active)
+        for name, attributes in NAMED_STYLES.items():
+            wb.add_named_style(NamedStyle(name=name, **attributes()))
+        return wb
+    
+    @staticmethod
+    def _write_daily_sheet(ws, target_date, sheet_data, shift=None):
+        """Fill a worksheet with the control sheet of one day"""
         
-        # Set title
         title = f"FICHE DE CONTRÔLE - {target_date.strftime('%d/%m/%Y')}"
         if shift:
             title += f" - Équipe {shift}"
         
-        ws.title = title[:31]  # Excel sheet name limit
-        
-        # Header styles
-        header_font = Font(bold=True, size=14)
-        subheader_font = Font(bold=True, size=11)
-        normal_font = Font(size=10)
+        ws.title = target_date.strftime('%Y-%m-%d')  # '/' is not allowed in sheet names
         
         # Title
         ws['A1'] = title
-        ws['A1'].font = header_font
+        ws['A1'].style = 'cs_title'
         ws.merge_cells('A1:J1')
         
         # Headers row
@@ -84,92 +203,79 @@ class ControlSheetService:
         ]
         
         for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=row, column=col, value=header)
-            cell.font = subheader_font
-            cell.fill = PatternFill(start_color="D3D3D3", end_color="D3D3D3", fill_type="solid")
+            ws.cell(row=row, column=col, value=header).style = 'cs_header'
         
         row += 1
         
+        total_params = 0
+        completed_params = 0
+        conforming_params = 0
+        
         # Data rows
-        for param_id, data in control_data.items():
-            parameter = data['parameter']
-            scheduled = data['scheduled']
-            measurements = data['measurements']
+        for parameter in sheet_data['parameters']:
+            key = (parameter.id, target_date)
+            scheduled = sheet_data['scheduled'].get(key)
+            measurements = sheet_data['measurements'].get(key)
+            if scheduled is None and measurements is None:
+                continue
             
-            # Parameter info
-            ws.cell(row=row, column=1, value=parameter.stage.name)
-            ws.cell(row=row, column=2, value=parameter.name)
-            ws.cell(row=row, column=3, value=parameter.specification)
-            ws.cell(row=row, column=4, value=f"{parameter.frequency_per_day}x/jour")
+            total_params += 1
             
-            # Scheduled times
-            scheduled_times = ', '.join([s.scheduled_time.strftime('%H:%M') for s in scheduled])
-            ws.cell(row=row, column=5, value=scheduled_times)
+            values = [
+                parameter.stage_name,
+                parameter.name,
+                parameter.specification,
+                f"{parameter.frequency_per_day}x/jour",
+                scheduled.times if scheduled else None
+            ]
             
-            # Actual measurements
             if measurements:
-                measurement_times = ', '.join([m.measurement_time.strftime('%H:%M') for m in measurements])
-                ws.cell(row=row, column=6, value=measurement_times)
-                
-                # Conformity status
-                conforming_count = sum(1 for m in measurements if m.is_conforming)
-                total_count = len(measurements)
-                conformity_text = f"{conforming_count}/{total_count}"
-                
-                cell = ws.cell(row=row, column=7, value=conformity_text)
-                if conforming_count < total_count:
-                    cell.fill = PatternFill(start_color="FFB6C1", end_color="FFB6C1", fill_type="solid")
-                
-                # Deviations
-                deviations = [str(m.deviation_percentage) + '%' for m in measurements 
-                             if m.deviation_percentage is not None]
-                ws.cell(row=row, column=8, value=', '.join(deviations))
-                
-                # NC numbers
-                nc_numbers = [m.nc_number for m in measurements if m.nc_number]
-                ws.cell(row=row, column=9, value=', '.join(nc_numbers))
-                
-                # Observations
-                observations = [m.observations for m in measurements if m.observations]
-                ws.cell(row=row, column=10, value='; '.join(observations))
+                completed_params += 1
+                if measurements.conforming == measurements.total:
+                    conforming_params += 1
+                values += [
+                    measurements.times,
+                    f"{measurements.conforming}/{measurements.total}",
+                    measurements.deviations,
+                    measurements.nc_numbers,
+                    measurements.observations
+                ]
+                flagged = measurements.conforming < measurements.total
             else:
-                ws.cell(row=row, column=6, value="Aucune mesure")
-                cell = ws.cell(row=row, column=7, value="Manquant")
-                cell.fill = PatternFill(start_color="FFB6C1", end_color="FFB6C1", fill_type="solid")
+                values += ["Aucune mesure", "Manquant"]
+                flagged = True
+            
+            for col, value in enumerate(values, 1):
+                if value is not None:
+                    ws.cell(row=row, column=col, value=value)
+            if flagged:
+                ws.cell(row=row, column=7).style = 'cs_flagged'
             
             row += 1
         
         # Summary section
         row += 2
-        ws.cell(row=row, column=1, value="RÉSUMÉ").font = subheader_font
+        ws.cell(row=row, column=1, value="RÉSUMÉ").style = 'cs_header_plain'
         row += 1
         
-        total_params = len(control_data)
-        completed_params = sum(1 for data in control_data.values() if data['measurements'])
-        conforming_params = sum(1 for data in control_data.values() 
-                               if data['measurements'] and all(m.is_conforming for m in data['measurements']))
-        
         ws.cell(row=row, column=1, value=f"Paramètres contrôlés: {completed_params}/{total_params}")
         row += 1
         ws.cell(row=row, column=1, value=f"Paramètres conformes: {conforming_params}/{completed_params}")
         row += 1
         ws.cell(row=row, column=1, value=f"Taux de conformité: {(conforming_params/completed_params*100):.1f}%" if completed_params > 0 else "N/A")
         
-        # Auto-adjust column widths
+        # Fixed column widths
         for col in range(1, 11):
-            ws.column_dimensions[openpyxl.utils.get_column_letter(col)].width = 20
+            ws.column_dimensions[get_column_letter(col)].width = 20
+    
+    @staticmethod
+    def _workbook_result(wb, filename):
+        """Save a workbook to a buffer in the service result format"""
         
-        # Save to buffer
         buffer = io.BytesIO()
         wb.save(buffer)
         buffer.seek(0)
         
-        # Generate filename
-        filename = f"Fiche_Controle_{target_date.strftime('%Y%m%d')}"
-        if shift:
-            filename += f"_{shift.replace('-', '')}"
-        filename += ".xlsx"
-        
         return {
             'success': True,
             'buffer': buffer,
@@ -183,28 +289,26 @@ class ControlSheetService:
         return ControlSheetService.generate_daily_control_sheet(target_date, shift)
     
     @staticmethod
+    @timed_export('control_sheet_weekly')
     def generate_weekly_control_sheet(start_date):
         """Generate weekly control sheet summary"""
         
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = f"Semaine_{start_date.strftime('%Y%m%d')}"
+        wb = ControlSheetService._new_workbook()
+        ws = wb.create_sheet(f"Semaine_{start_date.strftime('%Y%m%d')}")
         
         # Header
         ws['A1'] = f"RAPPORT HEBDOMADAIRE - Semaine du {start_date.strftime('%d/%m/%Y')}"
-        ws['A1'].font = Font(bold=True, size=14)
+        ws['A1'].style = 'cs_title'
         ws.merge_cells('A1:H1')
         
-        # Daily summary for the week
+        # Daily summary for the week, from one grouped query
+        summaries = SchedulingService.get_schedule_summary_range(start_date, start_date + timedelta(days=6))['days']
+        
         row = 3
         days = ['Lundi', 'Mardi', 'Mercredi', 'Jeudi', 'Vendredi', 'Samedi', 'Dimanche']
         
-        for i in range(7):
-            current_date = start_date + timedelta(days=i)
-            day_name = days[i]
-            
-            # Get daily summary
-            summary = SchedulingService.get_schedule_summary(current_date)
+        for day_name, summary in zip(days, summaries):
+            current_date = summary['date']
             
             ws.cell(row=row, column=1, value=f"{day_name} {current_date.strftime('%d/%m')}")
             ws.cell(row=row, column=2, value=summary['total'])
@@ -217,18 +321,9 @@ class ControlSheetService:
             
             row += 1
         
-        buffer = io.BytesIO()
-        wb.save(buffer)
-        buffer.seek(0)
-        
         filename = f"Rapport_Hebdo_{start_date.strftime('%Y%m%d')}.xlsx"
         
-        return {
-            'success': True,
-            'buffer': buffer,
-            'filename': filename,
-            'mimetype': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        }
+        return ControlSheetService._workbook_result(wb, filename)
     
     @staticmethod
     def save_control_sheet(sheet_type, target_date, generated_by, file_path, shift=None, stage_id=None):
@@ -0,0 +1,233 @@
+"""
+Bulk ingestion of optimized measurements
+
+Line instruments, tablets and the instrument-feed daemon send measurements
+as plain records:
+
+    {"parameter": "PRESS_THICKNESS",        code (or "parameter_id": 12)
+     "value": 8.4,                          numeric, boolean or categorical value
+     "defects": {"grains": 3.5},            visual controls
+     "timestamp": "2026-10-19T08:15:00",    or "date" and "time" (default now)
+     "operator": "Poste 2",                 default: the authenticated user
+     "format": "25x40", "line_number": 1, "oven_number": null,
+     "press_number": 2, "sample_size": 1, "observations": "..."}
+
+Active control parameters are loaded once per batch, each record is checked
+with the same rules as a single measurement (ControlParameter.check_conformity
+for numeric values, MeasurementService.fields and evaluate for the types of
+every column), and valid records are inserted by chunks with one
+multi-row INSERT each. Pending scheduled controls of the same parameter and
+day are completed by the new measurements, and the batch is committed once.
+Invalid records are rejected individually and reported with their position.
+
+Configuration (environment variables):
+    INGEST_CHUNK_SIZE    rows per INSERT statement (1000)
+"""
+
+import json
+import math
+import os
+from collections import defaultdict, deque
+from datetime import date, datetime, time
+
+from sqlalchemy import bindparam, func, insert, select, update
+
+from models import db, ControlParameter, OptimizedMeasurement, ScheduledControl
+from services.measurement_service import MeasurementService
+
+# Value columns present on every row; json_values is only set on visual
+# measurements, as a None would be stored as a JSON null instead of NULL
+_VALUE_COLUMNS = ('numeric_value', 'boolean_value', 'text_value',
+                  'is_conforming', 'deviation_percentage')
+
+class IngestionService:
+    """Validate and bulk insert batches of optimized measurements"""
+
+    CHUNK_SIZE = int(os.environ.get('INGEST_CHUNK_SIZE', 1000))
+    MAX_ERRORS = 100
+
+    @staticmethod
+    def load_parameters():
+        """Active control parameters by id and by code, detached from the session"""
+        parameters = ControlParameter.query.filter(ControlParameter.active == True).all()
+        by_key = {}
+        for parameter in parameters:
+            db.session.expunge(parameter)
+            by_key[parameter.id] = parameter
+            by_key[parameter.code] = parameter
+        return by_key
+
+    @staticmethod
+    def iter_ndjson(stream):
+        """(line number, record) of a newline-delimited JSON stream, read line by line
+
+        A line that is not a JSON object yields a ValueError as its record.
+        """
+        for number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield number, ValueError(f"Invalid JSON: {e}")
+                continue
+            yield number, record if isinstance(record, dict) else ValueError("Expected a JSON object")
+
+    @staticmethod
+    def prepare(record, parameters, default_operator):
+        """Column values of a measurement record; ValueError when it is invalid"""
+        if not isinstance(record, dict):
+            raise ValueError("Expected a JSON object")
+
+        key = record.get('parameter_id', record.get('parameter'))
+        parameter = parameters.get(key) if isinstance(key, (int, str)) else None
+        if parameter is None:
+            raise ValueError(f"Unknown or inactive parameter: {key}")
+        if parameter.control_type != 'visual' and record.get('value') is None:
+            raise ValueError("Missing value")
+
+        operator = record.get('operator') or default_operator
+        if not isinstance(operator, str) or len(operator) > 100:
+            raise ValueError("operator must be a string of at most 100 characters")
+
+        measured_at = IngestionService._timestamp(record)
+        row = {
+            'parameter_id': parameter.id,
+            'operator_name': operator,
+            'measurement_date': measured_at.date(),
+            'measurement_time': measured_at.time(),
+            'shift': MeasurementService._determine_shift(measured_at.time()),
+            'nc_number': None,
+        }
+        row.update(MeasurementService.fields(record))
+        row['sample_size'] = row['sample_size'] or 1
+        row.update(dict.fromkeys(_VALUE_COLUMNS))
+        try:
+            row.update(MeasurementService.evaluate(parameter, record))
+        except (TypeError, AttributeError) as e:
+            raise ValueError(f"Invalid value: {e}")
+
+        # Out-of-range numbers would fail the whole INSERT (numeric(10,3), numeric(5,2))
+        if row['numeric_value'] is not None and not (math.isfinite(row['numeric_value']) and abs(row['numeric_value']) < 1e7):
+            raise ValueError(f"Value out of range: {record.get('value')}")
+        if row['deviation_percentage'] is not None and abs(row['deviation_percentage']) >= 1000:
+            row['deviation_percentage'] = None
+        return row
+
+    @staticmethod
+    def ingest(records, default_operator, chunk_size=None):
+        """Insert (position, record) pairs in chunks, committing once at the end
+
+        A record may be an exception (e.g. a line that failed to parse); it
+        is reported as rejected. Returns counts and the first MAX_ERRORS
+        errors.
+        """
+        chunk_size = chunk_size or IngestionService.CHUNK_SIZE
+        parameters = IngestionService.load_parameters()
+        result = {'received': 0, 'inserted': 0, 'conforming': 0, 'non_conforming': 0,
+                  'rejected': 0, 'completed_controls': 0, 'errors': []}
+        nc_counters = {}
+        chunk = []
+
+        try:
+            for position, record in records:
+                result['received'] += 1
+                try:
+                    if isinstance(record, Exception):
+                        raise record
+                    chunk.append(IngestionService.prepare(record, parameters, default_operator))
+                except ValueError as e:
+                    result['rejected'] += 1
+                    if len(result['errors']) < IngestionService.MAX_ERRORS:
+                        result['errors'].append({'index': position, 'error': str(e)})
+                    continue
+
+                if len(chunk) >= chunk_size:
+                    IngestionService._insert_chunk(chunk, nc_counters, result)
+                    chunk = []
+
+            if chunk:
+                IngestionService._insert_chunk(chunk, nc_counters, result)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        return result
+
+    @staticmethod
+    def _timestamp(record):
+        if record.get('timestamp'):
+            return datetime.fromisoformat(str(record['timestamp']))
+        now = datetime.now()
+        measured_date = date.fromisoformat(str(record['date'])) if record.get('date') else now.date()
+        measured_time = time.fromisoformat(str(record['time'])) if record.get('time') else now.time()
+        return datetime.combine(measured_date, measured_time)
+
+    @staticmethod
+    def _next_nc_number(day, nc_counters):
+        """NC-YYYYMMDD-### numbers, continuing the day's existing count"""
+        if day not in nc_counters:
+            nc_counters[day] = db.session.execute(
+                select(func.count()).select_from(OptimizedMeasurement.__table__).where(
+                    OptimizedMeasurement.measurement_date == day,
+                    OptimizedMeasurement.nc_number.isnot(None)
+                )
+            ).scalar()
+        nc_counters[day] += 1
+        return f"NC-{day.strftime('%Y%m%d')}-{nc_counters[day]:03d}"
+
+    @staticmethod
+    def _insert_chunk(rows, nc_counters, result):
+        for row in rows:
+            if row['is_conforming']:
+                result['conforming'] += 1
+            else:
+                row['nc_number'] = IngestionService._next_nc_number(row['measurement_date'], nc_counters)
+                result['non_conforming'] += 1
+
+        # One INSERT per set of columns
+        groups = defaultdict(list)
+        for row in rows:
+            groups['json_values' in row].append(row)
+
+        table = OptimizedMeasurement.__table__
+        for group in groups.values():
+            ids = db.session.execute(
+                insert(table).returning(table.c.id, sort_by_parameter_order=True), group
+            ).scalars().all()
+            result['inserted'] += len(ids)
+            result['completed_controls'] += IngestionService._complete_scheduled(group, ids)
+
+    @staticmethod
+    def _complete_scheduled(rows, ids):
+        """Complete the pending scheduled controls of the measured parameters and days"""
+        measured = defaultdict(deque)
+        for row, measurement_id in zip(rows, ids):
+            measured[(row['parameter_id'], row['measurement_date'])].append(measurement_id)
+
+        table = ScheduledControl.__table__
+        pending = db.session.execute(
+            select(table.c.id, table.c.parameter_id, table.c.scheduled_date).where(
+                table.c.status == 'pending',
+                table.c.parameter_id.in_({parameter_id for parameter_id, _ in measured}),
+                table.c.scheduled_date.in_({day for _, day in measured})
+            ).order_by(table.c.scheduled_time)
+        ).all()
+
+        completions = []
+        for control_id, parameter_id, day in pending:
+            measurement_ids = measured.get((parameter_id, day))
+            if measurement_ids:
+                completions.append({'control_id': control_id, 'day': day,
+                                    'measurement_id': measurement_ids.popleft()})
+
+        if completions:
+            db.session.execute(
+                update(table)
+                .where(table.c.id == bindparam('control_id'), table.c.scheduled_date == bindparam('day'))
+                .values(status='completed', completed_at=datetime.now(), measurement_id=bindparam('measurement_id')),
+                completions
+            )
+        return len(completions)
@@ -0,0 +1,484 @@
+"""
+Instrument feed daemon
+
+Reads the outputs of shop-floor instruments (scales, thickness gauges,
+moisture analysers) and stores every reading as an OptimizedMeasurement
+through the bulk ingestion path (services/ingestion_service.py).
+
+Sources, declared in a JSON configuration file:
+    tail       a growing log file (serial-to-file loggers); rotation and
+               truncation are followed, and the position reached is kept in
+               the state file so a restart resumes after the last stored line
+    directory  CSV files dropped in a directory (files modified in the last
+               two seconds are left for later); each file moves to
+               processed/ once all its readings are stored, or to failed/
+               when it cannot be read
+    tcp        a line-based TCP listener, the local stand-in for networked
+               instruments
+
+A line is a JSON object (an ingestion record), a bare value or
+"timestamp,value"; CSV files have a header naming record fields
+(parameter, value, timestamp, press_number...). Any other setting of a
+source is a default for its readings:
+
+    {"operator": "instrument-feed",
+     "sources": [
+        {"type": "tail", "path": "/var/log/gauges/press2.log",
+         "parameter": "PRESS_THICKNESS", "press_number": 2, "line_number": 1},
+        {"type": "directory", "path": "/srv/drops/scales", "pattern": "*.csv"},
+        {"type": "tcp", "host": "127.0.0.1", "port": 5555, "parameter": "DRYER_RESIDUAL_HUM"}]}
+
+Readings go through one bounded queue to a single writer, which stores them
+in micro-batches (FEED_BATCH_SIZE readings or FEED_BATCH_INTERVAL seconds,
+whichever comes first), one transaction each. When the database is slow or
+unavailable the writer retries the same batch with a growing delay, the
+queue fills up and the sources block: files stop being read and TCP senders
+are held back by flow control, so no reading is dropped. A batch failing for
+another reason is split in halves until the reading at fault is alone; the
+other readings are stored and that one is logged and appended to the
+dead-letter file. A file is only marked as read once its readings are
+committed; after a crash the last batch may be stored again.
+
+    python -m services.instrument_feed --config instrument_feeds.json
+
+Configuration (environment variables):
+    FEED_QUEUE_SIZE       readings buffered between sources and writer (10000)
+    FEED_BATCH_SIZE       readings per transaction at most (500)
+    FEED_BATCH_INTERVAL   seconds a reading waits for its batch at most (1.0)
+    FEED_STATE_FILE       tail positions (instance/instrument_feed_state.json)
+    FEED_DEAD_LETTER_FILE readings that could not be stored, one JSON line each
+                          (instance/instrument_feed_dead_letter.jsonl)
+    FEED_OPERATOR         operator_name of the stored readings (instrument-feed)
+"""
+
+import argparse
+import csv
+import glob
+import json
+import logging
+import os
+import queue
+import re
+import shutil
+import signal
+import socketserver
+import threading
+import time as timer
+from collections import namedtuple
+from functools import partial
+
+from sqlalchemy.exc import DisconnectionError, OperationalError
+
+logger = logging.getLogger(__name__)
+
+# Errors of an unavailable or busy database: the same batch is retried.
+# Any other error comes from the data and is isolated by splitting the batch
+_TRANSIENT_ERRORS = (OperationalError, DisconnectionError)
+
+# record: ingestion record (or the ValueError of an unparsable line)
+# origin: where it was read, reported with rejections
+# ack:    called once the reading is committed
+Reading = namedtuple('Reading', 'record origin ack')
+
+# Source settings that are not reading defaults
+_SOURCE_SETTINGS = ('type', 'path', 'pattern', 'host', 'port', 'name', 'from_start')
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
+
+def parse_line(line, defaults):
+    """Ingestion record of an instrument line, None for a blank line"""
+    line = line.strip()
+    if not line:
+        return None
+    if line.startswith('{'):
+        record = json.loads(line)
+        if not isinstance(record, dict):
+            raise ValueError("Expected a JSON object")
+    else:
+        fields = [field.strip() for field in re.split(r'[,;\t]', line)]
+        if len(fields) == 1:
+            record = {'value': _number(fields[0])}
+        elif len(fields) == 2:
+            record = {'timestamp': fields[0], 'value': _number(fields[1])}
+        else:
+            raise ValueError(f"Unrecognised line: {line[:80]}")
+    return dict(defaults, **record)
+
+class FeedState:
+    """Positions reached in tailed files, saved after each committed batch"""
+
+    def __init__(self, path):
+        self.path = path
+        self.positions = {}
+        self.dirty = False
+        self.lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.positions = json.load(f)
+
+    def get(self, source_path):
+        return self.positions.get(source_path)
+
+    def set(self, source_path, inode, offset):
+        with self.lock:
+            self.positions[source_path] = {'inode': inode, 'offset': offset}
+            self.dirty = True
+
+    def save(self):
+        with self.lock:
+            if not self.dirty or not self.path:
+                return
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            temporary = f'{self.path}.tmp'
+            with open(temporary, 'w') as f:
+                json.dump(self.positions, f)
+            os.replace(temporary, self.path)
+            self.dirty = False
+
+class TailSource(threading.Thread):
+    """Follow a growing log file, one reading per complete line"""
+
+    POLL_INTERVAL = 0.5
+
+    def __init__(self, feed, path, defaults, name=None, from_start=False):
+        super().__init__(name=name or f'tail:{path}', daemon=True)
+        self.feed = feed
+        self.path = path
+        self.defaults = defaults
+        self.from_start = from_start
+
+    def _open(self):
+        """Open the file at the saved position, the end (first run) or the start (new file)"""
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return None
+        inode = os.fstat(f.fileno()).st_ino
+        saved = self.feed.state.get(self.path)
+        size = os.fstat(f.fileno()).st_size
+        if saved and saved['inode'] == inode and saved['offset'] <= size:
+            f.seek(saved['offset'])
+        elif saved is None and not self.from_start:
+            f.seek(0, os.SEEK_END)
+        return f
+
+    def _replaced(self, f):
+        """The path now names another file (rotation), or the file was truncated"""
+        try:
+            current = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        return current.st_ino != os.fstat(f.fileno()).st_ino or current.st_size < f.tell()
+
+    def run(self):
+        f = None
+        while not self.feed.stopping.is_set():
+            if f is None:
+                f = self._open()
+                if f is None:
+                    self.feed.stopping.wait(self.POLL_INTERVAL)
+                    continue
+                inode = os.fstat(f.fileno()).st_ino
+
+            start = f.tell()
+            line = f.readline()
+            if line.endswith(b'\n'):
+                offset = f.tell()
+                self.feed.put_line(line.decode('utf-8', 'replace'), self.defaults, f'{self.path}@{start}',
+                                   partial(self.feed.state.set, self.path, inode, offset))
+                continue
+
+            # Partial line (still being written) or end of file
+            f.seek(start)
+            if self._replaced(f):
+                f.close()
+                f = None
+                self.feed.state.set(self.path, None, 0)
+                continue
+            self.feed.stopping.wait(self.POLL_INTERVAL)
+
+        if f is not None:
+            f.close()
+
+class DirectorySource(threading.Thread):
+    """Read the CSV files dropped in a directory"""
+
+    POLL_INTERVAL = 1.0
+    SETTLE_SECONDS = 2.0
+
+    def __init__(self, feed, path, defaults, pattern='*.csv', name=None):
+        super().__init__(name=name or f'directory:{path}', daemon=True)
+        self.feed = feed
+        self.path = path
+        self.pattern = pattern
+        self.defaults = defaults
+        self.pending = set()
+        self.lock = threading.Lock()
+
+    def _move(self, file_path, folder):
+        target = os.path.join(self.path, folder)
+        os.makedirs(target, exist_ok=True)
+        shutil.move(file_path, os.path.join(target, os.path.basename(file_path)))
+        with self.lock:
+            self.pending.discard(file_path)
+
+    def _read(self, file_path):
+        with open(file_path, newline='', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+        readings = []
+        for line_number, row in enumerate(rows, start=2):
+            record = dict(self.defaults)
+            record.update((key.strip(), value.strip()) for key, value in row.items()
+                          if key and value not in (None, ''))
+            if 'value' in record:
+                record['value'] = _number(record['value'])
+            readings.append((record, f'{file_path}:{line_number}'))
+        return readings
+
+    def run(self):
+        while not self.feed.stopping.is_set():
+            settled = timer.time() - self.SETTLE_SECONDS
+            for file_path in sorted(glob.glob(os.path.join(self.path, self.pattern))):
+                with self.lock:
+                    if file_path in self.pending:
+                        continue
+                try:
+                    if os.path.getmtime(file_path) > settled:
+                        continue
+                    readings = self._read(file_path)
+                except (OSError, UnicodeDecodeError, csv.Error) as e:
+                    logger.error(f"Unreadable instrument file {file_path}: {e}")
+                    self._move(file_path, 'failed')
+                    continue
+
+                if not readings:
+                    self._move(file_path, 'processed')
+                    continue
+
+                with self.lock:
+                    self.pending.add(file_path)
+                for index, (record, origin) in enumerate(readings):
+                    last = index == len(readings) - 1
+                    ack = partial(self._move, file_path, 'processed') if last else None
+                    if not self.feed.put(Reading(record, origin, ack)):
+                        return
+            self.feed.stopping.wait(self.POLL_INTERVAL)
+
+class _LineHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        source = self.server.source
+        origin = f'{self.client_address[0]}:{self.client_address[1]}'
+        for line in self.rfile:
+            if not source.feed.put_line(line.decode('utf-8', 'replace'), source.defaults, origin):
+                return
+
+class TcpSource(threading.Thread):
+    """Line-based TCP listener, one reading per line"""
+
+    def __init__(self, feed, defaults, host='127.0.0.1', port=5555, name=None):
+        super().__init__(name=name or f'tcp:{host}:{port}', daemon=True)
+        self.feed = feed
+        self.defaults = defaults
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self.server = socketserver.ThreadingTCPServer((host, port), _LineHandler)
+        self.server.daemon_threads = True
+        self.server.source = self
+
+    def run(self):
+        self.server.serve_forever(poll_interval=0.5)
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+SOURCE_TYPES = {'tail': TailSource, 'directory': DirectorySource, 'tcp': TcpSource}
+
+class InstrumentFeed:
+    """Bounded queue of readings and the writer storing them in micro-batches"""
+
+    MAX_RETRY_DELAY = 30
+
+    def __init__(self, app, sources, operator=None, queue_size=None, batch_size=None,
+                 batch_interval=None, state_file=None, dead_letter_file=None):
+        self.app = app
+        self.operator = operator or os.environ.get('FEED_OPERATOR', 'instrument-feed')
+        self.queue = queue.Queue(maxsize=queue_size or int(os.environ.get('FEED_QUEUE_SIZE', 10000)))
+        self.batch_size = batch_size or int(os.environ.get('FEED_BATCH_SIZE', 500))
+        self.batch_interval = batch_interval or float(os.environ.get('FEED_BATCH_INTERVAL', 1.0))
+        self.state = FeedState(state_file or os.environ.get(
+            'FEED_STATE_FILE', os.path.join(app.instance_path, 'instrument_feed_state.json')))
+        self.dead_letter_file = dead_letter_file or os.environ.get(
+            'FEED_DEAD_LETTER_FILE', os.path.join(app.instance_path, 'instrument_feed_dead_letter.jsonl'))
+        self.stopping = threading.Event()
+        self.stats = {'stored': 0, 'rejected': 0, 'dead_letter': 0, 'batches': 0, 'retries': 0, 'blocked': 0}
+        self.sources = [self._source(config) for config in sources]
+
+    def _source(self, config):
+        source_type = SOURCE_TYPES.get(config.get('type'))
+        if source_type is None:
+            raise ValueError(f"Unknown instrument source type: {config.get('type')}")
+        defaults = {key: value for key, value in config.items() if key not in _SOURCE_SETTINGS}
+        options = {key: config[key] for key in ('path', 'pattern', 'host', 'port', 'name', 'from_start')
+                   if key in config}
+        return source_type(self, defaults=defaults, **options)
+
+    def put(self, reading):
+        """Queue a reading, blocking while the queue is full; False once stopping"""
+        try:
+            self.queue.put_nowait(reading)
+            return True
+        except queue.Full:
+            self.stats['blocked'] += 1
+        while not self.stopping.is_set():
+            try:
+                self.queue.put(reading, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def put_line(self, line, defaults, origin, ack=None):
+        """Queue the reading of an instrument line"""
+        try:
+            record = parse_line(line, defaults)
+        except ValueError as e:
+            record = e
+        if record is None:
+            if ack:
+                ack()
+            return True
+        return self.put(Reading(record, origin, ack))
+
+    def _next_batch(self):
+        """Readings available within batch_interval of the first one, up to batch_size"""
+        try:
+            batch = [self.queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = timer.monotonic() + self.batch_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - timer.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def write_batch(self, batch):
+        """Store a batch in one transaction, then acknowledge its readings"""
+        from services.ingestion_service import IngestionService
+
+        with self.app.app_context():
+            result = IngestionService.ingest(((reading.origin, reading.record) for reading in batch), self.operator)
+
+        for error in result['errors']:
+            logger.warning(f"Rejected instrument reading {error['index']}: {error['error']}")
+        for reading in batch:
+            if reading.ack:
+                reading.ack()
+        self.state.save()
+
+        self.stats['stored'] += result['inserted']
+        self.stats['rejected'] += result['rejected']
+        self.stats['batches'] += 1
+        return result
+
+    def dead_letter(self, reading, error):
+        """Set aside a reading that cannot be stored, and acknowledge it"""
+        logger.error(f"Instrument reading from {reading.origin} could not be stored: {error}")
+        try:
+            with open(self.dead_letter_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'origin': reading.origin, 'record': reading.record, 'error': str(error),
+                                    'at': timer.strftime('%Y-%m-%dT%H:%M:%S')}, default=str) + '\n')
+        except OSError as e:
+            logger.error(f"Dead-letter file {self.dead_letter_file} not writable: {e}")
+        if reading.ack:
+            reading.ack()
+        self.state.save()
+        self.stats['dead_letter'] += 1
+
+    def _write_with_retry(self, batch):
+        """Store a batch, retrying while the database is unavailable
+
+        A batch failing on its data is split in halves, written in order so
+        tail positions keep advancing, until the faulty reading is alone and
+        goes to the dead-letter file.
+        """
+        delay = 1
+        while True:
+            try:
+                return self.write_batch(batch)
+            except _TRANSIENT_ERRORS as e:
+                self.stats['retries'] += 1
+                logger.error(f"Storing {len(batch)} instrument readings failed, retrying in {delay}s: {e}")
+                if self.stopping.wait(delay):
+                    # Stopping: one last attempt, the readings are lost otherwise
+                    try:
+                        return self.write_batch(batch)
+                    except Exception as e:
+                        logger.error(f"Dropped {len(batch)} instrument readings on shutdown: {e}")
+                        return None
+                delay = min(delay * 2, self.MAX_RETRY_DELAY)
+            except Exception as e:
+                if len(batch) == 1:
+                    self.dead_letter(batch[0], e)
+                    return None
+                logger.warning(f"Storing {len(batch)} instrument readings failed, splitting the batch: {e}")
+                middle = len(batch) // 2
+                self._write_with_retry(batch[:middle])
+                return self._write_with_retry(batch[middle:])
+
+    def start_sources(self):
+        for source in self.sources:
+            source.start()
+            logger.info(f"Instrument source {source.name} started")
+
+    def run(self):
+        """Start the sources and write batches until stopped, then drain the queue"""
+        self.start_sources()
+        last_report = timer.monotonic()
+        while not self.stopping.is_set():
+            batch = self._next_batch()
+            if batch:
+                self._write_with_retry(batch)
+            if timer.monotonic() - last_report >= 60:
+                logger.info(f"Instrument feed: {self.stats}, queued {self.queue.qsize()}")
+                last_report = timer.monotonic()
+
+        for source in self.sources:
+            if isinstance(source, TcpSource):
+                source.stop()
+        while not self.queue.empty():
+            self._write_with_retry(self._next_batch())
+        logger.info(f"Instrument feed stopped: {self.stats}")
+
+    def stop(self):
+        self.stopping.set()
+
+def main():
+    parser = argparse.ArgumentParser(description='Store instrument readings as optimized measurements')
+    parser.add_argument('--config', required=True, help='JSON file declaring the sources')
+    args = parser.parse_args()
+
+    with open(args.config) as f:
+        config = json.load(f)
+
+    from app import app
+    from services.automation_service import automation_service
+
+    # The scheduled jobs belong to the web workers
+    automation_service.shutdown()
+
+    feed = InstrumentFeed(app, config['sources'], operator=config.get('operator'))
+    signal.signal(signal.SIGTERM, lambda *_: feed.stop())
+    signal.signal(signal.SIGINT, lambda *_: feed.stop())
+    feed.run()
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,42 @@
 from models import db, ControlParameter, OptimizedMeasurement, ScheduledControl
 from datetime import datetime, date, timedelta, time
+from sqlalchemy import select, update, func
 import json
 
+# Descriptive columns of a measurement: text columns with their maximum
+# length, and integer columns
+TEXT_FIELDS = {'format': 20, 'observations': None}
+INTEGER_FIELDS = ('line_number', 'oven_number', 'press_number', 'sample_size')
+_INTEGER_LIMIT = 2 ** 31
+
+def _integer(name, value):
+    """An integer column value; integral strings and floats are accepted"""
+    if isinstance(value, str):
+        try:
+            value = int(value.strip())
+        except ValueError:
+            raise ValueError(f"{name} must be an integer")
+    elif isinstance(value, float) and value.is_integer():
+        value = int(value)
+    elif isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError(f"{name} must be an integer")
+    if not -_INTEGER_LIMIT <= value < _INTEGER_LIMIT:
+        raise ValueError(f"{name} out of range")
+    return value
+
+def _number(name, value):
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(f"{name} must be a number")
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a number")
+
+def _boolean(name, value):
+    if not isinstance(value, bool):
+        raise ValueError(f"{name} must be true or false")
+    return value
+
 class MeasurementService:
     
     @staticmethod
@@ -23,47 +58,14 @@ class MeasurementService:
                 measurement_date=measurement_data.get('date', date.today()),
                 measurement_time=measurement_data.get('time', datetime.now().time()),
                 shift=shift,
-                format=measurement_data.get('format'),
-                line_number=measurement_data.get('line_number'),
-                oven_number=measurement_data.get('oven_number'),
-                press_number=measurement_data.get('press_number'),
-                sample_size=measurement_data.get('sample_size', 1),
-                observations=measurement_data.get('observations')
+                **MeasurementService.fields(measurement_data)
             )
+            if measurement.sample_size is None:
+                measurement.sample_size = 1
             
             # Handle different measurement types with automated validation
-            if parameter.control_type == 'numeric':
-                value = float(measurement_data.get('value', 0))
-                measurement.numeric_value = value
-                measurement.is_conforming = parameter.check_conformity(value)
-                
-                # Calculate deviation percentage
-                if parameter.target_value:
-                    deviation = ((value - float(parameter.target_value)) / float(parameter.target_value)) * 100
-                    measurement.deviation_percentage = round(deviation, 2)
-                    
-            elif parameter.control_type == 'visual':
-                defects = measurement_data.get('defects', {})
-                measurement.json_values = defects
-                
-                # Check if all defects are within limits based on parameter specifications
-                is_conforming = True
-                defect_limits = parameter.defect_categories or {}
-                
-                for defect_name, percentage in defects.items():
-                    limit = defect_limits.get(defect_name, 15)  # Default 15% limit
-                    if percentage > limit:
-                        is_conforming = False
-                        break
-                measurement.is_conforming = is_conforming
-                
-            elif parameter.control_type == 'boolean':
-                measurement.boolean_value = measurement_data.get('value', False)
-                measurement.is_conforming = measurement.boolean_value
-                
-            elif parameter.control_type == 'categorical':
-                measurement.text_value = measurement_data.get('value')
-                measurement.is_conforming = measurement_data.get('is_conforming', True)
+            for name, value in MeasurementService.evaluate(parameter, measurement_data).items():
+                setattr(measurement, name, value)
             
             # Generate NC number if non-conforming
             if not measurement.is_conforming:
@@ -97,6 +99,71 @@ class MeasurementService:
             db.session.rollback()
             return {'success': False, 'error': str(e)}
     
+    @staticmethod
+    def fields(measurement_data):
+        """Descriptive columns of a measurement (format, line, press...); ValueError when mistyped"""
+        values = {}
+        for name, max_length in TEXT_FIELDS.items():
+            value = measurement_data.get(name)
+            if value is not None:
+                if not isinstance(value, str):
+                    raise ValueError(f"{name} must be a string")
+                if max_length and len(value) > max_length:
+                    raise ValueError(f"{name} is limited to {max_length} characters")
+            values[name] = value
+        for name in INTEGER_FIELDS:
+            value = measurement_data.get(name)
+            values[name] = None if value is None else _integer(name, value)
+        return values
+    
+    @staticmethod
+    def evaluate(parameter, measurement_data):
+        """Value columns and conformity of a measurement of a parameter
+        
+        Raises ValueError when the value does not have the parameter's type.
+        """
+        values = {}
+        
+        if parameter.control_type == 'numeric':
+            value = _number('value', measurement_data.get('value', 0))
+            values['numeric_value'] = value
+            values['is_conforming'] = parameter.check_conformity(value)
+            
+            # Calculate deviation percentage
+            if parameter.target_value:
+                deviation = ((value - float(parameter.target_value)) / float(parameter.target_value)) * 100
+                values['deviation_percentage'] = round(deviation, 2)
+                
+        elif parameter.control_type == 'visual':
+            defects = measurement_data.get('defects', {})
+            if not isinstance(defects, dict):
+                raise ValueError("defects must map defect names to percentages")
+            defects = {name: _number(f'defects.{name}', percentage) for name, percentage in defects.items()}
+            values['json_values'] = defects
+            
+            # Check if all defects are within limits based on parameter specifications
+            is_conforming = True
+            defect_limits = parameter.defect_categories or {}
+            
+            for defect_name, percentage in defects.items():
+                limit = defect_limits.get(defect_name, 15)  # Default 15% limit
+                if percentage > limit:
+                    is_conforming = False
+                    break
+            values['is_conforming'] = is_conforming
+            
+        elif parameter.control_type == 'boolean':
+            values['boolean_value'] = _boolean('value', measurement_data.get('value', False))
+            values['is_conforming'] = values['boolean_value']
+            
+        elif parameter.control_type == 'categorical':
+            values['text_value'] = measurement_data.get('value')
+            if not isinstance(values['text_value'], str):
+                raise ValueError("value must be a string")
+            values['is_conforming'] = _boolean('is_conforming', measurement_data.get('is_conforming', True))
+        
+        return values
+    
     @staticmethod
     def record_bulk_measurements(measurements_data):
         """Record multiple measurements efficiently in a single transaction"""
@@ -173,38 +240,61 @@ class MeasurementService:
         return query.order_by(ScheduledControl.scheduled_time).all()
     
     @staticmethod
-    def get_overdue_controls():
-        """Get overdue controls that should be marked as overdue"""
-        current_datetime = datetime.now()
-        current_date = current_datetime.date()
-        current_time = current_datetime.time()
-        
-        # Find controls that are past their scheduled time today or from previous days
-        overdue_query = ScheduledControl.query.filter(
-            ScheduledControl.status == 'pending'
-        ).filter(
+    def _overdue_condition(now=None):
+        """Pending controls scheduled before now (previous days or earlier today)"""
+        now = now or datetime.now()
+        table = ScheduledControl.__table__
+        return db.and_(
+            table.c.status == 'pending',
             db.or_(
-                ScheduledControl.scheduled_date < current_date,
+                table.c.scheduled_date < now.date(),
                 db.and_(
-                    ScheduledControl.scheduled_date == current_date,
-                    ScheduledControl.scheduled_time < current_time
+                    table.c.scheduled_date == now.date(),
+                    table.c.scheduled_time < now.time()
                 )
             )
         )
-        
-        return overdue_query.all()
     
     @staticmethod
-    def mark_overdue_controls():
-        """Mark overdue controls and return count"""
-        overdue_controls = MeasurementService.get_overdue_controls()
-        count = 0
+    def get_overdue_controls():
+        """Get overdue controls that should be marked as overdue"""
+        return ScheduledControl.query.filter(MeasurementService._overdue_condition()).all()
+    
+    @staticmethod
+    def mark_overdue_controls(now=None):
+        """Mark overdue controls with a single set-based UPDATE
+        
+        Returns the number of controls marked, in total and per shift and
+        parameter. On PostgreSQL the UPDATE and the counts are one
+        statement; elsewhere the counts are taken in the same transaction
+        just before the UPDATE. Concurrent runs are harmless since only
+        pending rows are touched.
+        """
+        table = ScheduledControl.__table__
+        condition = MeasurementService._overdue_condition(now)
+        marked = update(table).where(condition).values(status='overdue')
+        
+        if db.engine.dialect.name == 'postgresql':
+            updated = marked.returning(table.c.shift, table.c.parameter_id).cte('updated')
+            counts = select(updated.c.shift, updated.c.parameter_id, func.count()).group_by(
+                updated.c.shift, updated.c.parameter_id
+            )
+            rows = db.session.execute(counts).all()
+        else:
+            counts = select(table.c.shift, table.c.parameter_id, func.count()).where(condition).group_by(
+                table.c.shift, table.c.parameter_id
+            )
+            rows = db.session.execute(counts).all()
+            if rows:
+                db.session.execute(marked)
         
-        for control in overdue_controls:
-            control.status = 'overdue'
-            count += 1
+        result = {'total': 0, 'by_shift': {}, 'by_parameter': {}}
+        for shift, parameter_id, count in rows:
+            result['total'] += count
+            result['by_shift'][shift] = result['by_shift'].get(shift, 0) + count
+            result['by_parameter'][parameter_id] = result['by_parameter'].get(parameter_id, 0) + count
         
-        if count > 0:
+        if result['total'] > 0:
             db.session.commit()
         
-        return count
\ No newline at end of file
+        return result
\ No newline at end of file
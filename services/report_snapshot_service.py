@@ -0,0 +1,246 @@
+"""
+Nightly report snapshots
+
+The quality meeting opens yesterday's daily report, the SPC charts and the
+control sheets every morning. A nightly job computes them once, after the
+night shift, and stores the results; the report routes serve the stored
+artifacts instead of querying and aggregating again:
+
+    SNAPSHOT_DIR/<YYYY-MM-DD>/
+        manifest.json                  day, generation time and artifacts
+        daily_report.json              export_daily_report payload
+        spc.json                       full SPC series of the SPC_DAYS ending on the day
+        Fiche_Controle_<YYYYMMDD>[_<shift>].xlsx
+                                       control sheets of the day and of each
+                                       shift, registered as final ControlSheet rows
+
+Records are stored as column values, in the archive encoding, and read back
+as transient model instances, so the templates render a snapshot exactly as
+live data. A snapshot is written to a temporary directory renamed into
+place, and never rewritten: a day already stored is skipped, and pages
+recompute live data with ?live=1 (e.g. after a late correction).
+SNAPSHOT_DIR must be shared by the web workers when they run on several
+hosts.
+
+Configuration (app.config, defaulting to environment variables):
+    SNAPSHOT_DIR          snapshot location (instance/snapshots)
+"""
+
+import json
+import os
+import shutil
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+from flask import current_app
+
+from models import (ClayControl, PressControl, DryerControl, BiscuitKilnControl, EmailKilnControl,
+                    EnamelControl, DimensionalTest, DigitalDecoration, ExternalTest, ControlSheet)
+from services.archive_service import _config, _decoders, _encode
+from services.scheduling_service import SHIFTS
+
+# Record lists of the daily report payload
+REPORT_RECORDS = {
+    'clay_controls': ClayControl,
+    'clay_controls_week': ClayControl,
+    'press_controls': PressControl,
+    'dryer_controls': DryerControl,
+    'biscuit_kiln_controls': BiscuitKilnControl,
+    'email_kiln_controls': EmailKilnControl,
+    'enamel_controls': EnamelControl,
+    'dimensional_tests': DimensionalTest,
+    'digital_decorations': DigitalDecoration,
+    'external_tests': ExternalTest,
+}
+
+# Charts of the SPC page: name -> (model, parameter)
+SPC_CHARTS = {
+    'clay_humidity': (ClayControl, 'humidity_after_prep'),
+    'press_thickness': (PressControl, 'thickness'),
+    'dryer_humidity': (DryerControl, 'residual_humidity'),
+}
+SPC_DAYS = 30
+
+def _json_default(value):
+    """Encode records as their column values, dates and decimals as in the archive"""
+    table = getattr(value, '__table__', None)
+    if table is not None:
+        return {column.key: _encode(getattr(value, column.key)) for column in table.columns}
+    encoded = _encode(value)
+    if encoded is value:
+        raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+    return encoded
+
+def _write_json(path, payload):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, default=_json_default, ensure_ascii=False, separators=(',', ':'))
+
+@lru_cache(maxsize=16)
+def _read_json(path, modified):
+    """Parsed snapshot file; cached per worker, snapshots are never rewritten"""
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+class ReportSnapshotService:
+    """Store and serve the nightly snapshots of the morning reports"""
+
+    @staticmethod
+    def snapshot_directory():
+        return _config('SNAPSHOT_DIR', os.path.join(current_app.instance_path, 'snapshots'), str)
+
+    @staticmethod
+    def day_directory(day):
+        return os.path.join(ReportSnapshotService.snapshot_directory(), day.isoformat())
+
+    @staticmethod
+    def encode_daily_report(report_data):
+        """JSON text of an export_daily_report payload"""
+        return json.dumps(report_data, default=_json_default, ensure_ascii=False, separators=(',', ':'))
+
+    @staticmethod
+    def create_snapshot(day=None, generated_by='automation'):
+        """Store the report snapshot of a day (default yesterday) unless it exists
+
+        Returns the manifest, with 'created' False when the day was already
+        stored (by an earlier run or another worker).
+        """
+        from utils.helpers import export_daily_report, get_control_chart_data
+        from services.control_sheet_service import ControlSheetService
+
+        day = day or date.today() - timedelta(days=1)
+        target = ReportSnapshotService.day_directory(day)
+        if os.path.exists(os.path.join(target, 'manifest.json')):
+            return dict(ReportSnapshotService.manifest(day), created=False)
+
+        staging = f'{target}.tmp-{os.getpid()}'
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        try:
+            _write_json(os.path.join(staging, 'daily_report.json'), export_daily_report(day))
+
+            start_date = day - timedelta(days=SPC_DAYS - 1)
+            _write_json(os.path.join(staging, 'spc.json'), {
+                'start_date': start_date.isoformat(),
+                'end_date': day.isoformat(),
+                'series': {name: get_control_chart_data(model_class, parameter, start_date=start_date, end_date=day)
+                           for name, (model_class, parameter) in SPC_CHARTS.items()}
+            })
+
+            sheets = []
+            for shift in [None] + SHIFTS:
+                result = ControlSheetService.generate_daily_control_sheet(day, shift)
+                with open(os.path.join(staging, result['filename']), 'wb') as f:
+                    f.write(result['buffer'].getvalue())
+                sheets.append({'shift': shift, 'filename': result['filename']})
+
+            manifest = {
+                'day': day.isoformat(),
+                'generated_at': datetime.now().isoformat(timespec='seconds'),
+                'generated_by': generated_by,
+                'daily_report': 'daily_report.json',
+                'spc': 'spc.json',
+                'control_sheets': sheets
+            }
+            _write_json(os.path.join(staging, 'manifest.json'), manifest)
+            os.rename(staging, target)
+        except OSError:
+            # Another worker stored the day first
+            shutil.rmtree(staging, ignore_errors=True)
+            if os.path.exists(os.path.join(target, 'manifest.json')):
+                return dict(ReportSnapshotService.manifest(day), created=False)
+            raise
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        for sheet in sheets:
+            ControlSheetService.save_control_sheet('shift' if sheet['shift'] else 'daily', day, generated_by,
+                                                   os.path.join(target, sheet['filename']), shift=sheet['shift'])
+        return dict(manifest, created=True)
+
+    @staticmethod
+    def _read(day, name):
+        path = os.path.join(ReportSnapshotService.day_directory(day), name)
+        try:
+            return _read_json(path, os.path.getmtime(path))
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def manifest(day):
+        """Manifest of a day's snapshot, None when the day has none"""
+        return ReportSnapshotService._read(day, 'manifest.json')
+
+    @staticmethod
+    def daily_report(day):
+        """(export_daily_report payload, generation time) of a stored day, or None"""
+        manifest = ReportSnapshotService.manifest(day)
+        stored = manifest and ReportSnapshotService._read(day, manifest['daily_report'])
+        if not stored:
+            return None
+
+        report_data = dict(stored)
+        for key, model_class in REPORT_RECORDS.items():
+            decoders = _decoders(model_class.__table__)
+            report_data[key] = [model_class(**{column: decoders[column](value)
+                                               for column, value in row.items() if column in decoders})
+                                for row in stored[key]]
+        report_data['week_start'] = date.fromisoformat(stored['week_start'])
+        report_data['week_end'] = date.fromisoformat(stored['week_end'])
+        report_data['clay_by_date'] = {}
+        for control in report_data['clay_controls_week']:
+            report_data['clay_by_date'].setdefault(control.date.strftime('%Y-%m-%d'), []).append(control)
+        return report_data, datetime.fromisoformat(manifest['generated_at'])
+
+    @staticmethod
+    def daily_report_path(day):
+        """Stored export_daily_report JSON file of a day, or None"""
+        manifest = ReportSnapshotService.manifest(day)
+        return os.path.join(ReportSnapshotService.day_directory(day), manifest['daily_report']) if manifest else None
+
+    @staticmethod
+    def spc_series(end_date=None, max_points=None, live=False):
+        """SPC_CHARTS series of the SPC_DAYS ending on end_date (default today)
+
+        The previous day's snapshot supplies every day but the last, which
+        is the only one queried. Returns (series by chart, generation time
+        of the snapshot used or None).
+        """
+        from utils.helpers import get_control_chart_data
+        from utils.downsampling import downsample_chart_data
+
+        end_date = end_date or date.today()
+        start_date = end_date - timedelta(days=SPC_DAYS - 1)
+        previous_day = end_date - timedelta(days=1)
+        manifest = None if live else ReportSnapshotService.manifest(previous_day)
+        stored = manifest and ReportSnapshotService._read(previous_day, manifest['spc'])
+
+        if not stored:
+            return {name: get_control_chart_data(model_class, parameter, start_date=start_date,
+                                                 end_date=end_date, max_points=max_points)
+                    for name, (model_class, parameter) in SPC_CHARTS.items()}, None
+
+        first = start_date.isoformat()
+        series = {}
+        for name, (model_class, parameter) in SPC_CHARTS.items():
+            data = [point for point in stored['series'][name] if point['date'] >= first]
+            data += get_control_chart_data(model_class, parameter, start_date=end_date, end_date=end_date)
+            if max_points:
+                data = downsample_chart_data(data, max_points,
+                                             keep=lambda point: point['compliance'] != 'compliant')
+            series[name] = data
+        return series, datetime.fromisoformat(manifest['generated_at'])
+
+    @staticmethod
+    def control_sheet(day, shift=None):
+        """Stored control sheet file of a day (or one shift of it), or None"""
+        sheet = ControlSheet.query.filter(
+            ControlSheet.sheet_type == ('shift' if shift else 'daily'),
+            ControlSheet.reference_date == day,
+            ControlSheet.shift == shift,
+            ControlSheet.status == 'final',
+            ControlSheet.file_path.isnot(None)
+        ).order_by(ControlSheet.generated_at.desc()).first()
+        if sheet and os.path.exists(sheet.file_path):
+            return sheet.file_path
+        return None
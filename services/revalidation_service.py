@@ -0,0 +1,105 @@
+from models import db
+from utils.control_registry import CONTROL_MODELS
+from utils.rules_engine import rules_engine, plan_fields, CHECK_PLANS
+from sqlalchemy import select, update
+from datetime import datetime
+
+class RevalidationService:
+    """Recompute compliance_status of stored records after specification changes"""
+
+    CHUNK_SIZE = 5000
+    SAMPLE_SIZE = 100
+
+    @staticmethod
+    def revalidatable_types():
+        """Control types whose compliance is derived from specifications"""
+        return [ct for ct in CONTROL_MODELS if ct in CHECK_PLANS]
+
+    @staticmethod
+    def revalidate(control_type, format_type=None, dry_run=False, chunk_size=None):
+        """Re-evaluate every record of a control type against the current specs
+
+        Rows are streamed in id order by chunks of selected columns, evaluated
+        with the vectorized rules engine, and only rows whose status changes
+        are written back with one UPDATE per target status. Mapper events are
+        not involved. With dry_run nothing is written and the report lists a
+        sample of the changes that would be made.
+        """
+        if control_type not in RevalidationService.revalidatable_types():
+            raise ValueError(f"Unknown control type: {control_type}")
+
+        model_class = CONTROL_MODELS[control_type]
+        table = model_class.__table__
+        chunk_size = chunk_size or RevalidationService.CHUNK_SIZE
+
+        fields = [name for name in plan_fields(control_type) if name in table.c]
+        columns = [table.c.id, table.c.date, table.c.compliance_status] + [table.c[name] for name in fields]
+
+        # Specifications were just edited; never evaluate against a cached table
+        rules_engine.invalidate()
+
+        report = {
+            'control_type': control_type,
+            'format_type': format_type,
+            'dry_run': dry_run,
+            'started_at': datetime.now().isoformat(),
+            'scanned': 0,
+            'changed': 0,
+            'transitions': {},
+            'changes': []
+        }
+
+        last_id = 0
+        while True:
+            statement = select(*columns).where(table.c.id > last_id)
+            if format_type and 'format_type' in table.c:
+                statement = statement.where(table.c.format_type == format_type)
+            rows = db.session.execute(statement.order_by(table.c.id).limit(chunk_size)).all()
+            if not rows:
+                break
+
+            last_id = rows[-1].id
+            report['scanned'] += len(rows)
+
+            batch = {name: [getattr(row, name) for row in rows] for name in fields}
+            compliant = rules_engine.evaluate_batch(control_type, batch)['compliant']
+
+            updates = {'compliant': [], 'non_compliant': []}
+            for row, is_compliant in zip(rows, compliant):
+                new_status = 'compliant' if is_compliant else 'non_compliant'
+                if row.compliance_status == new_status:
+                    continue
+
+                updates[new_status].append(row.id)
+                transition = f"{row.compliance_status or 'none'}->{new_status}"
+                report['transitions'][transition] = report['transitions'].get(transition, 0) + 1
+                if len(report['changes']) < RevalidationService.SAMPLE_SIZE:
+                    report['changes'].append({
+                        'id': row.id,
+                        'date': row.date.isoformat() if row.date else None,
+                        'from': row.compliance_status,
+                        'to': new_status
+                    })
+
+            changed = len(updates['compliant']) + len(updates['non_compliant'])
+            report['changed'] += changed
+
+            if changed and not dry_run:
+                for status, ids in updates.items():
+                    if ids:
+                        db.session.execute(
+                            update(table).where(table.c.id.in_(ids)).values(compliance_status=status)
+                        )
+                db.session.commit()
+
+        if dry_run:
+            db.session.rollback()
+
+        report['finished_at'] = datetime.now().isoformat()
+        return report
+
+    @staticmethod
+    def revalidate_all(dry_run=False):
+        """Re-evaluate every control type"""
+        return [RevalidationService.revalidate(control_type, dry_run=dry_run)
+                for control_type in RevalidationService.revalidatable_types()]
@@ -1,7 +1,11 @@
 from models import db, ControlParameter, ScheduledControl, ControlStage
 from datetime import datetime, date, timedelta, time
+from sqlalchemy import select, func
 import random
 
+SHIFTS = ['06H-14H', '14H-22H', '22H-06H']
+STATUSES = ['pending', 'completed', 'overdue', 'skipped']
+
 class SchedulingService:
     
     @staticmethod
@@ -150,22 +154,66 @@ class SchedulingService:
         if not target_date:
             target_date = date.today()
         
-        # Get all scheduled controls for the date
-        controls = ScheduledControl.query.filter_by(scheduled_date=target_date).all()
+        return SchedulingService.get_schedule_summary_range(target_date, target_date)['days'][0]
+    
+    @staticmethod
+    def get_schedule_summary_range(start_date, end_date):
+        """Get per-day schedule summaries for a date range from one GROUP BY query
         
-        summary = {
-            'date': target_date,
-            'total': len(controls),
-            'by_shift': {'06H-14H': 0, '14H-22H': 0, '22H-06H': 0},
-            'by_status': {'pending': 0, 'completed': 0, 'overdue': 0, 'skipped': 0}
-        }
+        Every day of the range is present, each with total, by_shift,
+        by_status and by_shift_status ({shift: {status: count}}) counts.
+        'totals' holds the same counts over the whole range.
+        """
+        table = ScheduledControl.__table__
+        rows = db.session.execute(
+            select(
+                table.c.scheduled_date,
+                table.c.shift,
+                table.c.status,
+                func.count()
+            ).where(table.c.scheduled_date.between(start_date, end_date))
+            .group_by(table.c.scheduled_date, table.c.shift, table.c.status)
+        ).all()
         
-        for control in controls:
-            if control.shift:
-                summary['by_shift'][control.shift] += 1
-            summary['by_status'][control.status] += 1
+        def empty_summary(summary_date):
+            return {
+                'date': summary_date,
+                'total': 0,
+                'by_shift': {shift: 0 for shift in SHIFTS},
+                'by_status': {status: 0 for status in STATUSES},
+                'by_shift_status': {shift: {status: 0 for status in STATUSES} for shift in SHIFTS}
+            }
+        
+        days = {}
+        current_date = start_date
+        while current_date <= end_date:
+            days[current_date] = empty_summary(current_date)
+            current_date += timedelta(days=1)
+        totals = empty_summary(None)
+        
+        # Archived days are counted from their summaries
+        from services.archive_service import ArchiveService
+        if ArchiveService.covers(start_date):
+            for archived in ArchiveService.day_summaries(table.name, start_date, end_date):
+                for status, shifts in (archived.counts or {}).items():
+                    if status in STATUSES:
+                        rows.extend((archived.day, shift or None, status, count)
+                                    for shift, count in shifts.items())
         
-        return summary
+        for scheduled_date, shift, status, count in rows:
+            for summary in (days[scheduled_date], totals):
+                summary['total'] += count
+                summary['by_status'][status] += count
+                if shift:
+                    summary['by_shift'][shift] += count
+                    summary['by_shift_status'][shift][status] += count
+        
+        return {
+            'start_date': start_date,
+            'end_date': end_date,
+            'days': list(days.values()),
+            'totals': totals
+        }
     
     @staticmethod
     def initialize_default_parameters():
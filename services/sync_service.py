@@ -0,0 +1,141 @@
+from models import (db, SyncedSubmission, ClayControl, PressControl, DryerControl, BiscuitKilnControl,
+                    EmailKilnControl, DimensionalTest, EnamelControl, DigitalDecoration)
+from forms import (ClayControlForm, PressControlForm, DryerControlForm, BiscuitKilnForm, EmailKilnForm,
+                   DimensionalTestForm, EnamelControlForm, DigitalDecorationForm)
+from services.batch_entry_service import BatchEntryService
+from utils.pagination import invalidate_counts
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from werkzeug.datastructures import MultiDict
+from collections import namedtuple
+import uuid
+
+# Control type -> model and the form validating its entry page
+SyncControl = namedtuple('SyncControl', 'model form')
+
+SYNC_CONTROLS = {
+    'clay': SyncControl(ClayControl, ClayControlForm),
+    'press': SyncControl(PressControl, PressControlForm),
+    'dryer': SyncControl(DryerControl, DryerControlForm),
+    'biscuit_kiln': SyncControl(BiscuitKilnControl, BiscuitKilnForm),
+    'email_kiln': SyncControl(EmailKilnControl, EmailKilnForm),
+    'dimensional': SyncControl(DimensionalTest, DimensionalTestForm),
+    'enamel': SyncControl(EnamelControl, EnamelControlForm),
+    'digital': SyncControl(DigitalDecoration, DigitalDecorationForm),
+}
+
+class SyncService:
+    """Idempotent saving of the submissions queued by offline entry pages"""
+
+    MAX_SUBMISSIONS = 500
+
+    @staticmethod
+    def sync(submissions, controller_id):
+        """Validate and save a batch of queued submissions in one transaction
+
+        Each submission is ``{"id": <client uuid>, "control_type": ...,
+        "controller_id": <user id>, "data": {field: value}}``, the data being
+        the fields of the control's entry form and controller_id the user
+        logged in when it was queued. A client id already received (or
+        repeated in the batch) is reported as a duplicate instead of being
+        saved again; a submission queued by another user than controller_id
+        is invalid, never reassigned. Returns one result per submission, in
+        order: status created, duplicate or invalid, with the record id,
+        compliance status or form errors.
+        """
+        try:
+            return SyncService._sync(submissions, controller_id)
+        except IntegrityError:
+            # A concurrent sync of the same submissions committed first; its
+            # client ids now read as duplicates
+            db.session.rollback()
+            return SyncService._sync(submissions, controller_id)
+
+    @staticmethod
+    def _sync(submissions, controller_id):
+        results = [None] * len(submissions)
+        client_ids = {}
+
+        for index, submission in enumerate(submissions):
+            client_id = SyncService._client_id(submission)
+            if client_id is None:
+                results[index] = {'id': submission.get('id') if isinstance(submission, dict) else None,
+                                  'status': 'invalid', 'errors': {'id': ['Identifiant client invalide.']}}
+            elif client_id in client_ids:
+                results[index] = {'id': client_id, 'status': 'duplicate'}
+            else:
+                client_ids[client_id] = index
+
+        known = {}
+        if client_ids:
+            known = dict(db.session.execute(
+                select(SyncedSubmission.client_id, SyncedSubmission.record_id)
+                .where(SyncedSubmission.client_id.in_(list(client_ids)))
+            ).all())
+
+        pending = {}
+        for client_id, index in client_ids.items():
+            if client_id in known:
+                results[index] = {'id': client_id, 'status': 'duplicate', 'record_id': known[client_id]}
+                continue
+
+            submission = submissions[index]
+            if str(submission.get('controller_id')) != str(controller_id):
+                results[index] = {'id': client_id, 'status': 'invalid',
+                                  'errors': {'controller_id': ['Saisie enregistrée par un autre utilisateur.']}}
+                continue
+
+            control = SYNC_CONTROLS.get(submission.get('control_type'))
+            if control is None:
+                results[index] = {'id': client_id, 'status': 'invalid',
+                                  'errors': {'control_type': ['Type de contrôle inconnu.']}}
+                continue
+
+            record, errors = SyncService._validate(control, submission.get('data'))
+            if errors:
+                results[index] = {'id': client_id, 'status': 'invalid', 'errors': errors}
+                continue
+
+            record['controller_id'] = controller_id
+            pending.setdefault(submission['control_type'], []).append((client_id, index, record))
+
+        synced = []
+        for control_type, entries in pending.items():
+            records = [record for _, _, record in entries]
+            ids, statuses, violations = BatchEntryService.insert(SYNC_CONTROLS[control_type].model, control_type, records)
+            for (client_id, index, _), record_id, status, failed in zip(entries, ids, statuses, violations):
+                results[index] = {'id': client_id, 'status': 'created', 'record_id': record_id,
+                                  'compliance_status': status, 'violations': failed}
+                synced.append({'client_id': client_id, 'control_type': control_type,
+                               'record_id': record_id, 'controller_id': controller_id})
+
+        if synced:
+            db.session.execute(insert(SyncedSubmission), synced)
+            db.session.commit()
+            invalidate_counts()
+
+        return results
+
+    @staticmethod
+    def _client_id(submission):
+        """Canonical form of a submission's client uuid, None when malformed"""
+        if not isinstance(submission, dict):
+            return None
+        try:
+            return str(uuid.UUID(str(submission.get('id'))))
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _validate(control, data):
+        """Column values of a submission, or the errors of its entry form"""
+        if not isinstance(data, dict):
+            return None, {'data': ['Données manquantes.']}
+
+        formdata = MultiDict({name: str(value) for name, value in data.items() if value is not None})
+        form = control.form(formdata=formdata, meta={'csrf': False})
+        if not form.validate():
+            return None, form.errors
+
+        table = control.model.__table__
+        return {name: field.data for name, field in form._fields.items() if name in table.c}, None
@@ -0,0 +1,371 @@
+// Contrôle Qualité Carreaux Céramiques - Saisie Hors Ligne
+
+/**
+ * Les formulaires de saisie marqués data-offline-control="<type>" ne sont
+ * plus envoyés directement : chaque soumission reçoit un identifiant généré
+ * sur l'appareil, est conservée dans IndexedDB puis envoyée par lots au
+ * serveur (/sync/batch). Le serveur ignore un identifiant déjà reçu, une
+ * soumission peut donc être renvoyée sans risque de doublon.
+ *
+ * Chaque soumission garde l'utilisateur connecté au moment de la saisie :
+ * seules celles de l'utilisateur connecté sont envoyées, et le serveur
+ * refuse une soumission d'un autre contrôleur au lieu de la lui attribuer.
+ * Sur un poste partagé, les saisies d'un autre utilisateur attendent sa
+ * prochaine connexion.
+ *
+ * Une soumission refusée par le serveur reste sur l'appareil jusqu'à ce que
+ * l'opérateur l'ait consultée : l'indicateur ouvre la liste des mesures
+ * refusées (données saisies et erreurs), d'où elles sont supprimées.
+ *
+ * Sans réseau, l'opérateur continue sa saisie ; la file est renvoyée au
+ * retour du réseau, au chargement de chaque page et toutes les 30 secondes.
+ */
+
+const OFFLINE_DB_NAME = 'ceramicqc-offline';
+const OFFLINE_STORE = 'submissions';
+const OFFLINE_SYNC_BATCH = 100;
+const OFFLINE_SYNC_INTERVAL_MS = 30000;
+
+const OFFLINE_CONTROL_LABELS = {
+    clay: 'Contrôle argile',
+    press: 'Contrôle presse',
+    dryer: 'Contrôle séchoir',
+    biscuit_kiln: 'Four biscuit',
+    email_kiln: 'Four émail',
+    dimensional: 'Test dimensionnel',
+    enamel: 'Contrôle émail',
+    digital: 'Décoration numérique'
+};
+
+let offlineDbPromise = null;
+let offlineSyncRunning = null;
+
+/**
+ * Ouvrir (une seule fois) la base IndexedDB de la file d'attente
+ */
+function openOfflineDb() {
+    if (!offlineDbPromise) {
+        offlineDbPromise = new Promise((resolve, reject) => {
+            const request = indexedDB.open(OFFLINE_DB_NAME, 1);
+            request.onupgradeneeded = () => {
+                request.result.createObjectStore(OFFLINE_STORE, { keyPath: 'id' });
+            };
+            request.onsuccess = () => resolve(request.result);
+            request.onerror = () => reject(request.error);
+        });
+    }
+    return offlineDbPromise;
+}
+
+/**
+ * Exécuter une opération sur le magasin des soumissions
+ */
+function withOfflineStore(mode, operation) {
+    return openOfflineDb().then(db => new Promise((resolve, reject) => {
+        const transaction = db.transaction(OFFLINE_STORE, mode);
+        const result = operation(transaction.objectStore(OFFLINE_STORE));
+        transaction.oncomplete = () => resolve(result && 'result' in result ? result.result : undefined);
+        transaction.onerror = () => reject(transaction.error);
+    }));
+}
+
+function queuedSubmissions() {
+    return withOfflineStore('readonly', store => store.getAll());
+}
+
+/**
+ * Utilisateur connecté (identifiant), null hors session
+ */
+function currentOfflineUser() {
+    return document.querySelector('meta[name="offline-user"]')?.content || null;
+}
+
+/**
+ * Soumissions en file de l'utilisateur connecté (et celles mises en file
+ * avant l'enregistrement de l'utilisateur, que le serveur refusera)
+ */
+async function ownQueuedSubmissions() {
+    const user = currentOfflineUser();
+    return (await queuedSubmissions()).filter(submission =>
+        !submission.controller_id || submission.controller_id === user);
+}
+
+function queueSubmission(submission) {
+    return withOfflineStore('readwrite', store => { store.put(submission); });
+}
+
+function updateQueuedSubmissions(removedIds, rejected) {
+    return withOfflineStore('readwrite', store => {
+        removedIds.forEach(id => store.delete(id));
+        rejected.forEach(submission => store.put(submission));
+    });
+}
+
+/**
+ * Identifiant client d'une soumission (UUID v4)
+ */
+function newSubmissionId() {
+    if (window.crypto && crypto.randomUUID) {
+        return crypto.randomUUID();
+    }
+    const bytes = crypto.getRandomValues(new Uint8Array(16));
+    bytes[6] = (bytes[6] & 0x0f) | 0x40;
+    bytes[8] = (bytes[8] & 0x3f) | 0x80;
+    const hex = Array.from(bytes, byte => byte.toString(16).padStart(2, '0')).join('');
+    return `${hex.slice(0, 8)}-${hex.slice(8, 12)}-${hex.slice(12, 16)}-${hex.slice(16, 20)}-${hex.slice(20)}`;
+}
+
+/**
+ * Champs du formulaire, sans le jeton CSRF
+ */
+function serializeOfflineForm(form) {
+    const data = {};
+    for (const [name, value] of new FormData(form).entries()) {
+        if (name !== 'csrf_token') {
+            data[name] = value;
+        }
+    }
+    return data;
+}
+
+/**
+ * Envoyer la file par lots ; renvoie les résultats du serveur par identifiant
+ */
+function syncOfflineQueue() {
+    if (offlineSyncRunning) return offlineSyncRunning;
+
+    const syncUrl = document.querySelector('meta[name="offline-sync"]')?.content;
+    if (!syncUrl) return Promise.resolve({});
+
+    offlineSyncRunning = (async () => {
+        const outcome = {};
+        const pending = (await ownQueuedSubmissions()).filter(submission => !submission.errors);
+
+        for (let start = 0; start < pending.length; start += OFFLINE_SYNC_BATCH) {
+            const batch = pending.slice(start, start + OFFLINE_SYNC_BATCH);
+            let response;
+            try {
+                response = await fetch(syncUrl, {
+                    method: 'POST',
+                    credentials: 'same-origin',
+                    headers: { 'Content-Type': 'application/json', 'Accept': 'application/json' },
+                    body: JSON.stringify({
+                        submissions: batch.map(({ id, control_type, controller_id, data }) =>
+                            ({ id, control_type, controller_id, data }))
+                    })
+                });
+            } catch (error) {
+                break;  // Hors ligne : nouvel essai plus tard
+            }
+            if (!response.ok || !(response.headers.get('Content-Type') || '').includes('application/json')) {
+                break;  // Session expirée ou serveur indisponible
+            }
+
+            const results = (await response.json()).results || [];
+            const removed = [];
+            const rejected = [];
+            results.forEach((result, index) => {
+                const submission = batch[index];
+                outcome[submission.id] = result;
+                if (result.status === 'invalid') {
+                    rejected.push(Object.assign({}, submission, { errors: result.errors }));
+                } else {
+                    removed.push(submission.id);
+                }
+            });
+            await updateQueuedSubmissions(removed, rejected);
+        }
+
+        await updateOfflineIndicator();
+        return outcome;
+    })().finally(() => { offlineSyncRunning = null; });
+
+    return offlineSyncRunning;
+}
+
+/**
+ * Indicateur du nombre de mesures en attente sur l'appareil
+ */
+async function updateOfflineIndicator() {
+    const submissions = await ownQueuedSubmissions();
+    const rejected = submissions.filter(submission => submission.errors).length;
+    let indicator = document.getElementById('offlineQueueIndicator');
+
+    if (!submissions.length) {
+        if (indicator) indicator.remove();
+        return;
+    }
+    if (!indicator) {
+        indicator = document.createElement('div');
+        indicator.id = 'offlineQueueIndicator';
+        indicator.className = 'position-fixed bottom-0 start-0 m-3 badge fs-6';
+        indicator.style.zIndex = 1080;
+        indicator.addEventListener('click', () => {
+            if (indicator.dataset.rejected !== '0') showRejectedSubmissions();
+        });
+        document.body.appendChild(indicator);
+    }
+    indicator.dataset.rejected = rejected;
+    indicator.classList.toggle('bg-danger', rejected > 0);
+    indicator.classList.toggle('bg-warning', rejected === 0);
+    indicator.classList.toggle('text-dark', rejected === 0);
+    indicator.style.cursor = rejected ? 'pointer' : '';
+    indicator.setAttribute('role', rejected ? 'button' : 'status');
+    indicator.textContent = `${submissions.length - rejected} mesure(s) en attente de synchronisation` +
+        (rejected ? ` · ${rejected} refusée(s) — voir` : '');
+    indicator.title = rejected ? 'Voir les mesures refusées par le serveur, à ressaisir puis supprimer.' : '';
+}
+
+function createElement(tag, className, text) {
+    const element = document.createElement(tag);
+    if (className) element.className = className;
+    if (text !== undefined) element.textContent = text;
+    return element;
+}
+
+/**
+ * Carte d'une soumission refusée : données saisies, erreurs et suppression
+ */
+function rejectedSubmissionCard(submission, onDiscard) {
+    const card = createElement('div', 'card mb-3 border-danger');
+    const header = createElement('div', 'card-header d-flex align-items-center');
+    const queuedAt = submission.queued_at ? new Date(submission.queued_at).toLocaleString('fr-FR') : '';
+    header.appendChild(createElement('strong', 'me-2',
+        OFFLINE_CONTROL_LABELS[submission.control_type] || submission.control_type));
+    header.appendChild(createElement('span', 'text-muted small', queuedAt && `saisie le ${queuedAt}`));
+    const discard = createElement('button', 'btn btn-sm btn-outline-danger ms-auto', 'Supprimer');
+    discard.type = 'button';
+    discard.addEventListener('click', () => onDiscard([submission.id]));
+    header.appendChild(discard);
+    card.appendChild(header);
+
+    const body = createElement('div', 'card-body');
+    const errors = createElement('ul', 'text-danger mb-2');
+    Object.entries(submission.errors || {}).forEach(([field, messages]) => {
+        errors.appendChild(createElement('li', '', `${field} : ${[].concat(messages).join(' ')}`));
+    });
+    body.appendChild(errors);
+
+    const table = createElement('table', 'table table-sm mb-0');
+    const rows = createElement('tbody');
+    Object.entries(submission.data || {}).forEach(([field, value]) => {
+        if (value === '' || value === null) return;
+        const row = createElement('tr');
+        row.appendChild(createElement('th', 'fw-normal text-muted', field));
+        row.appendChild(createElement('td', '', String(value)));
+        rows.appendChild(row);
+    });
+    table.appendChild(rows);
+    body.appendChild(table);
+    card.appendChild(body);
+    return card;
+}
+
+/**
+ * Liste des mesures refusées de l'utilisateur, pour les ressaisir puis les supprimer
+ */
+async function showRejectedSubmissions() {
+    let modalElement = document.getElementById('offlineRejectedModal');
+    if (!modalElement) {
+        modalElement = createElement('div', 'modal fade');
+        modalElement.id = 'offlineRejectedModal';
+        modalElement.tabIndex = -1;
+        modalElement.innerHTML = `
+            <div class="modal-dialog modal-lg modal-dialog-scrollable">
+                <div class="modal-content">
+                    <div class="modal-header">
+                        <h5 class="modal-title">Mesures refusées par le serveur</h5>
+                        <button type="button" class="btn-close" data-bs-dismiss="modal" aria-label="Fermer"></button>
+                    </div>
+                    <div class="modal-body">
+                        <p class="text-muted">Ces mesures n'ont pas été enregistrées. Ressaisissez-les si nécessaire, puis supprimez-les de cet appareil.</p>
+                        <div class="offline-rejected-list"></div>
+                    </div>
+                    <div class="modal-footer">
+                        <button type="button" class="btn btn-outline-danger offline-rejected-discard-all">Tout supprimer</button>
+                        <button type="button" class="btn btn-secondary" data-bs-dismiss="modal">Fermer</button>
+                    </div>
+                </div>
+            </div>`;
+        document.body.appendChild(modalElement);
+    }
+    const modal = bootstrap.Modal.getOrCreateInstance(modalElement);
+
+    const render = async () => {
+        const rejected = (await ownQueuedSubmissions()).filter(submission => submission.errors);
+        const list = modalElement.querySelector('.offline-rejected-list');
+        list.replaceChildren(...rejected.map(submission => rejectedSubmissionCard(submission, discard)));
+        modalElement.querySelector('.offline-rejected-discard-all').onclick =
+            () => discard(rejected.map(submission => submission.id));
+        await updateOfflineIndicator();
+        return rejected.length;
+    };
+    const discard = async ids => {
+        await updateQueuedSubmissions(ids, []);
+        if (!await render()) modal.hide();
+    };
+
+    if (await render()) modal.show();
+}
+
+function showOfflineMessage(form, message) {
+    let alert = form.querySelector('.offline-queue-alert');
+    if (!alert) {
+        alert = document.createElement('div');
+        alert.className = 'alert alert-warning offline-queue-alert';
+        form.prepend(alert);
+    }
+    alert.textContent = message;
+}
+
+/**
+ * Mettre en file la soumission d'un formulaire de saisie
+ */
+function initializeOfflineForm(form) {
+    form.addEventListener('submit', async function(e) {
+        if (e.defaultPrevented) return;  // Refusé par la validation du formulaire
+        e.preventDefault();
+
+        const submission = {
+            id: newSubmissionId(),
+            control_type: form.dataset.offlineControl,
+            controller_id: currentOfflineUser(),
+            data: serializeOfflineForm(form),
+            queued_at: new Date().toISOString()
+        };
+        await queueSubmission(submission);
+        await offlineSyncRunning;  // Un envoi déjà en cours ne contient pas cette soumission
+
+        const result = (await syncOfflineQueue())[submission.id];
+        if (result && result.status === 'invalid') {
+            // En ligne mais refusée : envoi classique pour afficher les erreurs du serveur
+            await updateQueuedSubmissions([submission.id], []);
+            await updateOfflineIndicator();
+            form.submit();
+        } else if (result) {
+            window.location.href = form.dataset.offlineListUrl || window.location.href;
+        } else {
+            form.reset();
+            showOfflineMessage(form, 'Réseau indisponible : la mesure est enregistrée sur cet appareil et sera envoyée automatiquement.');
+            await updateOfflineIndicator();
+        }
+    });
+}
+
+// Exporter les fonctions de la file hors ligne
+window.CeramicQCOffline = {
+    syncOfflineQueue,
+    queuedSubmissions,
+    ownQueuedSubmissions,
+    showRejectedSubmissions
+};
+
+document.addEventListener('DOMContentLoaded', function() {
+    if (!window.indexedDB || !document.querySelector('meta[name="offline-sync"]')) return;
+
+    document.querySelectorAll('form[data-offline-control]').forEach(initializeOfflineForm);
+
+    syncOfflineQueue();
+    window.addEventListener('online', syncOfflineQueue);
+    setInterval(syncOfflineQueue, OFFLINE_SYNC_INTERVAL_MS);
+});
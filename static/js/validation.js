@@ -1,133 +1,121 @@
 // Contrôle Qualité Carreaux Céramiques - Validation de Formulaires en Temps Réel
 
 /**
- * Limites de spécifications pour différents types de contrôles
+ * Spécifications actives, par type de contrôle et paramètre :
+ * { clay: { humidity_before_prep: [{ format_type, enamel_type, min, max, target, unit, ... }] } }
+ *
+ * Chargées depuis le bundle versionné du serveur (/specifications/api/bundle)
+ * et conservées dans le localStorage tant que la version ne change pas.
  */
-const SPECIFICATIONS = {
-    clay: {
-        humidity_before_prep: { min: 2.5, max: 4.1, unit: '%' },
-        humidity_after_sieving: { min: 2.0, max: 3.5, unit: '%' },
-        humidity_after_prep: { min: 5.3, max: 6.3, unit: '%' },
-        granulometry_refusal: { min: 10, max: 20, unit: '%' },
-        calcium_carbonate: { min: 15, max: 25, unit: '%' }
-    },
-    
-    press: {
-        thickness: {
-            '20x20': { min: 6.2, max: 7.2, unit: 'mm' },
-            '25x40': { min: 6.8, max: 7.4, unit: 'mm' },
-            '25x50': { min: 7.1, max: 7.7, unit: 'mm' }
-        },
-        weight: {
-            '20x20': { min: 480, max: 580, unit: 'g' },
-            '25x40': { min: 1150, max: 1550, unit: 'g' },
-            '25x50': { min: 1800, max: 2000, unit: 'g' }
-        },
-        defects: {
-            grains: { max: 15, unit: '%' },
-            cracks: { max: 1, unit: '%' },
-            cleaning: { max: 1, unit: '%' },
-            foliage: { max: 1, unit: '%' },
-            chipping: { max: 1, unit: '%' }
-        }
-    },
-    
-    dryer: {
-        residual_humidity: { min: 0.1, max: 1.5, unit: '%' },
-        defects: {
-            grains: { max: 15, unit: '%' },
-            cracks: { max: 1, unit: '%' },
-            cleaning: { max: 1, unit: '%' },
-            foliage: { max: 1, unit: '%' },
-            chipping: { max: 1, unit: '%' }
-        }
-    },
-    
-    biscuit_kiln: {
-        defects: {
-            cracks: { max: 5, unit: '%' },
-            chipping: { max: 5, unit: '%' },
-            cooking: { max: 1, unit: '%' },
-            foliage: { max: 1, unit: '%' },
-            flatness: { max: 5, unit: '%' }
-        },
-        shrinkage_expansion: { min: -0.2, max: 0.4, unit: '%' },
-        fire_loss: { min: 10, max: 19, unit: '%' }
-    },
-    
-    email_kiln: {
-        thermal_shock: { max: 5, unit: '%' },
-        rupture_resistance: {
-            thick: { min: 600, unit: 'N' },  // ≥7.5mm
-            thin: { min: 200, unit: 'N' }    // <7.5mm
-        },
-        rupture_module: {
-            thick: { min: 12, unit: 'N/mm²' },  // ≥7.5mm
-            thin: { min: 15, unit: 'N/mm²' }    // <7.5mm
-        },
-        dimensional_deviation: {
-            length: { min: -0.5, max: 0.5, unit: '%' },
-            width: { min: -0.5, max: 0.5, unit: '%' },
-            thickness: { min: -10, max: 10, unit: '%' }
-        },
-        water_absorption: { min: 9, unit: '%' },
-        quality: {
-            color_nuance: { max: 1, unit: '%' },
-            cooking_defects: { max: 1, unit: '%' },
-            flatness_defects: { max: 5, unit: '%' }
-        }
-    },
+let SPECIFICATIONS = {};
+
+const SPEC_BUNDLE_STORAGE_KEY = 'ceramicqc.specBundle';
+
+/**
+ * Charger le bundle de spécifications (une seule fois par page)
+ */
+function loadSpecifications() {
+    const meta = document.querySelector('meta[name="spec-bundle"]');
+    if (!meta) return Promise.resolve(SPECIFICATIONS);
+    
+    const url = meta.content;
+    const version = new URL(url, window.location.href).searchParams.get('v');
+    
+    let cached = null;
+    try {
+        cached = JSON.parse(localStorage.getItem(SPEC_BUNDLE_STORAGE_KEY));
+    } catch (e) {
+        cached = null;
+    }
     
-    dimensional: {
-        curvature: { min: -2, max: 2, unit: 'mm' },
-        edge_straightness: { min: -1.5, max: 1.5, unit: 'mm' },
-        surface_quality: { min: 95, unit: '%' },
-        min_tiles: 30,
-        min_area: 1, // m²
-        min_lighting: 300 // lux
-    },
+    // Même version que celle annoncée par la page : aucune requête
+    if (cached && cached.version === version) {
+        SPECIFICATIONS = cached.specs;
+        return Promise.resolve(SPECIFICATIONS);
+    }
     
-    enamel: {
-        density: {
-            engobe: { min: 1780, max: 1830, unit: 'g/l' },
-            email: { min: 1730, max: 1780, unit: 'g/l' },
-            mate: { min: 1780, max: 1830, unit: 'g/l' }
-        },
-        viscosity: { min: 25, max: 55, unit: 'secondes' },
-        grammage: {
-            water: {
-                '20x20': { min: 0.5, max: 3, unit: 'g' },
-                '25x40': { min: 1, max: 5, unit: 'g' },
-                '25x50': { min: 3, max: 7, unit: 'g' }
-            },
-            enamel: {
-                '20x20': { min: 20, max: 23, unit: 'g' },
-                '25x40': { min: 50, max: 55, unit: 'g' },
-                '25x50': { min: 70, max: 75, unit: 'g' }
+    return fetch(url, { credentials: 'same-origin' })
+        .then(response => {
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
+            return response.json();
+        })
+        .then(bundle => {
+            SPECIFICATIONS = bundle.specs;
+            try {
+                localStorage.setItem(SPEC_BUNDLE_STORAGE_KEY, JSON.stringify(bundle));
+            } catch (e) {
+                // Stockage plein ou désactivé : le cache HTTP prend le relais
             }
-        }
+            return SPECIFICATIONS;
+        })
+        .catch(error => {
+            console.warn('Spécifications indisponibles :', error);
+            // Hors ligne : dernière version connue
+            if (cached) SPECIFICATIONS = cached.specs;
+            return SPECIFICATIONS;
+        });
+}
+
+let specificationsPromise = null;
+
+/**
+ * Promesse résolue quand les spécifications sont disponibles
+ */
+function whenSpecificationsReady() {
+    if (!specificationsPromise) {
+        specificationsPromise = loadSpecifications();
     }
-};
+    return specificationsPromise;
+}
+
+/**
+ * Trouver la spécification d'un paramètre, comme le moteur de règles du serveur :
+ * première règle correspondant au format et au type d'émail fournis
+ */
+function findSpecification(controlType, parameter, formatType = null, enamelType = null) {
+    const rules = (SPECIFICATIONS[controlType] || {})[parameter];
+    if (!rules) return null;
+    
+    const rule = rules.find(candidate =>
+        (!formatType || candidate.format_type === formatType) &&
+        (!enamelType || candidate.enamel_type === enamelType)
+    );
+    if (!rule) return null;
+    
+    return {
+        min: rule.min === null ? undefined : rule.min,
+        max: rule.max === null ? undefined : rule.max,
+        target: rule.target === null ? undefined : rule.target,
+        unit: rule.unit || '',
+        absolute: rule.absolute,
+        strict: rule.strict
+    };
+}
 
 /**
  * Initialiser la validation des formulaires
  */
 function initializeValidation(formId) {
     const form = document.getElementById(formId);
-    if (!form) return;
+    if (!form || form.dataset.validationInitialized) return;
+    form.dataset.validationInitialized = 'true';
     
     // Obtenir le type de formulaire depuis l'ID ou l'attribut data
     const formType = getFormType(formId);
     
-    // Initialiser la validation en temps réel pour toutes les saisies
-    const inputs = form.querySelectorAll('input[type="number"], input[data-validate]');
-    inputs.forEach(input => {
-        initializeInputValidation(input, formType);
+    whenSpecificationsReady().then(() => {
+        // Initialiser la validation en temps réel pour toutes les saisies
+        const inputs = form.querySelectorAll('input[type="number"], input[data-validate]');
+        inputs.forEach(input => {
+            initializeInputValidation(input, formType);
+        });
+        
+        // Initialiser la validation dépendante du format
+        initializeFormatValidation(form, formType);
+        
+        console.log(`Validation initialisée pour le formulaire ${formType}`);
     });
     
-    // Initialiser la validation dépendante du format
-    initializeFormatValidation(form, formType);
-    
     // Initialiser la validation de soumission du formulaire
     form.addEventListener('submit', function(e) {
         if (!validateForm(form, formType)) {
@@ -135,8 +123,6 @@ function initializeValidation(formId) {
             showValidationSummary(form);
         }
     });
-    
-    console.log(`Validation initialisée pour le formulaire ${formType}`);
 }
 
 /**
@@ -161,81 +147,86 @@ function getFormType(formId) {
  * Initialiser la validation pour une saisie individuelle
  */
 function initializeInputValidation(input, formType) {
-    // Obtenir les paramètres de validation depuis les attributs data ou les spécifications
-    const parameter = getParameterName(input.name);
-    const specs = getSpecificationForParameter(formType, parameter, input);
-    
-    if (!specs) return;
-    
-    // Définir les attributs data pour la validation
-    if (specs.min !== undefined) input.setAttribute('data-min', specs.min);
-    if (specs.max !== undefined) input.setAttribute('data-max', specs.max);
-    if (specs.unit) input.setAttribute('data-unit', specs.unit);
+    const specs = getSpecificationForParameter(formType, input);
+    if (specs) applySpecification(input, specs);
     
-    // Ajouter la validation en temps réel
+    // Ajouter la validation en temps réel (la spécification suit le format sélectionné)
     input.addEventListener('input', function() {
-        validateInput(this, specs);
+        const specs = getSpecificationForParameter(formType, this);
+        if (specs) validateInput(this, specs);
     });
     
     input.addEventListener('blur', function() {
-        validateInput(this, specs, true);
+        const specs = getSpecificationForParameter(formType, this);
+        if (specs) validateInput(this, specs, true);
     });
-    
-    // Ajouter un placeholder utile
-    if (specs.min !== undefined && specs.max !== undefined) {
-        input.placeholder = `${specs.min} - ${specs.max} ${specs.unit || ''}`;
-    } else if (specs.max !== undefined) {
-        input.placeholder = `≤ ${specs.max} ${specs.unit || ''}`;
-    } else if (specs.min !== undefined) {
-        input.placeholder = `≥ ${specs.min} ${specs.unit || ''}`;
-    }
 }
 
 /**
- * Obtenir le nom du paramètre depuis le nom de la saisie
+ * Obtenir les spécifications pour une saisie
+ *
+ * Le nom de la saisie est le nom du paramètre ; les règles dépendantes du
+ * format ou du type d'émail utilisent les sélections du formulaire.
  */
-function getParameterName(inputName) {
-    // Supprimer les préfixes et suffixes communs
-    return inputName.replace(/^(defect_|humidity_|dimension_)/, '')
-                  .replace(/(_deviation|_defects)$/, '');
+function getSpecificationForParameter(formType, input) {
+    const rules = SPECIFICATIONS[formType];
+    if (!rules) return null;
+    
+    const selected = name => {
+        const field = input.form ? input.form.querySelector(`[name="${name}"]`) : null;
+        return field && field.value ? field.value : null;
+    };
+    
+    let parameter = input.name;
+    
+    // Résistance et module de rupture : règle selon l'épaisseur (≥ 7,5 mm ou non)
+    if (!rules[parameter] && rules[`${parameter}_thick`]) {
+        const thickness = parseFloat(selected('thickness_for_resistance'));
+        parameter += (isNaN(thickness) || thickness >= 7.5) ? '_thick' : '_thin';
+    }
+    
+    const candidates = rules[parameter];
+    if (!candidates) return null;
+    
+    // Sans format (ou type d'émail) sélectionné, une règle qui en dépend ne s'applique pas
+    const byFormat = candidates.some(rule => rule.format_type);
+    const byEnamel = candidates.some(rule => rule.enamel_type);
+    const formatType = byFormat ? selected('format_type') : null;
+    const enamelType = byEnamel ? selected('enamel_type') : null;
+    if ((byFormat && !formatType) || (byEnamel && !enamelType)) return null;
+    
+    return findSpecification(formType, parameter, formatType, enamelType);
 }
 
 /**
- * Obtenir les spécifications pour un paramètre
+ * Appliquer une spécification à une saisie : attributs, placeholder et texte d'aide
  */
-function getSpecificationForParameter(formType, parameter, input) {
-    const specs = SPECIFICATIONS[formType];
-    if (!specs) return null;
+function applySpecification(input, specs, helpText = null) {
+    input.removeAttribute('data-min');
+    input.removeAttribute('data-max');
+    if (specs.min !== undefined) input.setAttribute('data-min', specs.min);
+    if (specs.max !== undefined) input.setAttribute('data-max', specs.max);
+    if (specs.unit) input.setAttribute('data-unit', specs.unit);
     
-    // Gérer les spécifications imbriquées (ex: dépendantes du format)
-    if (specs[parameter]) {
-        const spec = specs[parameter];
-        
-        // Vérifier si c'est dépendant du format
-        if (typeof spec === 'object' && spec.hasOwnProperty('20x20')) {
-            const formatSelect = input.form.querySelector('[name="format_type"]');
-            const format = formatSelect ? formatSelect.value : '20x20';
-            return spec[format] || spec['20x20'];
-        }
-        
-        // Vérifier si c'est dépendant du type d'émail
-        if (typeof spec === 'object' && spec.hasOwnProperty('engobe')) {
-            const enamelSelect = input.form.querySelector('[name="enamel_type"]');
-            const enamelType = enamelSelect ? enamelSelect.value : 'engobe';
-            return spec[enamelType] || spec['engobe'];
-        }
-        
-        return spec;
+    const range = formatSpecificationRange(specs);
+    if (range) {
+        input.placeholder = range;
+        if (helpText) helpText.textContent = `Spéc : ${range}`;
     }
-    
-    // Vérifier dans les objets imbriqués (défauts, qualité, etc.)
-    for (const [category, categorySpecs] of Object.entries(specs)) {
-        if (typeof categorySpecs === 'object' && categorySpecs[parameter]) {
-            return categorySpecs[parameter];
-        }
+}
+
+/**
+ * Plage lisible d'une spécification
+ */
+function formatSpecificationRange(specs) {
+    if (specs.min !== undefined && specs.max !== undefined) {
+        return `${specs.min} - ${specs.max} ${specs.unit || ''}`.trim();
+    } else if (specs.max !== undefined) {
+        return `≤ ${specs.max} ${specs.unit || ''}`.trim();
+    } else if (specs.min !== undefined) {
+        return `≥ ${specs.min} ${specs.unit || ''}`.trim();
     }
-    
-    return null;
+    return '';
 }
 
 /**
@@ -273,6 +264,14 @@ function validateInput(input, specs, showFeedback = false) {
 function validateValue(value, specs) {
     if (isNaN(value)) return false;
     
+    if (specs.absolute) value = Math.abs(value);
+    
+    if (specs.strict) {
+        if (specs.min !== undefined && value <= specs.min) return false;
+        if (specs.max !== undefined && value >= specs.max) return false;
+        return true;
+    }
+    
     if (specs.min !== undefined && value < specs.min) return false;
     if (specs.max !== undefined && value > specs.max) return false;
     
@@ -338,140 +337,57 @@ function initializeFormatValidation(form, formType) {
     }
 }
 
+
 /**
- * Mettre à jour la validation dépendante du format
+ * Saisies dont la spécification dépend du format ou du type d'émail,
+ * avec l'identifiant de leur texte d'aide
  */
-function updateFormatDependentValidation(form, formType) {
-    const formatSelect = form.querySelector('[name="format_type"]');
-    const format = formatSelect ? formatSelect.value : null;
-    
-    if (!format) return;
-    
-    // Mettre à jour la validation d'épaisseur et de poids pour les contrôles de presse
-    if (formType === 'press') {
-        updatePressValidation(form, format);
-    }
-    
-    // Mettre à jour la validation de grammage pour les contrôles d'émail
-    if (formType === 'enamel') {
-        updateGrammageValidation(form, format);
+const DEPENDENT_INPUTS = {
+    press: {
+        format_type: { thickness: 'thicknessSpec', wet_weight: 'weightSpec' }
+    },
+    enamel: {
+        format_type: { water_grammage: 'waterSpec', enamel_grammage: 'enamelSpec' },
+        enamel_type: { density: 'densitySpec', enamel_grammage: 'enamelSpec' }
     }
-}
+};
 
 /**
- * Mettre à jour la validation de presse selon le format
+ * Mettre à jour la validation dépendante du format
  */
-function updatePressValidation(form, format) {
-    const specs = SPECIFICATIONS.press;
-    
-    // Mettre à jour la validation d'épaisseur
-    const thicknessInput = form.querySelector('[name="thickness"]');
-    if (thicknessInput && specs.thickness[format]) {
-        const thicknessSpec = specs.thickness[format];
-        thicknessInput.setAttribute('data-min', thicknessSpec.min);
-        thicknessInput.setAttribute('data-max', thicknessSpec.max);
-        thicknessInput.placeholder = `${thicknessSpec.min} - ${thicknessSpec.max} ${thicknessSpec.unit}`;
-        
-        // Mettre à jour le texte d'aide
-        const helpText = form.querySelector('#thicknessSpec');
-        if (helpText) {
-            helpText.textContent = `Spéc : ${thicknessSpec.min} - ${thicknessSpec.max} ${thicknessSpec.unit}`;
-        }
-        
-        // Re-valider s'il y a une valeur
-        if (thicknessInput.value) {
-            validateInput(thicknessInput, thicknessSpec);
-        }
-    }
-    
-    // Mettre à jour la validation de poids
-    const weightInput = form.querySelector('[name="wet_weight"]');
-    if (weightInput && specs.weight[format]) {
-        const weightSpec = specs.weight[format];
-        weightInput.setAttribute('data-min', weightSpec.min);
-        weightInput.setAttribute('data-max', weightSpec.max);
-        weightInput.placeholder = `${weightSpec.min} - ${weightSpec.max} ${weightSpec.unit}`;
-        
-        // Mettre à jour le texte d'aide
-        const helpText = form.querySelector('#weightSpec');
-        if (helpText) {
-            helpText.textContent = `Spéc : ${weightSpec.min} - ${weightSpec.max} ${weightSpec.unit}`;
-        }
-        
-        // Re-valider s'il y a une valeur
-        if (weightInput.value) {
-            validateInput(weightInput, weightSpec);
-        }
-    }
+function updateFormatDependentValidation(form, formType) {
+    updateDependentInputs(form, formType, 'format_type');
 }
 
 /**
  * Mettre à jour la validation d'émail selon le type
  */
 function updateEnamelDependentValidation(form, formType) {
-    const enamelSelect = form.querySelector('[name="enamel_type"]');
-    const enamelType = enamelSelect ? enamelSelect.value : null;
-    
-    if (!enamelType) return;
-    
-    const specs = SPECIFICATIONS.enamel;
-    
-    // Mettre à jour la validation de densité
-    const densityInput = form.querySelector('[name="density"]');
-    if (densityInput && specs.density[enamelType]) {
-        const densitySpec = specs.density[enamelType];
-        densityInput.setAttribute('data-min', densitySpec.min);
-        densityInput.setAttribute('data-max', densitySpec.max);
-        densityInput.placeholder = `${densitySpec.min} - ${densitySpec.max} ${densitySpec.unit}`;
-        
-        // Mettre à jour le texte d'aide
-        const helpText = form.querySelector('#densitySpec');
-        if (helpText) {
-            helpText.textContent = `Spéc : ${densitySpec.min} - ${densitySpec.max} ${densitySpec.unit}`;
-        }
-        
-        // Re-valider s'il y a une valeur
-        if (densityInput.value) {
-            validateInput(densityInput, densitySpec);
-        }
-    }
+    updateDependentInputs(form, formType, 'enamel_type');
 }
 
 /**
- * Mettre à jour la validation de grammage selon le format
+ * Ré-appliquer les spécifications des saisies qui dépendent d'une sélection
  */
-function updateGrammageValidation(form, format) {
-    const specs = SPECIFICATIONS.enamel.grammage;
-    
-    // Mettre à jour le grammage d'eau
-    const waterInput = form.querySelector('[name="water_grammage"]');
-    if (waterInput && specs.water[format]) {
-        const waterSpec = specs.water[format];
-        waterInput.setAttribute('data-min', waterSpec.min);
-        waterInput.setAttribute('data-max', waterSpec.max);
-        waterInput.placeholder = `${waterSpec.min} - ${waterSpec.max} ${waterSpec.unit}`;
+function updateDependentInputs(form, formType, selectName) {
+    const select = form.querySelector(`[name="${selectName}"]`);
+    if (!select || !select.value) return;
+    
+    const inputs = (DEPENDENT_INPUTS[formType] || {})[selectName] || {};
+    Object.entries(inputs).forEach(([name, helpId]) => {
+        const input = form.querySelector(`[name="${name}"]`);
+        if (!input) return;
         
-        // Mettre à jour le texte d'aide
-        const helpText = form.querySelector('#waterSpec');
-        if (helpText) {
-            helpText.textContent = `Spéc : ${waterSpec.min} - ${waterSpec.max} ${waterSpec.unit}`;
-        }
-    }
-    
-    // Mettre à jour le grammage d'émail
-    const enamelInput = form.querySelector('[name="enamel_grammage"]');
-    if (enamelInput && specs.enamel[format]) {
-        const enamelSpec = specs.enamel[format];
-        enamelInput.setAttribute('data-min', enamelSpec.min);
-        enamelInput.setAttribute('data-max', enamelSpec.max);
-        enamelInput.placeholder = `${enamelSpec.min} - ${enamelSpec.max} ${enamelSpec.unit}`;
+        const specs = getSpecificationForParameter(formType, input);
+        if (!specs) return;
         
-        // Mettre à jour le texte d'aide
-        const helpText = form.querySelector('#enamelSpec');
-        if (helpText) {
-            helpText.textContent = `Spéc : ${enamelSpec.min} - ${enamelSpec.max} ${enamelSpec.unit}`;
+        applySpecification(input, specs, form.querySelector(`#${helpId}`));
+        
+        // Re-valider s'il y a une valeur
+        if (input.value) {
+            validateInput(input, specs);
         }
-    }
+    });
 }
 
 /**
@@ -482,8 +398,7 @@ function validateForm(form, formType) {
     let isValid = true;
     
     inputs.forEach(input => {
-        const parameter = getParameterName(input.name);
-        const specs = getSpecificationForParameter(formType, parameter, input);
+        const specs = getSpecificationForParameter(formType, input);
         
         if (specs && input.value) {
             const inputValid = validateInput(input, specs, true);
@@ -496,6 +411,7 @@ function validateForm(form, formType) {
     return isValid;
 }
 
+
 /**
  * Afficher le résumé de validation
  */
@@ -578,7 +494,8 @@ function initializeSurfaceQualityCalculation(form) {
         
         if (total > 0 && defectFree >= 0) {
             const percentage = (defectFree / total) * 100;
-            const isCompliant = percentage >= 95;
+            const minimum = (findSpecification('dimensional', 'surface_quality') || {}).min;
+            const isCompliant = minimum === undefined || percentage >= minimum;
             
             if (qualityIndicator) {
                 qualityIndicator.textContent = `${percentage.toFixed(1)}% sans défaut`;
@@ -603,7 +520,10 @@ window.CeramicQCValidation = {
     validateInput,
     validateForm,
     updateComplianceIndicator,
-    SPECIFICATIONS
+    whenSpecificationsReady,
+    findSpecification,
+    formatSpecificationRange,
+    get SPECIFICATIONS() { return SPECIFICATIONS; }
 };
 
 // Auto-initialiser la validation pour les formulaires avec des IDs spécifiques
@@ -625,4 +545,4 @@ document.addEventListener('DOMContentLoaded', function() {
             initializeValidation(formId);
         }
     });
-});
\ No newline at end of file
+});
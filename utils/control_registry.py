@@ -0,0 +1,101 @@
+from models import (ClayControl, PressControl, DryerControl, BiscuitKilnControl,
+                    EmailKilnControl, EnamelControl, DimensionalTest,
+                    DigitalDecoration, ExternalTest)
+
+# Control type (as used by Specification.control_type) -> model
+CONTROL_MODELS = {
+    'clay': ClayControl,
+    'press': PressControl,
+    'dryer': DryerControl,
+    'biscuit_kiln': BiscuitKilnControl,
+    'email_kiln': EmailKilnControl,
+    'enamel': EnamelControl,
+    'dimensional': DimensionalTest,
+}
+
+# Control type -> model of every control list view (and its CSV export)
+LIST_MODELS = dict(CONTROL_MODELS, digital=DigitalDecoration, external=ExternalTest)
+
+# Numeric parameters that may be charted, per control type
+TREND_PARAMETERS = {
+    'clay': {
+        'humidity_before_prep': '%',
+        'humidity_after_sieving': '%',
+        'humidity_after_prep': '%',
+        'granulometry_refusal': '%',
+        'calcium_carbonate': '%',
+    },
+    'press': {
+        'thickness': 'mm',
+        'wet_weight': 'g',
+        'weight_output_1': 'g',
+        'weight_output_2': 'g',
+        'clay_humidity': '%',
+        'defect_grains': '%',
+        'defect_cracks': '%',
+        'defect_cleaning': '%',
+        'defect_foliage': '%',
+        'defect_chipping': '%',
+    },
+    'dryer': {
+        'residual_humidity': '%',
+        'defect_grains': '%',
+        'defect_cracks': '%',
+        'defect_cleaning': '%',
+        'defect_foliage': '%',
+        'defect_chipping': '%',
+    },
+    'biscuit_kiln': {
+        'defect_cracks': '%',
+        'defect_chipping': '%',
+        'defect_cooking': '%',
+        'defect_foliage': '%',
+        'defect_flatness': '%',
+        'shrinkage_expansion': '%',
+        'fire_loss': '%',
+    },
+    'email_kiln': {
+        'thermal_shock': '%',
+        'rupture_resistance': 'N',
+        'rupture_module': 'N/mm²',
+        'length_deviation': '%',
+        'width_deviation': '%',
+        'thickness_deviation': '%',
+        'water_absorption': '%',
+        'color_nuance': '%',
+        'cooking_defects': '%',
+        'flatness_defects': '%',
+        'central_curvature': 'mm',
+        'veil': 'mm',
+        'angularity': 'mm',
+        'edge_straightness': 'mm',
+        'lateral_curvature': 'mm',
+        'defect_free_percentage': '%',
+    },
+    'enamel': {
+        'density': 'g/l',
+        'viscosity': 'seconds',
+        'water_grammage': 'g',
+        'enamel_grammage': 'g',
+        'sieve_refusal': '%',
+    },
+    'dimensional': {
+        'central_curvature': 'mm',
+        'veil': 'mm',
+        'angularity': 'mm',
+        'edge_straightness': 'mm',
+        'lateral_curvature': 'mm',
+        'surface_area_tested': 'm²',
+        'lighting_level': 'lux',
+    },
+}
+
+def get_trend_model(control_type, parameter):
+    """Return the model for a whitelisted control type/parameter, or None"""
+    if parameter not in TREND_PARAMETERS.get(control_type, {}):
+        return None
+    return CONTROL_MODELS[control_type]
+
+def supports_filter(model_class, column_name):
+    """Check whether a model has the column used by a trend filter"""
+    return column_name in model_class.__table__.columns
@@ -0,0 +1,83 @@
+import numpy as np
+
+def lttb_indices(x, y, threshold):
+    """Select point indices with Largest-Triangle-Three-Buckets.
+
+    The first and last points are always kept; every bucket in between
+    contributes the point forming the largest triangle with the previously
+    selected point and the average of the next bucket.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # Bucket boundaries for the n-2 inner points, plus the final point
+    every = (n - 2) / (threshold - 2)
+    edges = (np.floor(np.arange(threshold - 1) * every) + 1).astype(int)
+    edges[-1] = n - 1
+    edges = np.append(edges, n)
+
+    # Averages of every "next" bucket, computed at once from cumulative sums
+    cum_x = np.concatenate(([0.0], np.cumsum(x)))
+    cum_y = np.concatenate(([0.0], np.cumsum(y)))
+    starts, ends = edges[1:], edges[2:]
+    starts = starts[:len(ends)]
+    sizes = ends - starts
+    avg_x = (cum_x[ends] - cum_x[starts]) / sizes
+    avg_y = (cum_y[ends] - cum_y[starts]) / sizes
+
+    selected = np.empty(threshold, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        bucket_x = x[start:end]
+        bucket_y = y[start:end]
+
+        areas = np.abs(
+            (x[a] - avg_x[i]) * (bucket_y - y[a]) -
+            (x[a] - bucket_x) * (avg_y[i] - y[a])
+        )
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+
+    return selected
+
+def downsample_chart_data(data, max_points, value_key='value', keep=None):
+    """Downsample chart points to at most max_points with LTTB.
+
+    ``data`` is a list of dicts ordered along the x axis (as returned by
+    ``get_control_chart_data``). Points for which ``keep(point)`` is true are
+    always preserved, so out-of-spec measurements never disappear from a
+    chart; they count against the point budget and the remaining budget is
+    spent on the other points.
+    """
+    if not max_points or len(data) <= max_points:
+        return data
+
+    values = np.array([point[value_key] for point in data], dtype=float)
+    positions = np.arange(len(data))
+
+    if keep is not None:
+        kept_mask = np.fromiter((bool(keep(point)) for point in data), dtype=bool, count=len(data))
+    else:
+        kept_mask = np.zeros(len(data), dtype=bool)
+
+    kept = positions[kept_mask]
+    candidates = positions[~kept_mask]
+    budget = max(max_points - len(kept), 0)
+
+    if budget and len(candidates):
+        chosen = candidates[lttb_indices(candidates, values[candidates], budget)]
+        if budget < 3:
+            chosen = chosen[np.linspace(0, len(chosen) - 1, budget).astype(int)]
+    else:
+        chosen = candidates[:0]
+
+    indices = np.union1d(kept, chosen)
+    return [data[i] for i in indices]
@@ -0,0 +1,114 @@
+"""
+Database engine profiles
+
+SQLite is tuned for several gunicorn workers sharing one database file:
+every new connection switches to WAL (readers no longer block the writer
+and commits only append to the log), relaxes fsync to synchronous=NORMAL
+(safe in WAL mode: a power loss can only drop the last commits), waits on
+locks instead of failing with "database is locked", and enlarges the page
+cache and memory map. PostgreSQL gets a sized connection pool and an
+optional per-statement timeout.
+
+Engine options are read from the environment when the app is created;
+SQLITE_TUNING=0 keeps SQLite's defaults (rollback journal, full sync).
+
+SQLite:
+    SQLITE_TUNING             apply the pragmas below (1)
+    SQLITE_JOURNAL_MODE       journal mode (WAL)
+    SQLITE_SYNCHRONOUS        synchronous level (NORMAL)
+    SQLITE_BUSY_TIMEOUT_MS    wait for a lock before failing (5000)
+    SQLITE_MMAP_SIZE          bytes of the file memory-mapped (268435456)
+    SQLITE_CACHE_SIZE_KB      page cache per connection (65536)
+    SQLITE_TEMP_STORE         temporary tables and indices (MEMORY)
+
+PostgreSQL:
+    DB_POOL_SIZE              connections kept per worker (5)
+    DB_MAX_OVERFLOW           extra connections under load (10)
+    DB_POOL_TIMEOUT           seconds waiting for a connection (30)
+    DB_STATEMENT_TIMEOUT_MS   cancel statements running longer (0, no limit)
+"""
+
+import logging
+import os
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+def _env(name, default, cast=str):
+    value = os.environ.get(name)
+    if value is None or value == '':
+        return default
+    return cast(value)
+
+def _flag(name, default=True):
+    return _env(name, '1' if default else '0').lower() in ('1', 'true', 'yes')
+
+def sqlite_pragmas(read_only=False):
+    """PRAGMA statements run on every new SQLite connection
+
+    Read-only connections leave the journal mode and syncing to the writers.
+    """
+    if not _flag('SQLITE_TUNING'):
+        return []
+    pragmas = [
+        f"PRAGMA journal_mode={_env('SQLITE_JOURNAL_MODE', 'WAL')}",
+        f"PRAGMA synchronous={_env('SQLITE_SYNCHRONOUS', 'NORMAL')}",
+        f"PRAGMA busy_timeout={_env('SQLITE_BUSY_TIMEOUT_MS', 5000, int)}",
+        f"PRAGMA mmap_size={_env('SQLITE_MMAP_SIZE', 268435456, int)}",
+        f"PRAGMA cache_size={-_env('SQLITE_CACHE_SIZE_KB', 65536, int)}",
+        f"PRAGMA temp_store={_env('SQLITE_TEMP_STORE', 'MEMORY')}",
+    ]
+    return pragmas[2:] if read_only else pragmas
+
+def attach_sqlite_pragmas(engine, pragmas):
+    """Run pragmas on every new connection of a SQLite engine"""
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+def engine_options(database_url):
+    """SQLALCHEMY_ENGINE_OPTIONS for the database behind database_url"""
+    options = {
+        "pool_recycle": 300,
+        "pool_pre_ping": True,
+    }
+
+    # Ensure proper encoding for both SQLite and PostgreSQL
+    if database_url.startswith('sqlite:'):
+        options["connect_args"] = {
+            "check_same_thread": False,
+            "timeout": _env('SQLITE_BUSY_TIMEOUT_MS', 5000, int) / 1000,
+        }
+    elif database_url.startswith('postgresql'):
+        options["pool_size"] = _env('DB_POOL_SIZE', 5, int)
+        options["max_overflow"] = _env('DB_MAX_OVERFLOW', 10, int)
+        options["pool_timeout"] = _env('DB_POOL_TIMEOUT', 30, int)
+        options["connect_args"] = {
+            "client_encoding": "utf8"
+        }
+        statement_timeout = _env('DB_STATEMENT_TIMEOUT_MS', 0, int)
+        if statement_timeout:
+            options["connect_args"]["options"] = f"-c statement_timeout={statement_timeout}"
+    return options
+
+def init_engine_profile(app):
+    """Apply the SQLite pragmas to every connection of the app's engine"""
+    with app.app_context():
+        engine = app.extensions['sqlalchemy'].engine
+
+    if engine.dialect.name != 'sqlite':
+        return
+
+    pragmas = sqlite_pragmas()
+    attach_sqlite_pragmas(engine, pragmas)
+    if pragmas:
+        logger.info(f"SQLite profile: {'; '.join(pragma[len('PRAGMA '):] for pragma in pragmas)}")
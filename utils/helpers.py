@@ -1,3 +1,4 @@
+from collections.abc import Mapping
 from datetime import datetime, date, timedelta
 from models import *
 from app import db
@@ -58,6 +59,18 @@ def get_dashboard_stats(date_filter=None):
         'non_compliant': enamel_query.filter(EnamelControl.compliance_status == 'non_compliant').count()
     }
     
+    # Days moved to the archive are counted from their summaries
+    from services.archive_service import ArchiveService
+    if ArchiveService.covers(date_filter):
+        archived = ArchiveService.status_counts(date_filter, date_filter)
+        for stage, model_class in [('clay', ClayControl), ('press', PressControl), ('dryer', DryerControl),
+                                   ('biscuit_kiln', BiscuitKilnControl), ('email_kiln', EmailKilnControl),
+                                   ('enamel', EnamelControl)]:
+            counts = archived.get(model_class.__tablename__, {})
+            stats[stage]['total'] += sum(counts.values())
+            stats[stage]['compliant'] += counts.get('compliant', 0)
+            stats[stage]['non_compliant'] += counts.get('non_compliant', 0)
+    
     # Calculate overall compliance rate
     total_tests = sum(stage['total'] for stage in stats.values())
     total_compliant = sum(stage['compliant'] for stage in stats.values())
@@ -71,41 +84,40 @@ def get_dashboard_stats(date_filter=None):
     
     return stats
 
+def iter_recent_non_conformities(limit=10):
+    """Recent non-conformities across all stages, newest first, read as they are consumed
+    
+    Each stage's query is streamed (yield_per) and the streams are merged on
+    creation time, so a long list never sits in memory.
+    """
+    import heapq
+    from itertools import islice
+    from sqlalchemy.orm import joinedload
+    
+    def stage(model_class, describe):
+        query = model_class.query.options(joinedload(model_class.controller)).filter(
+            model_class.compliance_status == 'non_compliant'
+        ).order_by(model_class.created_at.desc()).limit(limit).yield_per(500)
+        for nc in query:
+            yield {
+                'type': describe(nc),
+                'date': nc.date,
+                'controller': nc.controller.full_name if nc.controller else 'Unknown',
+                'status': nc.compliance_status,
+                'created_at': nc.created_at
+            }
+    
+    merged = heapq.merge(
+        stage(ClayControl, lambda nc: 'Clay Control'),
+        stage(PressControl, lambda nc: f'Press Control ({nc.format_type})'),
+        key=lambda nc: nc['created_at'],
+        reverse=True
+    )
+    return islice(merged, limit)
+
 def get_recent_non_conformities(limit=10):
     """Get recent non-conformities across all stages"""
-    non_conformities = []
-    
-    # Clay controls
-    clay_nc = ClayControl.query.filter(
-        ClayControl.compliance_status == 'non_compliant'
-    ).order_by(ClayControl.created_at.desc()).limit(limit).all()
-    
-    for nc in clay_nc:
-        non_conformities.append({
-            'type': 'Clay Control',
-            'date': nc.date,
-            'controller': nc.controller.full_name if nc.controller else 'Unknown',
-            'status': nc.compliance_status,
-            'created_at': nc.created_at
-        })
-    
-    # Press controls
-    press_nc = PressControl.query.filter(
-        PressControl.compliance_status == 'non_compliant'
-    ).order_by(PressControl.created_at.desc()).limit(limit).all()
-    
-    for nc in press_nc:
-        non_conformities.append({
-            'type': f'Press Control ({nc.format_type})',
-            'date': nc.date,
-            'controller': nc.controller.full_name if nc.controller else 'Unknown',
-            'status': nc.compliance_status,
-            'created_at': nc.created_at
-        })
-    
-    # Sort by creation time and limit
-    non_conformities.sort(key=lambda x: x['created_at'], reverse=True)
-    return non_conformities[:limit]
+    return list(iter_recent_non_conformities(limit))
 
 def get_weekly_trend_data():
     """Get compliance trend data for the past 7 days"""
@@ -177,8 +189,43 @@ def get_defect_analysis():
     
     return defects
 
-def export_daily_report(report_date):
-    """Export daily report data for specified date"""
+def records_between(model_class, start_date, end_date):
+    """Records of a control model dated within a range, archived ones included"""
+    from services.archive_service import ArchiveService
+    
+    records = model_class.query.filter(
+        model_class.date.between(start_date, end_date)
+    ).order_by(model_class.date, model_class.id).all()
+    
+    if ArchiveService.covers(start_date):
+        records = ArchiveService.load(model_class, start_date, end_date) + records
+        records.sort(key=lambda record: record.date)
+    return records
+
+class LazyReport(Mapping):
+    """Report data computed entry by entry on first access
+
+    Loaders take the report itself, so an entry may reuse another one.
+    Streamed pages query each stage only when the template reaches it.
+    """
+    
+    def __init__(self, loaders):
+        self._loaders = loaders
+        self._values = {}
+    
+    def __getitem__(self, key):
+        if key not in self._values:
+            self._values[key] = self._loaders[key](self)
+        return self._values[key]
+    
+    def __iter__(self):
+        return iter(self._loaders)
+    
+    def __len__(self):
+        return len(self._loaders)
+
+def daily_report_data(report_date):
+    """Daily report data for specified date, loaded entry by entry (see export_daily_report)"""
     # Import models here to avoid circular imports
     from models import (ClayControl, PressControl, DryerControl, BiscuitKilnControl, 
                        EmailKilnControl, EnamelControl, DimensionalTest, 
@@ -189,66 +236,57 @@ def export_daily_report(report_date):
     days_since_monday = report_date.weekday()  # 0=Monday, 6=Sunday
     week_start = report_date - timedelta(days=days_since_monday)
     week_end = week_start + timedelta(days=5)  # Saturday (6 days from Monday)
-    
-    # Generate week dates for template display
-    week_dates = []
-    for i in range(6):  # Monday through Saturday
-        week_dates.append((week_start + timedelta(days=i)).strftime('%d/%m/%Y'))
-    
-    # Get clay controls for the full week to display granulometry and calcium carbonate data
-    clay_controls_week = ClayControl.query.filter(
-        ClayControl.date.between(week_start, week_end)
-    ).order_by(ClayControl.date).all()
-    
-    # Organize clay controls by date for easier template access
-    clay_by_date = {}
-    for control in clay_controls_week:
-        date_key = control.date.strftime('%Y-%m-%d')
-        if date_key not in clay_by_date:
-            clay_by_date[date_key] = []
-        clay_by_date[date_key].append(control)
-    
-    # Create daily arrays for granulometry and calcium carbonate data (6 days)
-    granulometry_week = []
-    calcium_carbonate_week = []
-    for i in range(6):
-        day_date = (week_start + timedelta(days=i)).strftime('%Y-%m-%d')
-        day_controls = clay_by_date.get(day_date, [])
-        
-        # Find controls with granulometry_refusal or calcium_carbonate data
-        granulo_value = None
-        calcium_value = None
-        for control in day_controls:
-            if control.granulometry_refusal is not None:
-                granulo_value = control.granulometry_refusal
-            if control.calcium_carbonate is not None:
-                calcium_value = control.calcium_carbonate
-        
-        granulometry_week.append(granulo_value)
-        calcium_carbonate_week.append(calcium_value)
-    
-    report_data = {
-        'date': report_date.strftime('%Y-%m-%d'),
-        'week_start': week_start,
-        'week_end': week_end,
-        'week_dates': week_dates,
-        'granulometry_week': granulometry_week,
-        'calcium_carbonate_week': calcium_carbonate_week,
-        'stats': get_dashboard_stats(report_date),
-        'clay_controls': ClayControl.query.filter(ClayControl.date == report_date).all(),
-        'clay_controls_week': clay_controls_week,
+    week_days = [week_start + timedelta(days=i) for i in range(6)]  # Monday through Saturday
+    
+    def clay_by_date(report):
+        # Organize clay controls by date for easier template access
+        by_date = {}
+        for control in report['clay_controls_week']:
+            by_date.setdefault(control.date.strftime('%Y-%m-%d'), []).append(control)
+        return by_date
+    
+    def week_values(column):
+        # Daily array (6 days) of the last value of a clay column, e.g. granulometry or calcium carbonate
+        def load(report):
+            values = []
+            for day in week_days:
+                value = None
+                for control in report['clay_by_date'].get(day.strftime('%Y-%m-%d'), []):
+                    if getattr(control, column) is not None:
+                        value = getattr(control, column)
+                values.append(value)
+            return values
+        return load
+    
+    def day_records(model_class):
+        return lambda report: records_between(model_class, report_date, report_date)
+    
+    return LazyReport({
+        'date': lambda report: report_date.strftime('%Y-%m-%d'),
+        'week_start': lambda report: week_start,
+        'week_end': lambda report: week_end,
+        # Week dates for template display
+        'week_dates': lambda report: [day.strftime('%d/%m/%Y') for day in week_days],
+        'granulometry_week': week_values('granulometry_refusal'),
+        'calcium_carbonate_week': week_values('calcium_carbonate'),
+        'stats': lambda report: get_dashboard_stats(report_date),
+        'clay_controls': day_records(ClayControl),
+        # Clay controls of the full week, for the granulometry and calcium carbonate data
+        'clay_controls_week': lambda report: records_between(ClayControl, week_start, week_end),
         'clay_by_date': clay_by_date,
-        'press_controls': PressControl.query.filter(PressControl.date == report_date).all(),
-        'dryer_controls': DryerControl.query.filter(DryerControl.date == report_date).all(),
-        'biscuit_kiln_controls': BiscuitKilnControl.query.filter(BiscuitKilnControl.date == report_date).all(),
-        'email_kiln_controls': EmailKilnControl.query.filter(EmailKilnControl.date == report_date).all(),
-        'enamel_controls': EnamelControl.query.filter(EnamelControl.date == report_date).all(),
-        'dimensional_tests': DimensionalTest.query.filter(DimensionalTest.date == report_date).all(),
-        'digital_decorations': DigitalDecoration.query.filter(DigitalDecoration.date == report_date).all(),
-        'external_tests': ExternalTest.query.filter(ExternalTest.date == report_date).all()
-    }
-    
-    return report_data
+        'press_controls': day_records(PressControl),
+        'dryer_controls': day_records(DryerControl),
+        'biscuit_kiln_controls': day_records(BiscuitKilnControl),
+        'email_kiln_controls': day_records(EmailKilnControl),
+        'enamel_controls': day_records(EnamelControl),
+        'dimensional_tests': day_records(DimensionalTest),
+        'digital_decorations': day_records(DigitalDecoration),
+        'external_tests': day_records(ExternalTest)
+    })
+
+def export_daily_report(report_date):
+    """Export daily report data for specified date"""
+    return dict(daily_report_data(report_date))
 
 def calculate_process_capability(measurements, lower_limit, upper_limit):
     """Calculate process capability indices (Cp, Cpk)"""
@@ -278,23 +316,60 @@ def calculate_process_capability(measurements, lower_limit, upper_limit):
         'std_dev': round(std_dev, 3)
     }
 
-def get_control_chart_data(model_class, parameter, days=30):
-    """Get control chart data for a specific parameter"""
-    end_date = date.today()
-    start_date = end_date - timedelta(days=days-1)
-    
-    query = model_class.query.filter(
-        model_class.date.between(start_date, end_date)
-    ).order_by(model_class.date)
+def get_control_chart_data(model_class, parameter, days=30, max_points=None,
+                           start_date=None, end_date=None, shift=None, format_type=None):
+    """Get control chart data for a specific parameter
+
+    Only the date, value and compliance columns are selected. The range
+    defaults to the last ``days`` days; shift and format filters apply to
+    models that have those columns. When max_points is given the series is
+    downsampled with LTTB, keeping every record that is not compliant.
+    """
+    if end_date is None:
+        end_date = date.today()
+    if start_date is None:
+        start_date = end_date - timedelta(days=days-1)
+    
+    column = getattr(model_class, parameter)
+    query = db.session.query(
+        model_class.date,
+        column,
+        model_class.compliance_status
+    ).filter(
+        model_class.date.between(start_date, end_date),
+        column.isnot(None)
+    )
+    
+    if shift:
+        query = query.filter(model_class.shift == shift)
+    if format_type:
+        query = query.filter(model_class.format_type == format_type)
     
     data = []
-    for record in query:
-        value = getattr(record, parameter, None)
-        if value is not None:
-            data.append({
+    for record_date, value, compliance in query.order_by(model_class.date, model_class.id):
+        data.append({
+            'date': record_date.strftime('%Y-%m-%d'),
+            'value': value,
+            'compliance': compliance
+        })
+    
+    from services.archive_service import ArchiveService
+    if ArchiveService.covers(start_date):
+        archived = []
+        for record in ArchiveService.load(model_class, start_date, end_date):
+            value = getattr(record, parameter)
+            if value is None or (shift and record.shift != shift) or (format_type and record.format_type != format_type):
+                continue
+            archived.append({
                 'date': record.date.strftime('%Y-%m-%d'),
                 'value': value,
                 'compliance': record.compliance_status
             })
+        data = sorted(archived + data, key=lambda point: point['date'])
+    
+    if max_points:
+        from utils.downsampling import downsample_chart_data
+        data = downsample_chart_data(data, max_points,
+                                     keep=lambda point: point['compliance'] != 'compliant')
     
     return data
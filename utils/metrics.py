@@ -0,0 +1,135 @@
+"""
+Prometheus metrics
+
+Exposes request latency per blueprint/endpoint, database time per request,
+export and scheduler job durations and cache hit/miss counts at ``/metrics``
+in the Prometheus text format.
+
+Under gunicorn every worker has its own counters; set
+PROMETHEUS_MULTIPROC_DIR (done by gunicorn.conf.py) so that workers write
+their values to shared files and ``/metrics`` aggregates all of them.
+
+Access: with METRICS_TOKEN set, the endpoint requires
+``Authorization: Bearer <token>``. Otherwise it only answers connections
+from the local host (the peer address, before ProxyFix rewrites it from
+X-Forwarded-For) that did not come through a proxy, unless
+METRICS_ALLOW_REMOTE is set. Behind a reverse proxy on the same host that
+does not send X-Forwarded-For, set METRICS_TOKEN.
+"""
+
+import functools
+import hmac
+import os
+import time
+from contextlib import contextmanager
+
+from flask import Response, abort, g, request
+from prometheus_client import (CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram,
+                               REGISTRY, generate_latest, multiprocess)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+EXPORT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+JOB_BUCKETS = (0.01, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900)
+
+REQUEST_LATENCY = Histogram(
+    'tileqc_http_request_duration_seconds', 'Request latency',
+    ['blueprint', 'endpoint', 'method', 'status'], buckets=LATENCY_BUCKETS)
+REQUEST_DB_TIME = Histogram(
+    'tileqc_http_request_db_seconds', 'Database time per request',
+    ['blueprint', 'endpoint'], buckets=LATENCY_BUCKETS)
+REQUEST_DB_STATEMENTS = Histogram(
+    'tileqc_http_request_db_statements', 'SQL statements per request',
+    ['blueprint', 'endpoint'], buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500))
+EXPORT_DURATION = Histogram(
+    'tileqc_export_duration_seconds', 'Export/report file generation time',
+    ['export'], buckets=EXPORT_BUCKETS)
+JOB_DURATION = Histogram(
+    'tileqc_job_duration_seconds', 'Scheduled job run time',
+    ['job'], buckets=JOB_BUCKETS)
+JOB_RUNS = Counter(
+    'tileqc_job_runs_total', 'Scheduled job runs by outcome',
+    ['job', 'outcome'])
+CACHE_REQUESTS = Counter(
+    'tileqc_cache_requests_total', 'Cache lookups by result',
+    ['cache', 'result'])
+
+def record_cache(cache, hit):
+    """Count a cache hit or miss"""
+    CACHE_REQUESTS.labels(cache, 'hit' if hit else 'miss').inc()
+
+def timed_export(name):
+    """Decorator recording how long an export function takes"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with EXPORT_DURATION.labels(name).time():
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+@contextmanager
+def track_job(job):
+    """Record the duration and outcome of a scheduled job run"""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        JOB_RUNS.labels(job, 'failure').inc()
+        raise
+    else:
+        JOB_RUNS.labels(job, 'success').inc()
+    finally:
+        JOB_DURATION.labels(job).observe(time.perf_counter() - started)
+
+def _collect():
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+def _metrics_allowed(app):
+    token = app.config.get('METRICS_TOKEN', os.environ.get('METRICS_TOKEN'))
+    if token:
+        return hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+
+    allow_remote = str(app.config.get('METRICS_ALLOW_REMOTE', os.environ.get('METRICS_ALLOW_REMOTE', ''))).lower()
+    if allow_remote in ('1', 'true', 'yes', 'on'):
+        return True
+
+    # request.remote_addr comes from X-Forwarded-For under ProxyFix; use the peer address
+    environ = request.environ.get('werkzeug.proxy_fix.orig', request.environ)
+    return (environ.get('REMOTE_ADDR') in ('127.0.0.1', '::1')
+            and 'X-Forwarded-For' not in request.headers)
+
+def init_metrics(app):
+    """Time every request and serve /metrics"""
+
+    @app.before_request
+    def _start_request_timer():
+        g._request_started = time.perf_counter()
+
+    @app.after_request
+    def _observe_request(response):
+        started = g.pop('_request_started', None)
+        if started is None or request.endpoint == 'metrics':
+            return response
+
+        blueprint = request.blueprint or 'app'
+        endpoint = request.endpoint or 'unmatched'
+        REQUEST_LATENCY.labels(blueprint, endpoint, request.method,
+                               f"{response.status_code // 100}xx").observe(time.perf_counter() - started)
+
+        from utils.sql_instrumentation import current_sql_stats
+        stats = current_sql_stats()
+        if stats is not None:
+            REQUEST_DB_TIME.labels(blueprint, endpoint).observe(stats.total)
+            REQUEST_DB_STATEMENTS.labels(blueprint, endpoint).observe(stats.count)
+
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        if not _metrics_allowed(app):
+            abort(403)
+        return Response(_collect(), mimetype=CONTENT_TYPE_LATEST)
@@ -0,0 +1,187 @@
+"""
+Keyset (seek) pagination for list views
+
+Pages are addressed by an opaque cursor holding the sort key of the first
+or last row shown, so fetching any page costs one index seek instead of an
+OFFSET scan. The total row count is approximate and cached.
+"""
+
+import base64
+import json
+import threading
+import time
+from datetime import date, datetime
+
+from sqlalchemy import and_, or_, func, select, text
+
+from app import db
+from utils.metrics import record_cache
+
+COUNT_CACHE_TTL = 60
+
+_count_cache = {}
+_count_lock = threading.Lock()
+
+def encode_cursor(values):
+    """Encode sort key values as an URL-safe cursor"""
+    payload = [v.isoformat() if isinstance(v, (date, datetime)) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor, columns):
+    """Decode a cursor into sort key values typed like the given columns"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        return None
+
+    if not isinstance(payload, list) or len(payload) != len(columns):
+        return None
+
+    values = []
+    for value, column in zip(payload, columns):
+        python_type = column.type.python_type
+        try:
+            if python_type is datetime:
+                values.append(datetime.fromisoformat(value))
+            elif python_type is date:
+                values.append(date.fromisoformat(value))
+            else:
+                values.append(python_type(value))
+        except (ValueError, TypeError):
+            return None
+    return values
+
+def _seek_condition(order_by, values, forward):
+    """Rows strictly after (forward) or before the given sort key"""
+    clauses = []
+    for position, (column, descending) in enumerate(order_by):
+        after = (column < values[position]) if descending == forward else (column > values[position])
+        equal = [order_by[i][0] == values[i] for i in range(position)]
+        clauses.append(and_(*equal, after))
+    return or_(*clauses)
+
+def approximate_count(query):
+    """Row count of a query, cached per worker for COUNT_CACHE_TTL seconds
+
+    On PostgreSQL an unfiltered count uses the planner estimate instead of
+    scanning the table.
+    """
+    statement = query.statement
+    compiled = statement.compile(dialect=db.engine.dialect)
+    key = (str(compiled), tuple(sorted((k, repr(v)) for k, v in compiled.params.items())))
+
+    now = time.monotonic()
+    cached = _count_cache.get(key)
+    fresh = bool(cached) and now - cached[1] < COUNT_CACHE_TTL
+    record_cache('list_counts', fresh)
+    if fresh:
+        return cached[0]
+
+    total = None
+    froms = statement.get_final_froms()
+    if db.engine.dialect.name == 'postgresql' and statement.whereclause is None and len(froms) == 1:
+        estimate = db.session.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:name)"),
+            {'name': froms[0].name}
+        ).scalar()
+        if estimate is not None and estimate >= 0:
+            total = int(estimate)
+
+    if total is None:
+        total = db.session.execute(
+            select(func.count()).select_from(statement.order_by(None).subquery())
+        ).scalar()
+
+    with _count_lock:
+        _count_cache[key] = (total, now)
+    return total
+
+def invalidate_counts():
+    """Forget cached counts (e.g. after bulk imports)"""
+    with _count_lock:
+        _count_cache.clear()
+
+class KeysetPage:
+    """One page of a keyset-paginated query"""
+
+    def __init__(self, items, order_by, per_page, has_prev, has_next, total):
+        self.items = items
+        self.per_page = per_page
+        self.has_prev = has_prev
+        self.has_next = has_next
+        self.total = total
+        self._order_by = order_by
+
+    def _cursor(self, item):
+        return encode_cursor([getattr(item, column.key) for column, _ in self._order_by])
+
+    @property
+    def prev_cursor(self):
+        return self._cursor(self.items[0]) if self.has_prev and self.items else None
+
+    @property
+    def next_cursor(self):
+        return self._cursor(self.items[-1]) if self.has_next and self.items else None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+def keyset_paginate(query, order_by, per_page=20, after=None, before=None):
+    """Paginate a query by seeking on a unique sort key
+
+    ``order_by`` is a list of (column, descending) pairs whose values are
+    unique and non-null together (end it with the primary key). ``after``
+    and ``before`` are cursors taken from a previous page's next_cursor and
+    prev_cursor. Invalid cursors fall back to the first page.
+    """
+    columns = [column for column, _ in order_by]
+    total = approximate_count(query)
+
+    cursor_values = None
+    forward = True
+    if after:
+        cursor_values = decode_cursor(after, columns)
+    elif before:
+        cursor_values = decode_cursor(before, columns)
+        forward = cursor_values is None
+
+    if cursor_values is not None:
+        query = query.filter(_seek_condition(order_by, cursor_values, forward))
+
+    if forward:
+        ordering = [column.desc() if descending else column.asc() for column, descending in order_by]
+    else:
+        ordering = [column.asc() if descending else column.desc() for column, descending in order_by]
+
+    rows = query.order_by(None).order_by(*ordering).limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    if forward:
+        return KeysetPage(rows, order_by, per_page,
+                          has_prev=cursor_values is not None,
+                          has_next=has_more,
+                          total=total)
+
+    rows.reverse()
+    return KeysetPage(rows, order_by, per_page,
+                      has_prev=has_more,
+                      has_next=True,
+                      total=total)
+
+def paginate_by_date(query, model_class, per_page=20):
+    """Keyset-paginate a control list newest first on (date, id)
+
+    Cursors are read from the ``after``/``before`` request arguments.
+    """
+    from flask import request
+
+    return keyset_paginate(query,
+                           [(model_class.date, True), (model_class.id, True)],
+                           per_page=per_page,
+                           after=request.args.get('after'),
+                           before=request.args.get('before'))
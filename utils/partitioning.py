@@ -0,0 +1,141 @@
+"""
+Monthly range partitioning on PostgreSQL
+
+With PARTITION_BY_MONTH set and a PostgreSQL DATABASE_URL, the
+optimized_measurements and scheduled_controls tables are created
+partitioned by RANGE on their date column: one partition per month plus a
+DEFAULT partition, so queries on a day or month only scan that month.
+PostgreSQL requires the partition key in the primary key, so the table
+keys become (id, <date>) while the ORM keeps identifying rows by id, and
+scheduled_controls.measurement_id is not a database foreign key. On SQLite,
+or without the flag, both stay plain tables.
+
+Only new databases are created partitioned; an existing plain table is
+left as it is. Partitions for the current month and PARTITION_MONTHS_AHEAD
+(3) further months are created at startup and daily by the scheduler. Rows
+that already sit in the DEFAULT partition are moved into a new month's
+partition when it is created. Every worker runs this at startup and from
+its scheduler: a transaction-level advisory lock lets one process at a
+time create partitions, and a partition found created meanwhile counts as
+already there.
+"""
+
+import logging
+import os
+from datetime import date
+
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError, ProgrammingError
+
+logger = logging.getLogger(__name__)
+
+MONTHLY_PARTITIONS = (
+    os.environ.get('DATABASE_URL', '').startswith('postgresql')
+    and os.environ.get('PARTITION_BY_MONTH', '').lower() in ('1', 'true', 'yes')
+)
+
+# pg_advisory_xact_lock key serializing partition creation between processes
+PARTITION_LOCK_ID = 7340401
+
+# SQLSTATEs of a partition created by another transaction: duplicate_table,
+# and unique_violation on pg_type when both create it at the same time
+_ALREADY_CREATED = ('42P07', '23505')
+
+# Partitioned table -> partition key
+PARTITIONED_TABLES = {
+    'optimized_measurements': 'measurement_date',
+    'scheduled_controls': 'scheduled_date',
+}
+
+def partition_args(column):
+    """__table_args__ entries for a table partitioned by month on column
+
+    The column itself must be declared with primary_key=MONTHLY_PARTITIONS.
+    """
+    if not MONTHLY_PARTITIONS:
+        return ()
+    return ({'postgresql_partition_by': f'RANGE ({column})'},)
+
+def _add_months(month_start, months):
+    index = month_start.year * 12 + month_start.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+def partition_name(table_name, month_start):
+    return f"{table_name}_{month_start:%Y_%m}"
+
+def is_partitioned(connection, table_name):
+    relkind = connection.execute(
+        text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:name)"), {'name': table_name}
+    ).scalar()
+    return relkind == 'p'
+
+def _create_partition(connection, table_name, column, month_start):
+    name = partition_name(table_name, month_start)
+    if connection.execute(text("SELECT to_regclass(:name)"), {'name': name}).scalar():
+        return False
+
+    try:
+        with connection.begin_nested():
+            return _attach_partition(connection, table_name, column, month_start, name)
+    except (ProgrammingError, IntegrityError) as e:
+        if getattr(e.orig, 'pgcode', None) not in _ALREADY_CREATED:
+            raise
+        logger.info(f"Partition {name} already created by another process")
+        return False
+
+def _attach_partition(connection, table_name, column, month_start, name):
+    bounds = {'start': month_start, 'end': _add_months(month_start, 1)}
+    default = f"{table_name}_default"
+    stray = connection.execute(
+        text(f"SELECT count(*) FROM {default} WHERE {column} >= :start AND {column} < :end"), bounds
+    ).scalar()
+
+    if not stray:
+        connection.execute(text(
+            f"CREATE TABLE {name} PARTITION OF {table_name} "
+            f"FOR VALUES FROM ('{bounds['start']}') TO ('{bounds['end']}')"
+        ))
+        return True
+
+    # Rows of this month are in the DEFAULT partition: move them into the new one
+    connection.execute(text(f"CREATE TABLE {name} (LIKE {table_name} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    connection.execute(text(
+        f"WITH moved AS (DELETE FROM {default} WHERE {column} >= :start AND {column} < :end RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved"
+    ), bounds)
+    connection.execute(text(
+        f"ALTER TABLE {table_name} ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{bounds['start']}') TO ('{bounds['end']}')"
+    ))
+    logger.info(f"Moved {stray} rows from {default} to {name}")
+    return True
+
+def ensure_partitions(engine, months_ahead=None, start=None):
+    """Create the monthly partitions from start's month (default: this month) to months_ahead later
+
+    Returns the names of the partitions created. Does nothing unless the
+    tables are actually partitioned.
+    """
+    if engine.dialect.name != 'postgresql' or not MONTHLY_PARTITIONS:
+        return []
+    if months_ahead is None:
+        months_ahead = int(os.environ.get('PARTITION_MONTHS_AHEAD', 3))
+
+    first = (start or date.today()).replace(day=1)
+    last = _add_months(date.today().replace(day=1), months_ahead)
+
+    created = []
+    with engine.begin() as connection:
+        connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {'key': PARTITION_LOCK_ID})
+        for table_name, column in PARTITIONED_TABLES.items():
+            if not is_partitioned(connection, table_name):
+                logger.warning(f"{table_name} is not partitioned; PARTITION_BY_MONTH only applies to new databases")
+                continue
+
+            connection.execute(text(f"CREATE TABLE IF NOT EXISTS {table_name}_default PARTITION OF {table_name} DEFAULT"))
+            month_start = first
+            while month_start <= last:
+                if _create_partition(connection, table_name, column, month_start):
+                    created.append(partition_name(table_name, month_start))
+                month_start = _add_months(month_start, 1)
+    return created
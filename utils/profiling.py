@@ -0,0 +1,144 @@
+"""
+Opt-in request profiling
+
+A sampled request runs under cProfile from before_request to after_request
+(view and template rendering) and its profile is written to
+PROFILE_DIR/<endpoint>/<timestamp>_<ms>ms_<status>.prof, keeping the
+PROFILE_KEEP most recent profiles per endpoint. Requests are sampled at
+PROFILE_SAMPLE_RATE (0 by default) or when an administrator adds
+``?_profile=1``. Unsampled requests only pay for one random() call.
+
+Configuration (app.config, defaulting to environment variables):
+    PROFILE_SAMPLE_RATE    fraction of requests to profile (0.0)
+    PROFILE_DIR            where profiles are stored (instance/profiles)
+    PROFILE_KEEP           profiles kept per endpoint (20)
+"""
+
+import cProfile
+import os
+import pstats
+import random
+import time
+from collections import namedtuple
+from datetime import datetime
+
+from flask import current_app, g, request
+
+ProfileInfo = namedtuple('ProfileInfo', 'endpoint name path recorded_at duration_ms status')
+FunctionStats = namedtuple('FunctionStats', 'function calls primitive_calls total_time cumulative_time')
+
+# Endpoints never profiled
+_SKIPPED_ENDPOINTS = {'static', 'metrics'}
+
+def _config(app, name, default, cast):
+    value = app.config.get(name, os.environ.get(name))
+    if value is None or value == '':
+        return default
+    return cast(value)
+
+def profile_dir(app=None):
+    app = app or current_app
+    return _config(app, 'PROFILE_DIR', os.path.join(app.instance_path, 'profiles'), str)
+
+def _requested_by_admin():
+    if request.args.get('_profile') != '1':
+        return False
+    from flask_login import current_user
+    return current_user.is_authenticated and current_user.role == 'admin'
+
+def init_profiling(app):
+    """Register the sampling hooks"""
+    sample_rate = _config(app, 'PROFILE_SAMPLE_RATE', 0.0, float)
+    keep = _config(app, 'PROFILE_KEEP', 20, int)
+
+    @app.before_request
+    def _start_profile():
+        if request.endpoint is None or request.endpoint in _SKIPPED_ENDPOINTS:
+            return
+        if request.endpoint.startswith('admin.profile'):
+            return
+        if not (sample_rate and random.random() < sample_rate) and not _requested_by_admin():
+            return
+
+        profiler = cProfile.Profile()
+        g._profile = (profiler, time.perf_counter())
+        profiler.enable()
+
+    @app.after_request
+    def _save_profile(response):
+        started = g.pop('_profile', None)
+        if started is None:
+            return response
+
+        profiler, started_at = started
+        profiler.disable()
+        duration_ms = (time.perf_counter() - started_at) * 1000
+
+        try:
+            directory = os.path.join(profile_dir(app), request.endpoint)
+            os.makedirs(directory, exist_ok=True)
+            name = f"{datetime.now().strftime('%Y%m%dT%H%M%S_%f')}_{duration_ms:.0f}ms_{response.status_code}.prof"
+            profiler.dump_stats(os.path.join(directory, name))
+            _prune(directory, keep)
+        except OSError as e:
+            app.logger.warning(f"Could not store request profile: {e}")
+
+        return response
+
+def _prune(directory, keep):
+    names = sorted(name for name in os.listdir(directory) if name.endswith('.prof'))
+    for name in names[:-keep] if keep > 0 else []:
+        try:
+            os.remove(os.path.join(directory, name))
+        except OSError:
+            pass
+
+def _parse_name(endpoint, directory, name):
+    try:
+        stamp, duration, status = name[:-len('.prof')].rsplit('_', 2)
+        return ProfileInfo(endpoint, name, os.path.join(directory, name),
+                           datetime.strptime(stamp, '%Y%m%dT%H%M%S_%f'),
+                           int(duration[:-2]), int(status))
+    except ValueError:
+        return None
+
+def list_profiles():
+    """Stored profiles by endpoint, most recent first"""
+    root = profile_dir()
+    if not os.path.isdir(root):
+        return {}
+
+    profiles = {}
+    for endpoint in sorted(os.listdir(root)):
+        directory = os.path.join(root, endpoint)
+        if not os.path.isdir(directory):
+            continue
+        infos = [_parse_name(endpoint, directory, name)
+                 for name in os.listdir(directory) if name.endswith('.prof')]
+        infos = sorted((info for info in infos if info), key=lambda info: info.name, reverse=True)
+        if infos:
+            profiles[endpoint] = infos
+    return profiles
+
+def get_profile(endpoint, name):
+    """The stored profile with this endpoint and file name, or None"""
+    for info in list_profiles().get(endpoint, []):
+        if info.name == name:
+            return info
+    return None
+
+def top_functions(paths, limit=40, sort='cumulative'):
+    """Merge profiles and return their top functions"""
+    if not paths:
+        return []
+
+    stats = pstats.Stats(*paths)
+    rows = []
+    for (filename, line, function), (primitive, calls, total, cumulative, _) in stats.stats.items():
+        location = function if filename == '~' else f"{os.path.relpath(filename) if filename.startswith(os.getcwd()) else filename}:{line}({function})"
+        rows.append(FunctionStats(location, calls, primitive, total, cumulative))
+
+    key = {'cumulative': lambda row: row.cumulative_time,
+           'total': lambda row: row.total_time,
+           'calls': lambda row: row.calls}.get(sort, lambda row: row.cumulative_time)
+    return sorted(rows, key=key, reverse=True)[:limit]
@@ -0,0 +1,106 @@
+"""
+Read-only engine routing
+
+With READ_REPLICA_URL set, GET requests to blueprints and views declared
+with ``read_only`` run their SELECT statements on a second engine, so heavy
+reporting uses its own connections instead of the pool (and, on a replica,
+the server) that shop-floor data entry writes through. Flushes and any
+other statement, and every request not declared read-only, keep using the
+primary engine.
+
+READ_REPLICA_URL is either:
+    a PostgreSQL URL   a streaming replica, or the primary itself for a
+                       separate pool; sessions are opened read-only
+    readonly           SQLite only: read-only connections (mode=ro) on the
+                       primary database file; with WAL, readers never wait
+                       for writers
+
+A replica may lag behind the primary by its replication delay; only views
+that show aggregated or historical data should be declared read-only.
+
+    reports_bp = Blueprint('reports', __name__)
+    read_only(reports_bp)
+
+    @main_bp.route('/')
+    @read_only
+    def dashboard(): ...
+"""
+
+import logging
+import os
+import sqlite3
+
+from flask import Blueprint, current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine
+
+from utils.engine_profile import attach_sqlite_pragmas, engine_options, sqlite_pragmas
+
+logger = logging.getLogger(__name__)
+
+# Blueprints whose GET views read from the read-only engine
+READ_ONLY_BLUEPRINTS = set()
+
+def read_only(target):
+    """Declare a blueprint, or a single view function, read-only"""
+    if isinstance(target, Blueprint):
+        READ_ONLY_BLUEPRINTS.add(target.name)
+    else:
+        target.read_only_db = True
+    return target
+
+def read_engine():
+    """The read-only engine of the current app, or None when not configured"""
+    return current_app.extensions.get('read_engine')
+
+def _reading():
+    return has_request_context() and g.get('_read_only_db', False)
+
+class RoutingSession(Session):
+    """Session sending the SELECTs of read-only requests to the read engine"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and _reading() and getattr(clause, 'is_select', False):
+            engine = read_engine()
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+def _create_read_engine(app, url):
+    primary = app.extensions['sqlalchemy'].engine
+
+    if url == 'readonly':
+        if primary.dialect.name != 'sqlite':
+            raise ValueError("READ_REPLICA_URL=readonly is only supported with SQLite")
+        path = primary.url.database
+        engine = create_engine(
+            'sqlite://',
+            creator=lambda: sqlite3.connect(f'file:{path}?mode=ro', uri=True, check_same_thread=False),
+            pool_pre_ping=True,
+        )
+        attach_sqlite_pragmas(engine, sqlite_pragmas(read_only=True))
+        return engine
+
+    options = engine_options(url)
+    if url.startswith('postgresql'):
+        connect_options = options['connect_args'].get('options', '')
+        options['connect_args']['options'] = f"{connect_options} -c default_transaction_read_only=on".strip()
+    return create_engine(url, **options)
+
+def init_read_routing(app):
+    """Create the read-only engine and route the declared requests to it"""
+    url = app.config.get('READ_REPLICA_URL', os.environ.get('READ_REPLICA_URL'))
+    if not url:
+        return
+
+    with app.app_context():
+        engine = app.extensions['read_engine'] = _create_read_engine(app, url)
+    logger.info(f"Read-only routing to {url if url == 'readonly' else engine.url.render_as_string(hide_password=True)}")
+
+    @app.before_request
+    def _route_reads():
+        if request.method not in ('GET', 'HEAD'):
+            return
+        view = app.view_functions.get(request.endpoint)
+        if request.blueprint in READ_ONLY_BLUEPRINTS or getattr(view, 'read_only_db', False):
+            g._read_only_db = True
@@ -0,0 +1,365 @@
+"""
+Compliance rules engine
+
+All active Specification rows are compiled once into an in-memory lookup
+table of check closures. Control records (or whole batches of column arrays)
+are then evaluated without any per-parameter specification query.
+"""
+
+from collections import namedtuple
+import hashlib
+import json
+import threading
+import time
+
+import numpy as np
+from sqlalchemy import select
+
+from utils.metrics import record_cache
+
+Rule = namedtuple('Rule', 'spec_id control_type parameter_name format_type enamel_type '
+                          'min_value max_value target_value unit constraints check')
+
+# How a control type is checked: one entry per specification parameter.
+#   field      - record attribute holding the value (defaults to the parameter)
+#   by_format  - look the spec up by the record's format_type (skipped without one)
+#   by_enamel  - look the spec up by the record's enamel_type (skipped without one)
+#   absolute   - compare the absolute value (tolerances around zero)
+#   min_only   - only the minimum limit applies
+#   when       - extra row condition, given a column getter
+#   value      - derived value, given a column getter
+SpecCheck = namedtuple('SpecCheck', 'parameter field by_format by_enamel absolute min_only when value')
+SpecCheck.__new__.__defaults__ = (None, False, False, False, False, None, None)
+
+_DEFECTS = ['defect_grains', 'defect_cracks', 'defect_cleaning', 'defect_foliage', 'defect_chipping']
+
+def _thick(col):
+    return col('thickness_for_resistance') >= 7.5
+
+def _thin(col):
+    return col('thickness_for_resistance') < 7.5
+
+def _defect_free_percentage(col):
+    tiles = col('tiles_tested')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(tiles > 0, col('defect_free_tiles') / tiles * 100, np.nan)
+
+CHECK_PLANS = {
+    'clay': [SpecCheck(name) for name in [
+        'humidity_before_prep', 'humidity_after_sieving', 'humidity_after_prep',
+        'granulometry_refusal', 'calcium_carbonate']],
+    'press': [
+        SpecCheck('thickness', by_format=True),
+        SpecCheck('wet_weight', by_format=True),
+    ] + [SpecCheck(name) for name in _DEFECTS],
+    'dryer': [SpecCheck('residual_humidity')] + [SpecCheck(name) for name in _DEFECTS],
+    'biscuit_kiln': [SpecCheck(name) for name in [
+        'defect_cracks', 'defect_chipping', 'defect_cooking', 'defect_foliage',
+        'defect_flatness', 'shrinkage_expansion', 'fire_loss']],
+    'email_kiln': [SpecCheck(name) for name in [
+        'thermal_shock', 'length_deviation', 'width_deviation', 'thickness_deviation',
+        'water_absorption', 'color_nuance', 'cooking_defects', 'flatness_defects']] + [
+        SpecCheck('rupture_resistance_thick', field='rupture_resistance', when=_thick),
+        SpecCheck('rupture_resistance_thin', field='rupture_resistance', when=_thin),
+        SpecCheck('rupture_module_thick', field='rupture_module', when=_thick),
+        SpecCheck('rupture_module_thin', field='rupture_module', when=_thin),
+    ],
+    'dimensional': [SpecCheck(name, absolute=True) for name in [
+        'central_curvature', 'veil', 'angularity', 'edge_straightness', 'lateral_curvature']] + [
+        SpecCheck('surface_quality', min_only=True, value=_defect_free_percentage),
+        SpecCheck('tiles_tested', min_only=True),
+        SpecCheck('surface_area_tested', min_only=True),
+        SpecCheck('lighting_level', min_only=True),
+    ],
+    'enamel': [
+        SpecCheck('density', by_enamel=True),
+        SpecCheck('viscosity'),
+        SpecCheck('water_grammage', by_format=True),
+        SpecCheck('enamel_grammage', by_format=True, by_enamel=True),
+    ],
+}
+
+# Record attributes read by derived values and row conditions
+_EXTRA_FIELDS = {
+    'email_kiln': ['thickness_for_resistance'],
+    'dimensional': ['tiles_tested', 'defect_free_tiles'],
+}
+
+def plan_fields(control_type):
+    """Record attributes needed to evaluate a control type"""
+    fields = []
+    for spec_check in CHECK_PLANS.get(control_type, []):
+        if spec_check.value is None:
+            fields.append(spec_check.field or spec_check.parameter)
+        if spec_check.by_format:
+            fields.append('format_type')
+        if spec_check.by_enamel:
+            fields.append('enamel_type')
+    fields.extend(_EXTRA_FIELDS.get(control_type, []))
+    return list(dict.fromkeys(fields))
+
+def _make_check(min_value, max_value, constraints):
+    """Build the check closure for one specification row
+
+    Supported JSON constraints: ``absolute`` (compare |value|) and
+    ``strict`` (limits are exclusive). The closure accepts scalars or
+    NumPy arrays and returns which values are within the limits.
+    """
+    low = -np.inf if min_value is None else float(min_value)
+    high = np.inf if max_value is None else float(max_value)
+    absolute = bool(constraints.get('absolute'))
+    strict = bool(constraints.get('strict'))
+
+    def check(values):
+        if absolute:
+            values = np.abs(values)
+        if strict:
+            return (values > low) & (values < high)
+        return (values >= low) & (values <= high)
+
+    return check
+
+def _parse_constraints(raw):
+    if not raw:
+        return {}
+    try:
+        constraints = json.loads(raw)
+    except (TypeError, ValueError):
+        return {}
+    return constraints if isinstance(constraints, dict) else {}
+
+def _as_float_array(values):
+    return np.array([np.nan if v is None else v for v in values], dtype=float)
+
+def _as_key_array(values):
+    return np.array([v or None for v in values], dtype=object)
+
+class RulesEngine:
+    """In-memory compliance rules compiled from Specification rows"""
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self._rules = None
+        self._compiled_at = 0
+        self._generation = 0
+        self._memo = {}
+        self._bundle = None
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        """Drop the compiled rules; they are rebuilt on next use"""
+        self._generation += 1
+        self._rules = None
+
+    def rules(self, connection=None):
+        """Return the compiled lookup table, compiling it when stale
+
+        The table maps (control_type, parameter_name) to the list of rules
+        for that parameter, in specification id order. ``connection`` lets
+        mapper events compile on the connection being flushed.
+        """
+        rules = self._rules
+        stale = rules is None or time.monotonic() - self._compiled_at > self.ttl
+        record_cache('compliance_rules', not stale)
+        if stale:
+            with self._lock:
+                rules = self._compile(connection)
+        return rules
+
+    def _compile(self, connection=None):
+        from models import Specification
+
+        generation = self._generation
+        table = Specification.__table__
+        statement = select(table).where(table.c.is_active == True).order_by(table.c.id)
+
+        if connection is None:
+            from app import db
+            rows = db.session.execute(statement)
+        else:
+            rows = connection.execute(statement)
+
+        rules = {}
+        for row in rows:
+            constraints = _parse_constraints(row.constraints)
+            rule = Rule(
+                spec_id=row.id,
+                control_type=row.control_type,
+                parameter_name=row.parameter_name,
+                format_type=row.format_type,
+                enamel_type=row.enamel_type,
+                min_value=row.min_value,
+                max_value=row.max_value,
+                target_value=row.target_value,
+                unit=row.unit,
+                constraints=constraints,
+                check=_make_check(row.min_value, row.max_value, constraints)
+            )
+            rules.setdefault((row.control_type, row.parameter_name), []).append(rule)
+
+        if generation == self._generation:
+            # Not cached when invalidated while compiling: the rows may predate the change
+            self._memo = {}
+            self._rules = rules
+            self._compiled_at = time.monotonic()
+        return rules
+
+    def lookup(self, control_type, parameter_name, format_type=None, enamel_type=None, connection=None):
+        """Find the rule for a parameter, like Specification.get_spec does"""
+        return self._lookup(self.rules(connection), control_type, parameter_name, format_type, enamel_type)
+
+    def _lookup(self, rules, control_type, parameter_name, format_type, enamel_type):
+        key = (control_type, parameter_name, format_type, enamel_type)
+
+        memo = self._memo
+        if key in memo:
+            return memo[key]
+
+        rule = None
+        for candidate in rules.get((control_type, parameter_name), []):
+            if format_type and candidate.format_type != format_type:
+                continue
+            if enamel_type and candidate.enamel_type != enamel_type:
+                continue
+            rule = candidate
+            break
+
+        memo[key] = rule
+        return rule
+
+    def spec_bundle(self):
+        """All active specifications as one JSON payload, with its content hash
+
+        Returns ``(version, payload)``. The payload maps control type and
+        parameter to the rules in lookup order, so clients can resolve a
+        rule the same way ``lookup`` does. It is rebuilt with the rules.
+        """
+        rules = self.rules()
+        bundle = self._bundle
+        if bundle is None or bundle[0] is not rules:
+            specs = {}
+            for (control_type, parameter_name), candidates in sorted(rules.items()):
+                specs.setdefault(control_type, {})[parameter_name] = [{
+                    'format_type': rule.format_type,
+                    'enamel_type': rule.enamel_type,
+                    'min': rule.min_value,
+                    'max': rule.max_value,
+                    'target': rule.target_value,
+                    'unit': rule.unit,
+                    'absolute': bool(rule.constraints.get('absolute')),
+                    'strict': bool(rule.constraints.get('strict')),
+                } for rule in candidates]
+
+            content = json.dumps(specs, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+            version = hashlib.sha256(content.encode('utf-8')).hexdigest()[:16]
+            payload = '{"version":"%s","specs":%s}' % (version, content)
+            bundle = self._bundle = (rules, version, payload)
+        return bundle[1:]
+
+    def evaluate_batch(self, control_type, columns, connection=None):
+        """Evaluate many records at once
+
+        ``columns`` maps record attribute names to equal-length sequences
+        (missing values as None). Returns a dict with a boolean
+        ``compliant`` array and, per violated parameter, a boolean
+        ``violations`` array.
+        """
+        plan = CHECK_PLANS.get(control_type, [])
+        rules = self.rules(connection)
+        size = len(next(iter(columns.values()))) if columns else 0
+        cache = {}
+
+        def col(name):
+            if name not in cache:
+                values = columns.get(name)
+                cache[name] = _as_float_array(values) if values is not None else np.full(size, np.nan)
+            return cache[name]
+
+        def keys(name):
+            values = columns.get(name)
+            return _as_key_array(values) if values is not None else np.full(size, None, dtype=object)
+
+        compliant = np.ones(size, dtype=bool)
+        violations = {}
+
+        for spec_check in plan:
+            values = spec_check.value(col) if spec_check.value else col(spec_check.field or spec_check.parameter)
+            present = ~np.isnan(values)
+            if spec_check.when is not None:
+                present &= spec_check.when(col)
+            if not present.any():
+                continue
+
+            formats = keys('format_type') if spec_check.by_format else np.full(size, None, dtype=object)
+            enamels = keys('enamel_type') if spec_check.by_enamel else np.full(size, None, dtype=object)
+            if spec_check.by_format:
+                present &= formats != None
+            if spec_check.by_enamel:
+                present &= enamels != None
+
+            failed = np.zeros(size, dtype=bool)
+            for format_type, enamel_type in set(zip(formats[present], enamels[present])):
+                rule = self._lookup(rules, control_type, spec_check.parameter, format_type, enamel_type)
+                if rule is None:
+                    continue
+
+                rows = present & (formats == format_type) & (enamels == enamel_type)
+                row_values = values[rows]
+                if spec_check.absolute:
+                    row_values = np.abs(row_values)
+
+                if spec_check.min_only:
+                    if rule.min_value is not None:
+                        failed[rows] = row_values < rule.min_value
+                else:
+                    failed[rows] = ~rule.check(row_values)
+
+            if failed.any():
+                violations[spec_check.parameter] = failed
+                compliant &= ~failed
+
+        return {'compliant': compliant, 'violations': violations}
+
+    def check(self, control_type, record, connection=None):
+        """Return the names of the parameters a single record violates"""
+        def col(name):
+            value = getattr(record, name, None)
+            return np.nan if value is None else float(value)
+
+        rules = self.rules(connection)
+        violations = []
+        for spec_check in CHECK_PLANS.get(control_type, []):
+            value = spec_check.value(col) if spec_check.value else col(spec_check.field or spec_check.parameter)
+            if value != value:
+                continue
+            if spec_check.when is not None and not spec_check.when(col):
+                continue
+
+            format_type = (getattr(record, 'format_type', None) or None) if spec_check.by_format else None
+            enamel_type = (getattr(record, 'enamel_type', None) or None) if spec_check.by_enamel else None
+            if (spec_check.by_format and not format_type) or (spec_check.by_enamel and not enamel_type):
+                continue
+
+            rule = self._lookup(rules, control_type, spec_check.parameter, format_type, enamel_type)
+            if rule is None:
+                continue
+
+            if spec_check.absolute:
+                value = abs(value)
+
+            if spec_check.min_only:
+                failed = rule.min_value is not None and value < rule.min_value
+            else:
+                failed = not rule.check(value)
+
+            if failed:
+                violations.append(spec_check.parameter)
+
+        return violations
+
+    def evaluate(self, control_type, record, connection=None):
+        """Compliance status of a single record"""
+        return 'non_compliant' if self.check(control_type, record, connection) else 'compliant'
+
+# Global rules engine instance
+rules_engine = RulesEngine()
@@ -0,0 +1,173 @@
+"""
+Per-request SQL instrumentation
+
+Cursor execution events record, for every request, the number of statements,
+the total time spent in the database and the slowest statements with their
+SQL normalized (placeholders and IN lists collapsed) so that the same query
+issued with different parameters is recognised, e.g. an N+1 loop.
+
+In debug mode (or with SQL_STATS_HEADERS) the figures are added to the
+response as X-SQL-* and Server-Timing headers. Requests exceeding the
+configured thresholds are written as one JSON line to the ``tileqc.sql``
+logger.
+
+Configuration (app.config, defaulting to environment variables):
+    SQL_STATS_HEADERS      expose the headers outside debug mode
+    SQL_SLOW_QUERY_MS      a statement slower than this is slow (200)
+    SQL_SLOW_REQUEST_MS    total database time of a slow request (500)
+    SQL_MAX_STATEMENTS     statement count of a slow request (100)
+    SQL_STATS_TOP          slowest statements kept per request (5)
+"""
+
+import heapq
+import json
+import logging
+import os
+import re
+import time
+from collections import Counter
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+slow_query_logger = logging.getLogger('tileqc.sql')
+
+_WHITESPACE = re.compile(r'\s+')
+_PLACEHOLDER = re.compile(r'%\(\w+\)s|:\w+|\$\d+|\?')
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+
+def normalize_sql(statement):
+    """Collapse whitespace, parameters and IN lists of a statement"""
+    sql = _WHITESPACE.sub(' ', statement).strip()
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _LITERAL.sub('?', sql)
+    return _PLACEHOLDER_LIST.sub('(...)', sql)
+
+class RequestSQLStats:
+    """Statements executed while handling one request"""
+
+    def __init__(self, top=5):
+        self.count = 0
+        self.total = 0.0
+        self.top = top
+        self.statements = Counter()
+        self._slowest = []
+
+    def record(self, statement, elapsed):
+        sql = normalize_sql(statement)
+        self.count += 1
+        self.total += elapsed
+        self.statements[sql] += 1
+        entry = (elapsed, self.count, sql)
+        if len(self._slowest) < self.top:
+            heapq.heappush(self._slowest, entry)
+        elif elapsed > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, entry)
+
+    @property
+    def slowest(self):
+        """[(seconds, normalized sql)], slowest first"""
+        return [(elapsed, sql) for elapsed, _, sql in sorted(self._slowest, reverse=True)]
+
+    @property
+    def most_repeated(self):
+        """(normalized sql, count) of the most repeated statement, or None"""
+        common = self.statements.most_common(1)
+        return common[0] if common else None
+
+    def as_dict(self):
+        repeated = self.most_repeated
+        return {
+            'statements': self.count,
+            'db_ms': round(self.total * 1000, 2),
+            'slowest': [{'ms': round(elapsed * 1000, 2), 'sql': sql} for elapsed, sql in self.slowest],
+            'most_repeated': {'sql': repeated[0], 'count': repeated[1]} if repeated else None
+        }
+
+def current_sql_stats():
+    """Statistics of the current request, or None outside a request"""
+    if not has_request_context():
+        return None
+    return g.get('_sql_stats')
+
+def _config(app, name, default, cast):
+    value = app.config.get(name, os.environ.get(name))
+    if value is None or value == '':
+        return default
+    if cast is bool:
+        return str(value).lower() in ('1', 'true', 'yes', 'on')
+    return cast(value)
+
+def _instrument_engine(engine):
+    """Time every statement executed on an engine"""
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('_sql_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _record_statement(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get('_sql_started')
+        if not started:
+            return
+        elapsed = time.perf_counter() - started.pop()
+        stats = current_sql_stats()
+        if stats is not None:
+            stats.record(statement, elapsed)
+
+    @event.listens_for(engine, 'handle_error')
+    def _discard_timer(exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get('_sql_started'):
+            connection.info['_sql_started'].pop()
+
+def init_sql_instrumentation(app):
+    """Hook SQL statistics into the app's engines and request cycle"""
+    headers = _config(app, 'SQL_STATS_HEADERS', False, bool)
+    slow_query = _config(app, 'SQL_SLOW_QUERY_MS', 200.0, float) / 1000
+    slow_request = _config(app, 'SQL_SLOW_REQUEST_MS', 500.0, float) / 1000
+    max_statements = _config(app, 'SQL_MAX_STATEMENTS', 100, int)
+    top = _config(app, 'SQL_STATS_TOP', 5, int)
+
+    with app.app_context():
+        engines = [app.extensions['sqlalchemy'].engine]
+    if app.extensions.get('read_engine') is not None:
+        engines.append(app.extensions['read_engine'])
+
+    for engine in engines:
+        _instrument_engine(engine)
+
+    @app.before_request
+    def _start_sql_stats():
+        g._sql_stats = RequestSQLStats(top=top)
+
+    @app.after_request
+    def _report_sql_stats(response):
+        stats = current_sql_stats()
+        if stats is None:
+            return response
+
+        if app.debug or headers:
+            response.headers['X-SQL-Count'] = str(stats.count)
+            response.headers['X-SQL-Time-Ms'] = f"{stats.total * 1000:.2f}"
+            response.headers.add('Server-Timing', f'db;dur={stats.total * 1000:.2f};desc="{stats.count} queries"')
+            for position, (elapsed, sql) in enumerate(stats.slowest[:3], 1):
+                response.headers[f'X-SQL-Slowest-{position}'] = f"{elapsed * 1000:.2f}ms {sql[:300]}"
+            repeated = stats.most_repeated
+            if repeated and repeated[1] > 1:
+                response.headers['X-SQL-Most-Repeated'] = f"{repeated[1]}x {repeated[0][:300]}"
+
+        slow = (stats.total >= slow_request or stats.count >= max_statements or
+                any(elapsed >= slow_query for elapsed, _ in stats.slowest))
+        if slow:
+            record = {
+                'event': 'slow_request',
+                'method': request.method,
+                'path': request.path,
+                'endpoint': request.endpoint,
+                'status': response.status_code
+            }
+            record.update(stats.as_dict())
+            slow_query_logger.warning(json.dumps(record))
+
+        return response
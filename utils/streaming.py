@@ -0,0 +1,89 @@
+"""
+Streamed responses for large pages and exports
+
+Report pages render with Flask's stream_template: the page is sent while
+the template runs, so the layout reaches the browser before the first
+stage's data is queried and each section follows as its data arrives
+(pair it with lazily loaded data, e.g. utils.helpers.LazyReport). CSV
+exports are written row by row from a server-side cursor. The output is
+regrouped in chunks of about STREAM_CHUNK_SIZE characters, instead of one
+write per template fragment or row.
+
+A streamed response has sent its headers, session cookie included, by the
+time the template runs: whatever it reads from the session must be read
+before (flashed messages are, by stream_page). The database session of
+the view is closed when the view returns, so queries whose results are
+streamed must start inside the stream (lazy data or generators), not in
+the view.
+"""
+
+import csv
+import io
+import os
+from decimal import Decimal
+
+from flask import Response, get_flashed_messages, stream_template, stream_with_context
+
+STREAM_CHUNK_SIZE = int(os.environ.get('STREAM_CHUNK_SIZE', 16384))
+
+# Text starting with one of these is read as a formula by spreadsheets
+_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+def _chunked(parts, size=None):
+    """Regroup an iterable of strings into chunks of about size characters"""
+    size = size or STREAM_CHUNK_SIZE
+    buffer, buffered = [], 0
+    for part in parts:
+        buffer.append(part)
+        buffered += len(part)
+        if buffered >= size:
+            yield ''.join(buffer)
+            buffer, buffered = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+def _streamed(response):
+    # Proxies (nginx) pass the chunks on as they come
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+def stream_page(template_name, **context):
+    """Stream a page as its template renders"""
+    # base.html pops the flashed messages from the session, which is saved with the headers
+    get_flashed_messages(with_categories=True)
+    return _streamed(Response(_chunked(stream_template(template_name, **context)), mimetype='text/html'))
+
+def _csv_cell(value):
+    """Cell text of a value; text that a spreadsheet would evaluate is quoted with '"""
+    if value is None:
+        return ''
+    if isinstance(value, (float, Decimal)):
+        return str(value).replace('.', ',')
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+def stream_csv(filename, header, rows):
+    """CSV attachment streamed while rows are read
+
+    Semicolon-separated UTF-8 with a byte order mark and decimal commas, as
+    Excel expects it with French regional settings. None is written as an
+    empty cell, and text starting like a formula (=, +, -, @) is prefixed
+    with an apostrophe so that notes typed by users are never evaluated
+    when opened.
+    """
+    def lines():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, delimiter=';')
+        buffer.write('\ufeff')
+        writer.writerow(header)
+        for row in rows:
+            writer.writerow([_csv_cell(value) for value in row])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+
+    response = Response(stream_with_context(_chunked(lines())), mimetype='text/csv')
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return _streamed(response)
@@ -0,0 +1,97 @@
+"""
+Per-worker cache of logged-in users
+
+Flask-Login reloads the user on every authenticated request. The loader
+keeps a read-only snapshot of each user (no password hash, no
+relationships) in a small LRU cache with a TTL, so most requests skip the
+User query. An edit or deletion of a user drops the entry in the worker
+that made it, and logging out drops the logged-out user; other workers see
+the change after at most USER_CACHE_TTL seconds.
+
+Views needing the full model (relationships, updates) load it by id.
+
+Configuration (environment variables):
+    USER_CACHE_TTL     seconds a snapshot is reused (300, 0 disables the cache)
+    USER_CACHE_SIZE    users kept per worker (1024)
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask_login import UserMixin
+
+from utils.metrics import record_cache
+
+class UserSnapshot(UserMixin):
+    """Read-only copy of the User columns the views and templates use"""
+
+    FIELDS = ('id', 'username', 'email', 'role', 'full_name', 'created_at')
+
+    def __init__(self, user):
+        for field in self.FIELDS:
+            object.__setattr__(self, field, getattr(user, field))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is read-only; load the User to modify it")
+
+    def __repr__(self):
+        return f'<UserSnapshot {self.id} {self.username}>'
+
+class UserCache:
+    """LRU cache of user snapshots by id, each valid for ttl seconds"""
+
+    def __init__(self, ttl=300, max_size=1024):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            snapshot, expires = entry
+            if time.monotonic() >= expires:
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return snapshot
+
+    def put(self, user):
+        snapshot = UserSnapshot(user)
+        with self._lock:
+            self._entries[user.id] = (snapshot, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user.id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return snapshot
+
+    def invalidate(self, user_id=None):
+        """Drop one user, or every user"""
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+    def load(self, user_id):
+        """Flask-Login user loader: cached snapshot, else one query"""
+        from models import User, db
+
+        if self.ttl <= 0:
+            return db.session.get(User, user_id)
+
+        snapshot = self.get(user_id)
+        record_cache('user', snapshot is not None)
+        if snapshot is not None:
+            return snapshot
+
+        user = db.session.get(User, user_id)
+        return self.put(user) if user is not None else None
+
+# Global user cache instance
+user_cache = UserCache(ttl=int(os.environ.get('USER_CACHE_TTL', 300)),
+                       max_size=int(os.environ.get('USER_CACHE_SIZE', 1024)))